@@ -0,0 +1,97 @@
+"""Benchmark bank statement reconciliation.
+
+Seeds N open payments, writes a CSV statement with one line per payment
+(a configurable share of them with a wrong amount or an unknown
+reference) and times the streaming import end to end, including the bulk
+update.
+
+    python -m benchmarks.bench_bank_import --lines 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks.common import temp_database, timed, peak_rss_mb
+from models.user import User, UserRole
+from models.payment import Payment, PaymentType, PaymentStatus
+from services import bank_import
+
+
+def seed(session_factory, payments: int):
+    db = session_factory()
+    try:
+        db.add(User(email="admin@tuke.sk", hashed_password="x", full_name="Admin", role=UserRole.ADMIN, is_active=True))
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(1000)
+        ])
+        db.commit()
+        due = datetime.now() + timedelta(days=30)
+        batch = []
+        for i in range(payments):
+            batch.append({
+                "user_id": 2 + i % 1000, "payment_type": PaymentType.TUITION, "description": "Tuition",
+                "amount": 100.0 + i % 400 + 0.5, "status": PaymentStatus.PENDING, "due_date": due,
+                "invoice_number": f"INV-2025-{i + 1000:06d}"
+            })
+            if len(batch) >= 20000:
+                db.bulk_insert_mappings(Payment, batch)
+                batch.clear()
+        db.bulk_insert_mappings(Payment, batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def write_statement(path: str, lines: int, error_rate: float):
+    rng = random.Random(7)
+    with open(path, "w", newline="") as f:
+        f.write("booking_date;reference;amount;counterparty\n")
+        for i in range(lines):
+            reference = f"VS INV-2025-{i + 1000:06d}"
+            amount = 100.0 + i % 400 + 0.5
+            roll = rng.random()
+            if roll < error_rate / 2:
+                amount -= 1
+            elif roll < error_rate:
+                reference = f"VS INV-2024-{i:06d}"
+            f.write(f"2025-10-01;{reference};{amount:.2f};Student {i % 1000}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database() as session_factory:
+        with timed("seed", results):
+            seed(session_factory, args.lines)
+
+        directory = tempfile.mkdtemp(prefix="ais_bench_")
+        path = os.path.join(directory, "statement.csv")
+        write_statement(path, args.lines, args.error_rate)
+
+        db = session_factory()
+        try:
+            with open(path, newline="") as f:
+                with timed("import", results):
+                    report = bank_import.import_statement(db, f, bank_import.FORMAT_CSV, user_id=1, filename="statement.csv")
+        finally:
+            db.close()
+            os.remove(path)
+            os.rmdir(directory)
+
+    print(f"Statement lines: {report['lines_read']}")
+    print(f"Matched:         {report['matched']} (applied {report['applied']})")
+    print(f"Mismatched:      {report['mismatched']} {report['mismatch_counts']}")
+    print(f"Import time:     {results['import']:.2f}s ({report['lines_read'] / results['import']:.0f} lines/s)")
+    print(f"Peak RSS:        {peak_rss_mb():.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
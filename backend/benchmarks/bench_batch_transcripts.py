@@ -0,0 +1,83 @@
+"""Benchmark cohort-wide transcript generation.
+
+Seeds N students with a handful of grades each, then streams the whole
+cohort through the process-pool ZIP pipeline into a counting sink.
+
+    python -m benchmarks.bench_batch_transcripts --students 10000 --workers 4
+"""
+import argparse
+import random
+
+from benchmarks.common import temp_database, timed, peak_rss_mb
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.grade import Grade, GradeLetter
+from services import transcripts
+
+GRADE_TO_NUMERIC = {"A": 1.0, "B": 1.5, "C": 2.0, "D": 3.0, "E": 4.0, "FX": 5.0}
+
+
+def seed(session_factory, students: int, grades_per_student: int):
+    db = session_factory()
+    try:
+        subjects = [
+            {"code": f"SUBJ{i:03d}", "name": f"Subject {i}", "credits": 4 + i % 3, "semester": Semester.WINTER}
+            for i in range(40)
+        ]
+        db.bulk_insert_mappings(Subject, subjects)
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(students)
+        ])
+        db.commit()
+
+        subject_ids = [row[0] for row in db.query(Subject.id).all()]
+        user_ids = [row[0] for row in db.query(User.id).all()]
+        rng = random.Random(42)
+        letters = list(GradeLetter)
+        batch = []
+        for user_id in user_ids:
+            for subject_id in rng.sample(subject_ids, grades_per_student):
+                letter = rng.choice(letters)
+                batch.append({
+                    "student_id": user_id, "subject_id": subject_id, "grade": letter,
+                    "numeric_grade": GRADE_TO_NUMERIC[letter.value], "semester": "Winter 2024/25"
+                })
+            if len(batch) >= 20000:
+                db.bulk_insert_mappings(Grade, batch)
+                batch.clear()
+        db.bulk_insert_mappings(Grade, batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--grades", type=int, default=8, help="grades per student")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database() as session_factory:
+        with timed("seed", results):
+            seed(session_factory, args.students, args.grades)
+
+        job = transcripts.create_job(requested_by=0)
+        zip_bytes = 0
+        with timed("generate", results):
+            for data in transcripts.stream_transcripts_zip(job, session_factory, args.workers):
+                zip_bytes += len(data)
+
+    print(f"Students:        {job.done}/{job.total} ({job.status})")
+    print(f"Seed time:       {results['seed']:.2f}s")
+    print(f"Generation time: {results['generate']:.2f}s")
+    print(f"Throughput:      {job.done / results['generate']:.0f} transcripts/s")
+    print(f"ZIP size:        {zip_bytes / 1024 / 1024:.1f} MiB")
+    print(f"Peak RSS:        {peak_rss_mb():.0f} MiB (parent process)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark .ics feed generation against cached polling.
+
+Seeds a catalogue of ``--subjects`` subjects with two weekly classes and
+a few assignments each, and students who each take ``--per-student`` of
+them. Then times three things: rendering a
+feed from the database (first poll after a change), serving it from the
+per-user cache, and a poll cycle over random students where a fraction
+of polls follow a change to one student's data (which drops only that
+student's feed) and a smaller fraction a change to a subject's timetable
+(which drops the feeds of everyone taking it).
+
+    python -m benchmarks.bench_calendar_feed --students 500 --polls 5000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import temp_database, timed, percentile
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.schedule import Schedule, DayOfWeek, ClassType
+from models.enrollment import Enrollment, EnrollmentStatus
+from models.assignment import Assignment
+from services import calendar_feed
+
+SEMESTER = "Winter 2025/26"
+
+
+def seed(session_factory, args):
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(args.students)
+        ])
+        db.bulk_insert_mappings(Subject, [
+            {"code": f"S{i}", "name": f"Subject {i}", "credits": 6, "semester": Semester.WINTER}
+            for i in range(args.subjects)
+        ])
+        days = list(DayOfWeek)[:5]
+        db.execute(insert(Schedule), [
+            {"subject_id": i + 1, "day": days[(i + k) % 5], "time": "10:00-11:40", "start_minute": 600,
+             "end_minute": 700, "room": f"R{i}", "class_type": class_type, "semester": SEMESTER}
+            for i in range(args.subjects)
+            for k, class_type in enumerate((ClassType.LECTURE, ClassType.LAB))
+        ])
+        due = datetime(2025, 10, 1, 23, 59)
+        db.execute(insert(Assignment), [
+            {"subject_id": i + 1, "title": f"Assignment {k}", "due_date": due + timedelta(weeks=k), "max_points": 10}
+            for i in range(args.subjects)
+            for k in range(4)
+        ])
+        rng = random.Random(1)
+        db.execute(insert(Enrollment), [
+            {"student_id": s + 1, "subject_id": subject_id, "semester": SEMESTER, "status": EnrollmentStatus.CONFIRMED}
+            for s in range(args.students)
+            for subject_id in rng.sample(range(1, args.subjects + 1), args.per_student)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--subjects", type=int, default=40)
+    parser.add_argument("--per-student", type=int, default=8)
+    parser.add_argument("--polls", type=int, default=5000)
+    parser.add_argument("--change-rate", type=float, default=0.05, help="share of polls that follow a student's data change")
+    parser.add_argument("--subject-change-rate", type=float, default=0.001, help="share of polls that follow a timetable change")
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database() as session_factory:
+        seed(session_factory, args)
+        db = session_factory()
+        try:
+            users = db.query(User).all()
+            calendar_feed.invalidate()
+            renders, hits = [], []
+            for user in users:
+                started = time.perf_counter()
+                built = calendar_feed.feed(db, user)
+                renders.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                calendar_feed.feed(db, user)
+                hits.append(time.perf_counter() - started)
+
+            rng = random.Random(3)
+            with timed("polls", results):
+                for _ in range(args.polls):
+                    user = rng.choice(users)
+                    if rng.random() < args.change_rate:
+                        calendar_feed.invalidate(user_ids=[user.id])
+                    if rng.random() < args.subject_change_rate:
+                        calendar_feed.invalidate(subject_ids=[rng.randint(1, args.subjects)])
+                    calendar_feed.feed(db, user)
+        finally:
+            db.close()
+
+    print(f"Feed size:        {len(built.body) / 1024:.1f} KiB, {built.body.count(b'BEGIN:VEVENT')} events")
+    print(f"Render:           p50 {percentile(renders, 50) * 1000:.2f} ms, p99 {percentile(renders, 99) * 1000:.2f} ms")
+    print(f"Cache hit:        p50 {percentile(hits, 50) * 1e6:.1f} us")
+    print(f"{args.polls} polls:      {results['polls']:.2f}s ({args.change_rate:.0%} after a student change, "
+          f"{args.subject_change_rate:.1%} after a timetable change), "
+          f"{results['polls'] / args.polls * 1000:.3f} ms per poll")
+
+
+if __name__ == "__main__":
+    main()
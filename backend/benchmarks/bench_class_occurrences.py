@@ -0,0 +1,141 @@
+"""Benchmark "my classes this week" on materialized class sessions.
+
+Seeds ``--subjects`` subjects with two weekly classes each, a semester
+calendar with a few holidays and some cancellations, and students who
+each take ``--per-student`` of them. Then times materializing the whole
+semester, and answers ``--queries`` week-range lookups for random
+students two ways: expanding their weekly schedules in Python (what
+every client had to do before) and a range scan on ``class_occurrences``.
+
+    python -m benchmarks.bench_class_occurrences --subjects 400 --students 2000 --queries 2000
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import temp_database, timed, percentile
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.schedule import Schedule, DayOfWeek, ClassType, SemesterCalendar, SemesterHoliday, ClassCancellation
+from models.enrollment import Enrollment, EnrollmentStatus
+from services import occurrences
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+SEMESTER = "Winter 2025/26"
+STARTS_ON = date(2025, 9, 22)
+ENDS_ON = date(2025, 12, 19)
+HOLIDAYS = [date(2025, 10, 28), date(2025, 11, 17)]
+
+
+def seed(session_factory, args):
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(args.students)
+        ])
+        db.bulk_insert_mappings(Subject, [
+            {"code": f"S{i}", "name": f"Subject {i}", "credits": 6, "semester": Semester.WINTER}
+            for i in range(args.subjects)
+        ])
+        days = list(DayOfWeek)[:5]
+        db.execute(insert(Schedule), [
+            {"subject_id": i + 1, "day": days[(i + k) % 5], "time": "10:00-11:40", "start_minute": 600,
+             "end_minute": 700, "room": f"R{i}", "class_type": class_type, "semester": SEMESTER}
+            for i in range(args.subjects)
+            for k, class_type in enumerate((ClassType.LECTURE, ClassType.LAB))
+        ])
+        db.add(SemesterCalendar(
+            semester=SEMESTER, starts_on=STARTS_ON, ends_on=ENDS_ON,
+            holidays=[SemesterHoliday(date=day, name="Holiday") for day in HOLIDAYS]
+        ))
+        rng = random.Random(1)
+        db.execute(insert(Enrollment), [
+            {"student_id": s + 1, "subject_id": subject_id, "semester": SEMESTER, "status": EnrollmentStatus.CONFIRMED}
+            for s in range(args.students)
+            for subject_id in rng.sample(range(1, args.subjects + 1), args.per_student)
+        ])
+        db.commit()
+        schedules = db.query(Schedule.id, Schedule.day).all()
+        index = {day: i for i, day in enumerate(DayOfWeek)}
+        cancelled = set()
+        for schedule in rng.sample(schedules, len(schedules) // 10):
+            first = STARTS_ON + timedelta(days=index[schedule.day])
+            cancelled.add((schedule.id, first + timedelta(weeks=rng.randrange(12))))
+        db.execute(insert(ClassCancellation), [{"schedule_id": s, "date": d, "reason": "Cancelled"} for s, d in cancelled])
+        db.commit()
+    finally:
+        db.close()
+
+
+def expand_in_python(db, user, start: date, end: date):
+    """The week computed from weekly rows, the way clients did it before"""
+    subject_ids = [row.subject_id for row in db.query(Enrollment.subject_id).filter(
+        Enrollment.student_id == user.id, Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+    )]
+    schedules = db.query(Schedule).filter(Schedule.subject_id.in_(subject_ids), Schedule.semester == SEMESTER).all()
+    first, last, holidays = occurrences.teaching_period(db, SEMESTER)
+    cancelled = {
+        (row.schedule_id, row.date)
+        for row in db.query(ClassCancellation.schedule_id, ClassCancellation.date).filter(
+            ClassCancellation.schedule_id.in_([s.id for s in schedules])
+        )
+    }
+    index = {day: i for i, day in enumerate(DayOfWeek)}
+    sessions = []
+    for schedule in schedules:
+        day = start + timedelta(days=(index[schedule.day] - start.weekday()) % 7)
+        while day < end:
+            if first <= day <= last and day not in holidays:
+                sessions.append((day, schedule.start_minute, schedule.id, (schedule.id, day) in cancelled))
+            day += timedelta(weeks=1)
+    return sorted(sessions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--subjects", type=int, default=400)
+    parser.add_argument("--per-student", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database() as session_factory:
+        seed(session_factory, args)
+        db = session_factory()
+        try:
+            with timed("materialize", results):
+                rows = occurrences.rebuild_semester(db, SEMESTER)
+                db.commit()
+
+            users = db.query(User).all()
+            rng = random.Random(3)
+            weeks = [STARTS_ON + timedelta(weeks=rng.randrange(13)) for _ in range(args.queries)]
+            picks = [rng.choice(users) for _ in range(args.queries)]
+            expanded, scanned = [], []
+            for user, start in zip(picks, weeks):
+                end = start + timedelta(days=7)
+                started = time.perf_counter()
+                expected = expand_in_python(db, user, start, end)
+                expanded.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                found = occurrences.for_user(db, user, datetime.combine(start, datetime.min.time()),
+                                             datetime.combine(end, datetime.min.time())).all()
+                scanned.append(time.perf_counter() - started)
+                if len(found) != len(expected):
+                    raise SystemExit(f"Mismatch for student {user.id} in week of {start}: {len(found)} != {len(expected)}")
+        finally:
+            db.close()
+
+    print(f"Materialize:      {rows} sessions in {results['materialize']:.2f}s")
+    print(f"Python expansion: p50 {percentile(expanded, 50) * 1000:.2f} ms, p99 {percentile(expanded, 99) * 1000:.2f} ms")
+    print(f"Range scan:       p50 {percentile(scanned, 50) * 1000:.2f} ms, p99 {percentile(scanned, 99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
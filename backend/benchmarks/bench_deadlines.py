@@ -0,0 +1,133 @@
+"""Benchmark the merged deadlines stream against fetching everything.
+
+Seeds ``--subjects`` subjects with ``--assignments`` assignments each
+spread over two years, students who each take ``--per-student`` of them,
+and a few unpaid payments and a thesis per student. Then answers
+``--queries`` "next ``--limit`` deadlines" requests for random students
+two ways: loading every source in full and sorting in Python (what the
+UI did with four separate calls), and ``services.deadlines.upcoming``.
+
+    python -m benchmarks.bench_deadlines --subjects 100 --assignments 500 --queries 500
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import temp_database, percentile
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.enrollment import Enrollment, EnrollmentStatus
+from models.assignment import Assignment
+from models.thesis import Thesis, ThesisType
+from models.payment import Payment, PaymentType, PaymentStatus
+from services import deadlines
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+SEMESTER = "Winter 2025/26"
+START = datetime(2025, 9, 1)
+
+
+def seed(session_factory, args):
+    rng = random.Random(1)
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(args.students)
+        ])
+        db.bulk_insert_mappings(Subject, [
+            {"code": f"S{i}", "name": f"Subject {i}", "credits": 6, "semester": Semester.WINTER}
+            for i in range(args.subjects)
+        ])
+        db.execute(insert(Assignment), [
+            {"subject_id": i + 1, "title": f"Assignment {k}", "max_points": 10,
+             "due_date": START + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60))}
+            for i in range(args.subjects)
+            for k in range(args.assignments)
+        ])
+        db.execute(insert(Enrollment), [
+            {"student_id": s + 1, "subject_id": subject_id, "semester": SEMESTER, "status": EnrollmentStatus.CONFIRMED}
+            for s in range(args.students)
+            for subject_id in rng.sample(range(1, args.subjects + 1), args.per_student)
+        ])
+        db.execute(insert(Payment), [
+            {"user_id": s + 1, "payment_type": PaymentType.TUITION, "description": f"Fee {k}", "amount": 100.0,
+             "status": PaymentStatus.PENDING, "due_date": START + timedelta(days=rng.randrange(730))}
+            for s in range(args.students)
+            for k in range(6)
+        ])
+        # Undated payments are no deadline and must be left out
+        db.execute(insert(Payment), [
+            {"user_id": s + 1, "payment_type": PaymentType.OTHER, "description": "Undated fee", "amount": 10.0,
+             "status": PaymentStatus.PENDING, "due_date": None}
+            for s in range(args.students)
+        ])
+        db.execute(insert(Thesis), [
+            {"student_id": s + 1, "title": f"Thesis {s}", "thesis_type": ThesisType.BACHELOR,
+             "supervisor_name": "Supervisor", "department": "KPI", "start_date": START,
+             "submission_deadline": START + timedelta(days=rng.randrange(730)),
+             "defense_date": START + timedelta(days=730)}
+            for s in range(args.students)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def fetch_all(db, user, start, limit):
+    """Every source in full, sorted in Python"""
+    subject_ids = [row.subject_id for row in db.query(Enrollment.subject_id).filter(
+        Enrollment.student_id == user.id, Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+    )]
+    due = [row.due_date for row in db.query(Assignment.due_date).filter(Assignment.subject_id.in_(subject_ids))]
+    for thesis in db.query(Thesis).filter(Thesis.student_id == user.id):
+        due += [thesis.submission_deadline, thesis.defense_date]
+    due = [d for d in due if d is not None and d >= start]
+    # Unpaid payments are listed however overdue they are
+    due += [row.due_date for row in db.query(Payment.due_date).filter(
+        Payment.user_id == user.id, Payment.status.in_(deadlines.UNPAID_STATUSES)
+    ) if row.due_date is not None]
+    return sorted(due)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--subjects", type=int, default=100)
+    parser.add_argument("--assignments", type=int, default=500)
+    parser.add_argument("--per-student", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_database() as session_factory:
+        seed(session_factory, args)
+        db = session_factory()
+        try:
+            users = db.query(User).all()
+            rng = random.Random(3)
+            full, merged = [], []
+            for _ in range(args.queries):
+                user = rng.choice(users)
+                start = START + timedelta(days=rng.randrange(600))
+                started = time.perf_counter()
+                expected = fetch_all(db, user, start, args.limit)
+                full.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                found = deadlines.upcoming(db, user, start, limit=args.limit)
+                merged.append(time.perf_counter() - started)
+                if [d.due_at for d in found] != expected:
+                    raise SystemExit(f"Mismatch for student {user.id} from {start}")
+        finally:
+            db.close()
+
+    print(f"Fetch all + sort: p50 {percentile(full, 50) * 1000:.2f} ms, p99 {percentile(full, 99) * 1000:.2f} ms")
+    print(f"Merged stream:    p50 {percentile(merged, 50) * 1000:.2f} ms, p99 {percentile(merged, 99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Load test for seat reservation under concurrent enrollments.
+
+Seeds N students and a few subjects whose combined capacity is far below
+the demand, then fires N enrollment requests (plus a share of duplicate
+retries) at ``create_enrollment`` from a thread pool all at once. Checks
+afterwards that no subject is oversubscribed, that ``enrolled_count``
+matches the enrollments table, and that no student is enrolled twice.
+Exits non-zero if any check fails.
+
+    python -m benchmarks.bench_enrollment_contention --students 5000
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from benchmarks.common import temp_database, timed, percentile
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.enrollment import Enrollment
+from routers.enrollments import create_enrollment
+from schemas.enrollment import EnrollmentCreate
+from services import enrollments as seats
+
+SEMESTER = "Winter 2025/26"
+CAPACITIES = (50, 200, 750)
+
+
+def seed(session_factory, students: int):
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(students)
+        ])
+        for i, capacity in enumerate(CAPACITIES):
+            db.add(Subject(code=f"LOAD{i}", name=f"Load Test {i}", credits=6, semester=Semester.WINTER, capacity=capacity))
+        db.commit()
+        return [row.id for row in db.query(User.id).order_by(User.id)], [row.id for row in db.query(Subject.id).order_by(Subject.id)]
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database() as session_factory:
+        student_ids, subject_ids = seed(session_factory, args.students)
+        rng = random.Random(7)
+        attempts = [(student_id, rng.choice(subject_ids)) for student_id in student_ids]
+        attempts += rng.sample(attempts, int(len(attempts) * args.duplicate_rate))
+        rng.shuffle(attempts)
+
+        outcomes = Counter()
+        latencies = []
+        lock = threading.Lock()
+        start = threading.Event()
+
+        def enroll(attempt):
+            student_id, subject_id = attempt
+            start.wait()
+            db = session_factory()
+            try:
+                student = db.get(User, student_id)
+                began = time.perf_counter()
+                try:
+                    create_enrollment(EnrollmentCreate(subject_id=subject_id, semester=SEMESTER), db=db, current_user=student)
+                    outcome = "enrolled"
+                except HTTPException as e:
+                    outcome = {409: "full", 400: "duplicate"}.get(e.status_code, f"http_{e.status_code}")
+                except Exception as e:
+                    outcome = type(e).__name__
+                elapsed = time.perf_counter() - began
+                with lock:
+                    outcomes[outcome] += 1
+                    latencies.append(elapsed)
+            finally:
+                db.close()
+
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(enroll, attempt) for attempt in attempts]
+            with timed("run", results):
+                start.set()
+                for future in futures:
+                    future.result()
+
+        db = session_factory()
+        try:
+            failures = []
+            for subject in db.query(Subject).order_by(Subject.id):
+                holding = db.query(func.count(Enrollment.id)).filter(
+                    Enrollment.subject_id == subject.id,
+                    Enrollment.status.in_(seats.SEAT_HOLDING_STATUSES)
+                ).scalar()
+                print(f"{subject.code}: capacity {subject.capacity}, enrolled_count {subject.enrolled_count}, rows {holding}")
+                if holding > subject.capacity:
+                    failures.append(f"{subject.code} oversubscribed by {holding - subject.capacity}")
+                if holding != subject.enrolled_count:
+                    failures.append(f"{subject.code} enrolled_count {subject.enrolled_count} != {holding} rows")
+            duplicates = db.query(Enrollment.student_id, Enrollment.subject_id).group_by(
+                Enrollment.student_id, Enrollment.subject_id, Enrollment.semester
+            ).having(func.count(Enrollment.id) > 1).count()
+            if duplicates:
+                failures.append(f"{duplicates} duplicate enrollments")
+            if outcomes["enrolled"] != sum(CAPACITIES):
+                failures.append(f"{outcomes['enrolled']} accepted, expected every seat ({sum(CAPACITIES)}) to be taken")
+        finally:
+            db.close()
+
+    print(f"Requests:        {len(attempts)} ({args.workers} workers)")
+    print(f"Outcomes:        {dict(outcomes)}")
+    print(f"Run time:        {results['run']:.2f}s ({len(attempts) / results['run']:.0f} requests/s)")
+    print(f"Latency p50/p99: {percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 99) * 1000:.1f} ms")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: no oversubscription, counters consistent, no duplicates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark exam seat allocation.
+
+Seeds one exam with ``--students`` registrations from ``--groups`` study
+groups of uneven size, registered in group order (the worst case for
+seating in registration order), and ``--rooms`` rooms with a few spare
+seats. Then times ``allocate_exam`` (load, allocate, bulk write, commit)
+and compares same-group neighbours with seating in registration order.
+
+    python -m benchmarks.bench_exam_seating --students 5000 --groups 40 --rooms 12
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import temp_database, timed
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.exam import Exam, ExamRegistration
+from services import exam_seating
+
+SEMESTER = "Winter 2025/26"
+TARGET_SECONDS = 1.0
+
+
+def seed(session_factory, args):
+    rng = random.Random(1)
+    weights = [rng.uniform(0.2, 3.0) for _ in range(args.groups)]
+    groups = sorted(rng.choices([f"G{i:02d}" for i in range(args.groups)], weights, k=args.students))
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True, "study_group": group}
+            for i, group in enumerate(groups)
+        ])
+        db.add(Subject(code="S0", name="Subject 0", credits=6, semester=Semester.WINTER))
+        db.flush()
+        exam = Exam(subject_id=1, semester=SEMESTER, starts_at=datetime.now() + timedelta(days=7),
+                    room="Hall", capacity=args.students, registered_count=args.students)
+        db.add(exam)
+        db.flush()
+        db.execute(insert(ExamRegistration), [{"exam_id": exam.id, "student_id": i + 1} for i in range(args.students)])
+        db.commit()
+    finally:
+        db.close()
+    per_room = args.students // args.rooms + 20
+    return [(f"R{i}", per_room) for i in range(args.rooms)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--groups", type=int, default=40)
+    parser.add_argument("--rooms", type=int, default=12)
+    args = parser.parse_args()
+
+    results = {}
+    with temp_database() as session_factory:
+        rooms = seed(session_factory, args)
+        db = session_factory()
+        try:
+            exam = db.query(Exam).first()
+            with timed("allocate", results):
+                report = exam_seating.allocate_exam(db, exam, rooms)
+                db.commit()
+
+            rows = db.query(ExamRegistration.id, ExamRegistration.room, ExamRegistration.seat_number, User.study_group).join(
+                User, User.id == ExamRegistration.student_id
+            ).all()
+            groups = {row.id: row.study_group for row in rows}
+            seats = [exam_seating.Seat(row.id, row.room, row.seat_number) for row in rows]
+            taken = {(seat.room, seat.seat_number) for seat in seats}
+            if len(taken) != args.students or None in {seat.room for seat in seats}:
+                raise SystemExit("Some students were not seated or share a seat")
+
+            # Registration order into the same rooms, seats 1, 2, 3, ...
+            in_order, ids = [], iter(sorted(groups))
+            for room in report["rooms"]:
+                in_order += [exam_seating.Seat(next(ids), room["room"], i + 1) for i in range(room["seated"])]
+            naive = exam_seating.adjacent_same_group(in_order, groups)
+        finally:
+            db.close()
+
+    seconds = results["allocate"]
+    print(f"Allocated:        {report['seated']} students in {len(rooms)} rooms in {seconds:.3f}s "
+          f"({'within' if seconds < TARGET_SECONDS else 'OVER'} the {TARGET_SECONDS:.0f}s target)")
+    print(f"Same-group neighbours: {report['adjacent_same_group']} (registration order: {naive})")
+
+
+if __name__ == "__main__":
+    main()
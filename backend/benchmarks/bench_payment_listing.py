@@ -0,0 +1,100 @@
+"""Benchmark the payment listing read path against table size.
+
+For each size, seeds that many payments spread over a pool of users and
+times the listing queries the API issues: the first admin page, a page deep
+in the cursor chain, the overdue view (served by the (status, due_date)
+index) and one student's full history. Latencies are per query.
+
+    python -m benchmarks.bench_payment_listing --sizes 10000 50000 200000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import temp_database, percentile
+from models.user import User, UserRole
+from models.payment import Payment, PaymentType, PaymentStatus
+from services import payments as payment_listing
+
+USERS = 2000
+REPEATS = 20
+
+
+def seed(session_factory, payments: int):
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(USERS)
+        ])
+        db.commit()
+
+        user_ids = [row[0] for row in db.query(User.id).all()]
+        rng = random.Random(42)
+        statuses = [PaymentStatus.PENDING, PaymentStatus.PAID, PaymentStatus.PAID, PaymentStatus.OVERDUE]
+        types = list(PaymentType)
+        base = datetime.now()
+        batch = []
+        for i in range(payments):
+            batch.append({
+                "user_id": rng.choice(user_ids), "payment_type": rng.choice(types),
+                "description": f"Payment {i}", "amount": 100.0 + i % 400,
+                "status": rng.choice(statuses), "due_date": base + timedelta(days=rng.randint(-180, 180)),
+                "invoice_number": f"INV-{i:07d}"
+            })
+            if len(batch) >= 20000:
+                db.bulk_insert_mappings(Payment, batch)
+                batch.clear()
+        db.bulk_insert_mappings(Payment, batch)
+        db.commit()
+        return user_ids
+    finally:
+        db.close()
+
+
+def measure(fn) -> list:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_size(size: int, page_size: int):
+    with temp_database() as session_factory:
+        user_ids = seed(session_factory, size)
+        db = session_factory()
+        try:
+            now = datetime.now()
+            deep_cursor = db.query(Payment.id).order_by(Payment.id.desc()).offset(size // 2).limit(1).scalar()
+            cases = {
+                "first page": lambda: payment_listing.list_payments(db, limit=page_size),
+                "deep page": lambda: payment_listing.list_payments(db, cursor=deep_cursor, limit=page_size),
+                "overdue view": lambda: payment_listing.list_payments(
+                    db, status=PaymentStatus.OVERDUE, due_from=now - timedelta(days=30), due_to=now, limit=page_size
+                ),
+                "student history": lambda: payment_listing.list_payments(db, user_id=user_ids[0]),
+            }
+            for label, fn in cases.items():
+                samples = measure(fn)
+                print(f"{size:>9} {label:<16} p50 {percentile(samples, 50):7.2f} ms   p95 {percentile(samples, 95):7.2f} ms")
+        finally:
+            db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--page-size", type=int, default=payment_listing.DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    print(f"{'payments':>9} {'query':<16} latency over {REPEATS} runs")
+    for size in args.sizes:
+        run_size(size, args.page_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark the PDF worker pool.
+
+Renders N distinct transcripts from concurrent client threads (cold cache),
+then requests the same documents again (warm cache), and reports throughput
+and latency percentiles for both passes.
+
+    python -m benchmarks.bench_pdf_rendering --documents 500 --clients 16 --workers 4
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile
+from services.pdf import PdfRenderer
+
+SUBJECTS = [(f"SUBJ{i:03d}", f"Subject {i} – Košice track", 4 + i % 3) for i in range(40)]
+
+
+def make_transcript(student_id: int, rng: random.Random) -> dict:
+    rows = []
+    for code, name, credits in rng.sample(SUBJECTS, 8):
+        letter, numeric = rng.choice([("A", 1.0), ("B", 1.5), ("C", 2.0), ("D", 3.0), ("E", 4.0)])
+        rows.append((code, name, credits, letter, numeric, "Winter 2024/25"))
+    total_credits = sum(r[2] for r in rows)
+    return {
+        "user_id": student_id,
+        "full_name": f"Študent {student_id}",
+        "email": f"student{student_id}@tuke.sk",
+        "issued_on": "January 01, 2026",
+        "rows": rows,
+        "total_credits": total_credits,
+        "gpa": sum(r[2] * r[4] for r in rows) / total_credits,
+    }
+
+
+def run_pass(renderer: PdfRenderer, documents, clients: int):
+    latencies = []
+
+    def request(data):
+        start = time.perf_counter()
+        renderer.render("grade_transcript", data)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(request, documents))
+    return time.perf_counter() - start, latencies
+
+
+def report(label: str, elapsed: float, latencies):
+    print(f"{label}")
+    print(f"  throughput: {len(latencies) / elapsed:.1f} docs/s")
+    print(f"  latency p50/p95/p99: "
+          f"{percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 95) * 1000:.1f} / "
+          f"{percentile(latencies, 99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    documents = [make_transcript(i, rng) for i in range(args.documents)]
+    renderer = PdfRenderer(workers=args.workers, max_pending=max(args.clients, 1))
+    try:
+        # Start the workers (font loading) before measuring
+        renderer.render("grade_transcript", make_transcript(-1, rng))
+        cold = run_pass(renderer, documents, args.clients)
+        warm = run_pass(renderer, documents, args.clients)
+    finally:
+        renderer.shutdown()
+
+    print(f"Documents: {args.documents}, clients: {args.clients}, workers: {args.workers}")
+    report("Cold cache (rendered in pool)", *cold)
+    report("Warm cache (content-version hits)", *warm)
+    print(f"Stats: {renderer.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Replay a registration-day spike against the enrollment endpoints.
+
+N students arrive within ``--ramp`` seconds. Each one lists the subjects
+and then enrolls in one of them. A student who gets 503 with a queue
+ticket sleeps for Retry-After and retries with the ticket, as the front
+end does. The run goes through the real subjects and enrollments routers
+and the admission middleware, on an in-process ASGI transport, against a
+throwaway SQLite file.
+
+``--no-gate`` runs the same spike without the admission middleware. Be
+careful with it: already around a hundred students exhaust the connection
+pool. The async auth dependency then blocks the event loop on pool
+checkout while the handler threads holding the connections wait for the
+loop, and the run stalls for minutes.
+
+Reported: time to drain the spike, per-student completion latency, server
+errors, peak number of requests inside the handlers at once, and how
+fairly enrollments were admitted. Fairness is the share of student pairs
+whose enrollment ran in a different order than they arrived.
+
+    python -m benchmarks.bench_registration_spike --students 3000 --ramp 1
+"""
+import argparse
+import asyncio
+import bisect
+import random
+import time
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+
+from auth import create_access_token
+from benchmarks.common import temp_database, timed, percentile
+from database import get_db
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from routers import enrollments, subjects
+from services import admission
+
+SEMESTER = "Winter 2025/26"
+CAPACITY = 400
+MAX_ATTEMPTS = 100
+
+
+def seed(session_factory, students: int):
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(students)
+        ])
+        for i in range(10):
+            db.add(Subject(code=f"SPIKE{i}", name=f"Spike {i}", credits=6, semester=Semester.WINTER, capacity=CAPACITY))
+        db.commit()
+        return [row.id for row in db.query(Subject.id).order_by(Subject.id)]
+    finally:
+        db.close()
+
+
+class InFlight:
+    """Innermost ASGI layer counting requests that reached the handlers"""
+
+    def __init__(self, app):
+        self.app = app
+        self.current = 0
+        self.peak = 0
+        self.order = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        if scope["method"] == "POST":
+            student = dict(scope["headers"]).get(b"x-student")
+            self.order.append(int(student))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.current -= 1
+
+
+def build_app(session_factory, gate: bool):
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.include_router(enrollments.router)
+
+    def bench_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = bench_db
+    in_flight = InFlight(app)
+    # Same order as main.py: the gate sits in front of everything else
+    return (admission.AdmissionMiddleware(in_flight) if gate else in_flight), in_flight
+
+
+def inversions(order) -> int:
+    seen = []
+    count = 0
+    for value in order:
+        position = bisect.bisect_right(seen, value)
+        count += len(seen) - position
+        seen.insert(position, value)
+    return count
+
+
+async def student(client, index: int, delay: float, subject_id: int, stats: dict):
+    await asyncio.sleep(delay)
+    headers = {
+        "Authorization": f"Bearer {create_access_token({'sub': f'student{index}@tuke.sk'})}",
+        "X-Student": str(index),
+    }
+    started = time.perf_counter()
+    for method, url, body in (("GET", "/api/subjects/", None), ("POST", "/api/enrollments/", {"subject_id": subject_id, "semester": SEMESTER})):
+        ticket = None
+        for _ in range(MAX_ATTEMPTS):
+            request_headers = {**headers, admission.TICKET_HEADER: ticket} if ticket else headers
+            response = await client.request(method, url, json=body, headers=request_headers)
+            stats["responses"][response.status_code] += 1
+            if response.status_code != 503:
+                break
+            ticket = response.headers.get(admission.TICKET_HEADER)
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+        stats["outcomes"][response.status_code if method == "POST" else "listed"] += 1
+    stats["latencies"].append(time.perf_counter() - started)
+
+
+async def spike(app, arrivals, subject_ids):
+    stats = {"responses": Counter(), "outcomes": Counter(), "latencies": []}
+    rng = random.Random(11)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(
+            student(client, index, delay, rng.choice(subject_ids), stats)
+            for index, delay in arrivals
+        ))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which students arrive")
+    parser.add_argument("--no-gate", action="store_true", help="run without the admission middleware")
+    parser.add_argument("--write-rate", type=float, default=None, help="override the enrollment_writes rate")
+    args = parser.parse_args()
+
+    if args.write_rate:
+        admission.gates["enrollment_writes"].configure(rate=args.write_rate, burst=max(1, int(args.write_rate)))
+
+    results = {}
+    with temp_database() as session_factory:
+        subject_ids = seed(session_factory, args.students)
+        app, in_flight = build_app(session_factory, gate=not args.no_gate)
+        rng = random.Random(7)
+        arrivals = sorted(((i, rng.uniform(0, args.ramp)) for i in range(args.students)), key=lambda a: a[1])
+        with timed("spike", results):
+            stats = asyncio.run(spike(app, arrivals, subject_ids))
+
+    arrival_rank = {index: rank for rank, (index, _) in enumerate(arrivals)}
+    admitted = [arrival_rank[index] for index in in_flight.order]
+    pairs = len(admitted) * (len(admitted) - 1) // 2
+    latencies = stats["latencies"]
+
+    print(f"Mode:             {'no gate' if args.no_gate else 'admission gate'}")
+    print(f"Students:         {args.students} arriving over {args.ramp:.1f}s")
+    print(f"Drained in:       {results['spike']:.2f}s")
+    print(f"Enrollments:      {dict(stats['outcomes'])}")
+    print(f"HTTP responses:   {dict(stats['responses'])}")
+    print(f"Server errors:    {sum(c for s, c in stats['responses'].items() if s >= 500 and s != 503)}")
+    print(f"Peak in handlers: {in_flight.peak}")
+    print(f"Latency p50/p99:  {percentile(latencies, 50):.2f} / {percentile(latencies, 99):.2f}s (max {max(latencies):.2f}s)")
+    print(f"Out-of-order:     {inversions(admitted) / pairs * 100 if pairs else 0:.2f}% of enrollment pairs")
+    if not args.no_gate:
+        for gate in admission.gates.values():
+            print(f"Gate {gate.name}: {gate.to_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark timetable clash checks against timetable size.
+
+Seeds a semester with N schedule slots spread over rooms, teachers and
+weekdays, then times room/teacher clash checks two ways: the interval
+index from ``services.timetable`` (built once, then O(log n + k) per
+check) and a linear scan over all slots of the semester, which is what
+checking without the index costs. The two must find the same clashes.
+Also times free-room searches (one tree lookup per known room).
+
+    python -m benchmarks.bench_schedule_conflicts --sizes 1000 10000 50000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import temp_database, timed, percentile
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.schedule import Schedule, DayOfWeek, ClassType, format_time_range
+from services import timetable
+
+SEMESTER = "Winter 2025/26"
+DAYS = list(DayOfWeek)[:5]
+
+
+def seed(session_factory, size: int, rng: random.Random):
+    teachers = max(1, size // 20)
+    rooms = max(1, size // 10)
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"teacher{i}@tuke.sk", "hashed_password": "x", "full_name": f"Teacher {i}",
+             "role": UserRole.TEACHER, "is_active": True}
+            for i in range(teachers)
+        ])
+        db.bulk_insert_mappings(Subject, [
+            {"code": f"S{i}", "name": f"Subject {i}", "credits": 6, "semester": Semester.WINTER,
+             "teacher_id": rng.randint(1, teachers)}
+            for i in range(size // 2)
+        ])
+        slots = []
+        for _ in range(size):
+            start = rng.randrange(7 * 60, 19 * 60, 10)
+            end = start + rng.choice((50, 100))
+            slots.append({
+                "subject_id": rng.randint(1, size // 2), "day": rng.choice(DAYS),
+                "time": format_time_range(start, end), "start_minute": start, "end_minute": end,
+                "room": f"R{rng.randrange(rooms)}", "class_type": ClassType.LECTURE, "semester": SEMESTER,
+            })
+        db.bulk_insert_mappings(Schedule, slots)
+        db.commit()
+        return teachers, rooms
+    finally:
+        db.close()
+
+
+def linear_conflicts(db, day, start, end, room, teacher_id):
+    rows = db.query(Schedule.id, Schedule.day, Schedule.start_minute, Schedule.end_minute, Schedule.room, Subject.teacher_id).join(
+        Subject, Subject.id == Schedule.subject_id
+    ).filter(Schedule.semester == SEMESTER).all()
+    return {
+        row.id for row in rows
+        if row.day == day and row.start_minute < end and row.end_minute > start
+        and (row.room == room or row.teacher_id == teacher_id)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--checks", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(size)
+        results = {}
+        with temp_database() as session_factory:
+            teachers, rooms = seed(session_factory, size, rng)
+            db = session_factory()
+            try:
+                timetable.invalidate()
+                with timed("build", results):
+                    timetable.semester_index(db, SEMESTER)
+                indexed, linear, free = [], [], []
+                for _ in range(args.checks):
+                    start = rng.randrange(7 * 60, 19 * 60, 10)
+                    query = (rng.choice(DAYS), format_time_range(start, start + 100), f"R{rng.randrange(rooms)}", rng.randint(1, teachers))
+                    started = time.perf_counter()
+                    found = timetable.schedule_conflicts(db, SEMESTER, *query)
+                    indexed.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    expected = linear_conflicts(db, query[0], start, start + 100, query[2], query[3])
+                    linear.append(time.perf_counter() - started)
+                    assert {c["schedule_id"] for c in found} == expected
+                    started = time.perf_counter()
+                    timetable.free_rooms(db, SEMESTER, query[0], query[1])
+                    free.append(time.perf_counter() - started)
+            finally:
+                db.close()
+        print(f"Slots {size:>6}: index build {results['build'] * 1000:.0f} ms, "
+              f"check p50 {percentile(indexed, 50) * 1000:.3f} ms vs linear scan {percentile(linear, 50) * 1000:.2f} ms, "
+              f"free rooms ({rooms}) p50 {percentile(free, 50) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark waitlist promotion against waitlist length.
+
+For each size, seeds a full subject with that many waitlisted students,
+then frees seats one at a time (``free_seat`` + commit, as withdrawing
+does) and times each promotion. The per-promotion time should stay flat
+as the waitlist grows, since the head is an index seek on
+(subject_id, position). Also prints SQLite's plan for the head lookup.
+
+    python -m benchmarks.bench_waitlist_promotion --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import temp_database, percentile
+from models.user import User, UserRole
+from models.subject import Subject, Semester
+from models.enrollment import WaitlistEntry
+from services import enrollments as seats
+
+SEMESTER = "Winter 2025/26"
+
+
+def seed(session_factory, size: int) -> int:
+    db = session_factory()
+    try:
+        db.bulk_insert_mappings(User, [
+            {"email": f"student{i}@tuke.sk", "hashed_password": "x", "full_name": f"Student {i}",
+             "role": UserRole.STUDENT, "is_active": True}
+            for i in range(size)
+        ])
+        subject = Subject(code="WAIT", name="Waitlisted", credits=6, semester=Semester.WINTER, capacity=1, enrolled_count=1)
+        db.add(subject)
+        db.commit()
+        db.bulk_insert_mappings(WaitlistEntry, [
+            {"student_id": i + 1, "subject_id": subject.id, "semester": SEMESTER, "position": i + 1}
+            for i in range(size)
+        ])
+        db.commit()
+        return subject.id
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--promotions", type=int, default=500)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with temp_database() as session_factory:
+            subject_id = seed(session_factory, size)
+            db = session_factory()
+            try:
+                plan = db.execute(text(
+                    "EXPLAIN QUERY PLAN SELECT id, student_id, semester FROM waitlist_entries WHERE subject_id = :s ORDER BY position LIMIT 1"
+                ), {"s": subject_id}).all()
+                samples = []
+                for _ in range(min(args.promotions, size)):
+                    started = time.perf_counter()
+                    promoted = seats.free_seat(db, subject_id)
+                    db.commit()
+                    samples.append(time.perf_counter() - started)
+                    assert len(promoted) == 1
+            finally:
+                db.close()
+        print(f"Waitlist {size:>7}: promotion p50 {percentile(samples, 50) * 1000:.2f} ms, "
+              f"p99 {percentile(samples, 99) * 1000:.2f} ms")
+    print("Head lookup plan: " + "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    main()
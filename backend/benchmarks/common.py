@@ -0,0 +1,55 @@
+"""Shared helpers for the benchmark scripts.
+
+Each benchmark runs against a throwaway SQLite file so it never touches
+ais_tuke.db. Run them from the backend directory, e.g.
+
+    python -m benchmarks.bench_batch_transcripts --students 10000
+"""
+import os
+import resource
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+import models  # noqa: F401 - registers every table on Base.metadata
+
+
+@contextmanager
+def temp_database():
+    """Yield a session factory bound to a fresh, fully created SQLite file"""
+    directory = tempfile.mkdtemp(prefix="ais_bench_")
+    engine = create_engine(
+        f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def timed(label: str, results: dict):
+    start = time.perf_counter()
+    yield
+    results[label] = time.perf_counter() - start
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
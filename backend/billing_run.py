@@ -0,0 +1,91 @@
+"""Run a bulk billing run from the command line.
+
+Same engine as POST /api/payments/billing-runs; re-running with the same
+--run-id is a no-op. Examples (from the backend directory):
+
+    python billing_run.py --run-id tuition-2025-winter --type TUITION \\
+        --description "Tuition Fee - Winter 2025/26" --amount 500 --due-date 2025-10-31
+
+    python billing_run.py --run-id rent-2025-11 --type DORMITORY \\
+        --description "Dormitory Fee - November 2025" --residents --dry-run
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from database import SessionLocal, engine, Base
+import models  # noqa: F401 - registers every table on Base.metadata
+from models.user import User, UserRole
+from models.payment import PaymentType
+from services import billing
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create one payment per matching user")
+    parser.add_argument("--run-id", required=True, help="idempotency key of the run")
+    parser.add_argument("--type", required=True, choices=[t.name for t in PaymentType])
+    parser.add_argument("--description", required=True)
+    parser.add_argument("--amount", type=float, help="omit to bill each resident their dormitory's rent")
+    parser.add_argument("--due-date", type=datetime.fromisoformat)
+    parser.add_argument("--role", default=UserRole.STUDENT.value, choices=[r.value for r in UserRole])
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids")
+    parser.add_argument("--subject-id", type=int)
+    parser.add_argument("--semester")
+    parser.add_argument("--dormitory-id", type=int)
+    parser.add_argument("--residents", action="store_true", help="only users with an approved dormitory application")
+    parser.add_argument("--admin-email", help="admin recorded in the activity log (default: first admin)")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Same shape as BillingRunCreate.model_dump() so the run id can be replayed through the API
+    params = {
+        "payment_type": PaymentType[args.type],
+        "description": args.description,
+        "amount": args.amount,
+        "due_date": args.due_date,
+        "criteria": {
+            "role": UserRole(args.role),
+            "user_ids": args.user_ids,
+            "subject_id": args.subject_id,
+            "semester": args.semester,
+            "dormitory_id": args.dormitory_id,
+            "dormitory_residents": args.residents,
+        },
+    }
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            preview = billing.preview_billing(db, params)
+            print(f"Would bill {preview['users']} users, €{preview['total_amount']:.2f} in total")
+            return 0
+
+        admins = db.query(User).filter(User.role == UserRole.ADMIN)
+        if args.admin_email:
+            admins = admins.filter(User.email == args.admin_email)
+        admin = admins.order_by(User.id).first()
+        if not admin:
+            print("No admin user found", file=sys.stderr)
+            return 1
+
+        run, created = billing.run_billing(db, args.run_id, params, created_by=admin.id, user_agent="billing_run.py")
+        if created:
+            print(f"Created {run.payments_created} payments, €{run.total_amount:.2f} in total")
+        else:
+            print(f"Run {run.id} already exists: {run.payments_created} payments, €{run.total_amount:.2f}")
+        if run.payments_created:
+            print(f"Invoices {run.first_invoice_number} - {run.last_invoice_number}")
+        return 0
+    except (billing.BillingRunInvalid, billing.BillingRunConflict) as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
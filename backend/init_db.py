@@ -11,7 +11,7 @@ if db_path.exists():
 
 from database import SessionLocal, engine, Base
 from models.user import User, UserRole
-from models.subject import Subject, Semester
+from models.subject import Subject, Semester, SubjectPrerequisite
 from models.dormitory import Dormitory
 from models.schedule import Schedule, DayOfWeek, ClassType
 from models.enrollment import Enrollment, EnrollmentStatus
@@ -19,7 +19,11 @@ from models.grade import Grade, GradeLetter
 from models.payment import Payment, PaymentType, PaymentStatus
 from models.notification import Notification, NotificationType
 from models.assignment import Assignment, StudentSubmission
+from models.exam import Exam, ExamType
 from models.activity_log import ActivityLog
+from services import enrollments as enrollment_seats
+from services import occurrences
+from services import exams as exam_seats
 import bcrypt
 
 
@@ -50,6 +54,7 @@ def init_db():
             is_active=True,
             phone="+421 123 456 789",
             address="Hlavná 1, Košice",
+            study_group="INF-1A",
             theme="light",
             language="en",
             timezone="Europe/Bratislava",
@@ -64,6 +69,7 @@ def init_db():
             full_name="Jane Doe",
             role=UserRole.STUDENT,
             is_active=True,
+            study_group="INF-1B",
             theme="light",
             language="sk",
             timezone="Europe/Bratislava",
@@ -128,6 +134,11 @@ def init_db():
         db.commit()
         for subj in created_subjects:
             db.refresh(subj)
+        
+        # ALGO builds on PROG101, NETW on WEBTECH
+        db.add(SubjectPrerequisite(subject_id=created_subjects[3].id, prerequisite_id=created_subjects[2].id))
+        db.add(SubjectPrerequisite(subject_id=created_subjects[4].id, prerequisite_id=created_subjects[0].id))
+        db.commit()
         print(f"  Created {len(created_subjects)} subjects")
         
         # Create schedules
@@ -145,8 +156,10 @@ def init_db():
             sched = Schedule(**sched_data)
             db.add(sched)
         
+        db.flush()
+        sessions = occurrences.rebuild_all(db)
         db.commit()
-        print(f"  Created {len(schedules_data)} schedule entries")
+        print(f"  Created {len(schedules_data)} schedule entries ({sessions} dated sessions)")
         
         # Create enrollments for student
         print("Creating enrollments...")
@@ -169,6 +182,8 @@ def init_db():
             )
             db.add(enrollment)
         
+        db.flush()
+        enrollment_seats.recount(db)
         db.commit()
         print(f"  Created enrollments for students")
         
@@ -296,6 +311,25 @@ def init_db():
         db.commit()
         print(f"  Created 1 sample submission")
         
+        # Create exams
+        print("Creating exams...")
+        exam_day = (datetime.now() + timedelta(days=30)).replace(hour=9, minute=0, second=0, microsecond=0)
+        exams_data = [
+            {"subject_id": created_subjects[0].id, "exam_type": ExamType.FINAL, "starts_at": exam_day, "room": "PK6 A100", "capacity": 40},
+            {"subject_id": created_subjects[1].id, "exam_type": ExamType.FINAL, "starts_at": exam_day + timedelta(days=7), "room": "PK6 A101", "capacity": 30},
+            {"subject_id": created_subjects[2].id, "exam_type": ExamType.FINAL, "starts_at": exam_day + timedelta(days=14), "room": "PK6 A102", "capacity": 30},
+            {"subject_id": created_subjects[0].id, "exam_type": ExamType.RETAKE, "starts_at": exam_day + timedelta(days=21), "room": "PK6 A100", "capacity": 20},
+        ]
+        created_exams = []
+        for exam_data in exams_data:
+            exam = Exam(semester="Winter 2025/26", duration_minutes=120, **exam_data)
+            db.add(exam)
+            created_exams.append(exam)
+        db.flush()
+        exam_seats.register(db, created_exams[0], student.id)
+        db.commit()
+        print(f"  Created {len(exams_data)} exams")
+        
         # Create activity logs
         print("Creating activity logs...")
         activity_logs_data = [
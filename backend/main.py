@@ -3,24 +3,30 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 from database import engine, Base
+from services.idempotency import IdempotencyMiddleware
+from services.admission import AdmissionMiddleware
 
 # Import all models to ensure they are registered with SQLAlchemy
 from models.user import User
-from models.subject import Subject
-from models.enrollment import Enrollment
-from models.schedule import Schedule
+from models.subject import Subject, SubjectPrerequisite
+from models.enrollment import Enrollment, WaitlistEntry
+from models.schedule import Schedule, SemesterCalendar, SemesterHoliday, ClassCancellation, ClassOccurrence
 from models.grade import Grade
-from models.payment import Payment
+from models.payment import Payment, InvoiceSequence, BillingRun
 from models.dormitory import Dormitory, DormitoryApplication
 from models.thesis import Thesis
 from models.notification import Notification
 from models.assignment import Assignment, StudentSubmission
+from models.exam import Exam, ExamRegistration
 from models.activity_log import ActivityLog
 from models.document import Document
+from models.upload_session import UploadSession
+from models.job_lease import JobLease
+from models.idempotency_key import IdempotencyKey
 
 # Import routers
 from routers import auth, subjects, enrollments, schedules, grades, payments, dormitories, theses, notifications
-from routers import dashboard, profile, assignments, settings, activity, twofa, documents
+from routers import dashboard, profile, assignments, settings, activity, twofa, documents, calendar, deadlines, exams
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -36,6 +42,14 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Replay stored responses for retried requests carrying an Idempotency-Key.
+# Added before CORS so CORS stays outermost and also covers replays.
+app.add_middleware(IdempotencyMiddleware)
+
+# Queue registration-day spikes before they reach the handlers (and claim
+# idempotency keys); see services/admission.py for the per-route gates
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Batch-Job-Id", "Upload-Offset", "Location", "Idempotent-Replayed", "X-Queue-Ticket"],
 )
 
 # Mount static files for uploads
@@ -65,6 +80,31 @@ app.include_router(settings.router)
 app.include_router(activity.router)
 app.include_router(twofa.router)
 app.include_router(documents.router)
+app.include_router(calendar.router)
+app.include_router(deadlines.router)
+app.include_router(exams.router)
+
+
+@app.on_event("startup")
+def start_scheduler():
+    """Register and start periodic maintenance jobs"""
+    from services import reconciler, resumable_uploads, overdue, idempotency, transcripts
+    from services.scheduler import scheduler
+    for service in (reconciler, resumable_uploads, overdue, idempotency, transcripts):
+        if scheduler.get_job(service.JOB_NAME) is None:
+            service.register(scheduler)
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Stop the scheduler and background worker pools"""
+    from services import pdf, previews, timetabling
+    from services.scheduler import scheduler
+    scheduler.shutdown()
+    pdf.renderer.shutdown()
+    previews.pipeline.shutdown()
+    timetabling.shutdown()
 
 
 @app.get("/")
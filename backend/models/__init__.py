@@ -1,27 +1,35 @@
 from models.user import User, UserRole
-from models.subject import Subject, Semester
-from models.enrollment import Enrollment, EnrollmentStatus
-from models.schedule import Schedule, DayOfWeek, ClassType
+from models.subject import Subject, Semester, SubjectPrerequisite
+from models.enrollment import Enrollment, EnrollmentStatus, WaitlistEntry
+from models.schedule import Schedule, DayOfWeek, ClassType, SemesterCalendar, SemesterHoliday, ClassCancellation, ClassOccurrence
 from models.grade import Grade, GradeLetter
-from models.payment import Payment, PaymentType, PaymentStatus, PaymentMethod
+from models.payment import Payment, PaymentType, PaymentStatus, PaymentMethod, InvoiceSequence, BillingRun
 from models.dormitory import Dormitory, DormitoryApplication, ApplicationStatus
 from models.thesis import Thesis, ThesisType, ThesisStatus
 from models.notification import Notification, NotificationType
 from models.assignment import Assignment, StudentSubmission
+from models.exam import Exam, ExamType, ExamRegistration
 from models.activity_log import ActivityLog
-from models.document import Document, DocumentType
+from models.document import Document, DocumentType, PreviewStatus
+from models.upload_session import UploadSession
+from models.job_lease import JobLease
+from models.idempotency_key import IdempotencyKey
 
 __all__ = [
     "User", "UserRole",
-    "Subject", "Semester",
-    "Enrollment", "EnrollmentStatus",
-    "Schedule", "DayOfWeek", "ClassType",
+    "Subject", "Semester", "SubjectPrerequisite",
+    "Enrollment", "EnrollmentStatus", "WaitlistEntry",
+    "Schedule", "DayOfWeek", "ClassType", "SemesterCalendar", "SemesterHoliday", "ClassCancellation", "ClassOccurrence",
     "Grade", "GradeLetter",
-    "Payment", "PaymentType", "PaymentStatus", "PaymentMethod",
+    "Payment", "PaymentType", "PaymentStatus", "PaymentMethod", "InvoiceSequence", "BillingRun",
     "Dormitory", "DormitoryApplication", "ApplicationStatus",
     "Thesis", "ThesisType", "ThesisStatus",
     "Notification", "NotificationType",
     "Assignment", "StudentSubmission",
+    "Exam", "ExamType", "ExamRegistration",
     "ActivityLog",
-    "Document", "DocumentType",
+    "Document", "DocumentType", "PreviewStatus",
+    "UploadSession",
+    "JobLease",
+    "IdempotencyKey",
 ]
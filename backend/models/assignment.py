@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -6,6 +6,10 @@ from database import Base
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        # Upcoming deadlines are a due date range over the user's subjects
+        Index("ix_assignments_subject_due_date", "subject_id", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -15,19 +15,33 @@ class DocumentType(str, enum.Enum):
     OTHER = "other"
 
 
+class PreviewStatus(str, enum.Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    UNSUPPORTED = "unsupported"
+
+
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    filename = Column(String, nullable=False)
+    filename = Column(String, nullable=False, index=True)
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=True)
     mime_type = Column(String, nullable=True)
+    sha256 = Column(String(64), nullable=True)
     document_type = Column(SQLEnum(DocumentType), nullable=False)
     description = Column(String, nullable=True)
     uploaded_at = Column(DateTime, server_default=func.now())
+    file_missing = Column(Boolean, default=False, nullable=False)  # Set by the uploads reconciler
+    
+    # Thumbnail (images) or first-page extract (PDFs), generated in the background
+    preview_path = Column(String, nullable=True)
+    preview_mime_type = Column(String, nullable=True)
+    preview_status = Column(SQLEnum(PreviewStatus), default=PreviewStatus.UNSUPPORTED, nullable=False)
     
     # Optional reference to related entities
     assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="SET NULL"), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -14,6 +14,9 @@ class EnrollmentStatus(str, enum.Enum):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        UniqueConstraint("student_id", "subject_id", "semester", name="uq_enrollments_student_subject_semester"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -25,3 +28,26 @@ class Enrollment(Base):
     # Relationships with passive_deletes for cascade
     student = relationship("User", foreign_keys=[student_id], back_populates="enrollments", passive_deletes=True)
     subject = relationship("Subject", back_populates="enrollments", passive_deletes=True)
+
+
+class WaitlistEntry(Base):
+    """A student queued for a seat in a full subject.
+
+    ``position`` grows per subject and is never renumbered, so the head of
+    the queue is an index seek on (subject_id, position).
+    """
+    __tablename__ = "waitlist_entries"
+    __table_args__ = (
+        Index("ix_waitlist_subject_position", "subject_id", "position", unique=True),
+        UniqueConstraint("student_id", "subject_id", "semester", name="uq_waitlist_student_subject_semester"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
+    semester = Column(String, nullable=False)
+    position = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    
+    student = relationship("User", foreign_keys=[student_id], back_populates="waitlist_entries", passive_deletes=True)
+    subject = relationship("Subject", back_populates="waitlist_entries", passive_deletes=True)
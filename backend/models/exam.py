@@ -0,0 +1,59 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, CheckConstraint, Index, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import enum
+from database import Base
+
+
+class ExamType(str, enum.Enum):
+    MIDTERM = "Midterm"
+    FINAL = "Final Exam"
+    RETAKE = "Retake"
+
+
+class Exam(Base):
+    """An exam date of a subject; students register for a seat"""
+    __tablename__ = "exams"
+    __table_args__ = (
+        # Upcoming exams of a set of subjects are a range scan per subject
+        Index("ix_exams_subject_starts_at", "subject_id", "starts_at"),
+        CheckConstraint("registered_count <= capacity", name="ck_exams_within_capacity"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
+    semester = Column(String, nullable=False)
+    exam_type = Column(SQLEnum(ExamType), default=ExamType.FINAL, nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    duration_minutes = Column(Integer, default=90, nullable=False)
+    room = Column(String, nullable=False)
+    # registered_count is maintained by services.exams
+    capacity = Column(Integer, nullable=False)
+    registered_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Registration closes at this time, or when the exam starts if NULL
+    registration_deadline = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    subject = relationship("Subject", back_populates="exams", passive_deletes=True)
+    registrations = relationship("ExamRegistration", back_populates="exam", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class ExamRegistration(Base):
+    __tablename__ = "exam_registrations"
+    __table_args__ = (
+        UniqueConstraint("exam_id", "student_id", name="uq_exam_registrations_exam_student"),
+        UniqueConstraint("exam_id", "room", "seat_number", name="uq_exam_registrations_exam_seat"),
+        # "Where do I sit?" is answered from the index alone
+        Index("ix_exam_registrations_student_seat", "student_id", "exam_id", "room", "seat_number"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    exam_id = Column(Integer, ForeignKey("exams.id", ondelete="CASCADE"), nullable=False)
+    student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    registered_at = Column(DateTime, server_default=func.now())
+    # Set by services.exam_seating; NULL until seats are allocated
+    room = Column(String, nullable=True)
+    seat_number = Column(Integer, nullable=True)
+
+    exam = relationship("Exam", back_populates="registrations", passive_deletes=True)
+    student = relationship("User", foreign_keys=[student_id], passive_deletes=True)
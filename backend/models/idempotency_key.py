@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from database import Base
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an ``Idempotency-Key`` header"""
+    __tablename__ = "idempotency_keys"
+
+    key_hash = Column(String(64), primary_key=True)  # sha256 of user + client key
+    request_hash = Column(String(64), nullable=True)  # sha256 of method, path and body
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is in flight
+    content_type = Column(String, nullable=True)
+    location = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)  # zlib-compressed response body
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+
+class JobLease(Base):
+    """Leader lease for a scheduled job shared by several worker processes"""
+    __tablename__ = "job_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
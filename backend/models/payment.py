@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Index, Text, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -29,9 +29,15 @@ class PaymentMethod(str, enum.Enum):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Overdue / due-soon views filter on status and a due date range
+        Index("ix_payments_status_due_date", "status", "due_date"),
+        # A user's upcoming payments, see services/deadlines.py
+        Index("ix_payments_user_due_date", "user_id", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     payment_type = Column(SQLEnum(PaymentType), nullable=False)
     description = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
@@ -39,8 +45,34 @@ class Payment(Base):
     due_date = Column(DateTime, nullable=True)
     paid_date = Column(DateTime, nullable=True)
     payment_method = Column(SQLEnum(PaymentMethod), nullable=True)
-    invoice_number = Column(String, nullable=True)
+    invoice_number = Column(String, nullable=True, unique=True, index=True)
+    billing_run_id = Column(String, ForeignKey("billing_runs.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="payments", passive_deletes=True)
+
+
+class InvoiceSequence(Base):
+    """Next free invoice number per calendar year; see services/invoices.py"""
+    __tablename__ = "invoice_sequences"
+
+    year = Column(Integer, primary_key=True, autoincrement=False)
+    next_value = Column(Integer, nullable=False)
+
+
+class BillingRun(Base):
+    """One bulk billing run; the client-chosen id makes re-submitting it a no-op"""
+    __tablename__ = "billing_runs"
+
+    id = Column(String, primary_key=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    payment_type = Column(SQLEnum(PaymentType), nullable=False)
+    description = Column(String, nullable=False)
+    parameters = Column(Text, nullable=False)  # canonical JSON of the request, to detect id reuse
+    payments_created = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Float, default=0, nullable=False)
+    first_invoice_number = Column(String, nullable=True)
+    last_invoice_number = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
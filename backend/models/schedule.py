@@ -1,8 +1,30 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Date, DateTime, Integer, String, ForeignKey, Index, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql import func
+from typing import Tuple
 import enum
+import re
 from database import Base
 
+_TIME_RANGE = re.compile(r"^\s*(\d{1,2})[:.](\d{2})\s*[-–]\s*(\d{1,2})[:.](\d{2})\s*$")
+
+
+def parse_time_range(value: str) -> Tuple[int, int]:
+    """``"09:00-10:30"`` -> ``(540, 630)``, minutes since midnight"""
+    found = _TIME_RANGE.match(value or "")
+    if not found:
+        raise ValueError(f"Time must look like HH:MM-HH:MM, got {value!r}")
+    start_h, start_m, end_h, end_m = (int(part) for part in found.groups())
+    start = start_h * 60 + start_m
+    end = end_h * 60 + end_m
+    if start_m > 59 or end_m > 59 or end > 24 * 60 or start >= end:
+        raise ValueError(f"Invalid time range {value!r}")
+    return start, end
+
+
+def format_time_range(start: int, end: int) -> str:
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
 
 class DayOfWeek(str, enum.Enum):
     MONDAY = "Monday"
@@ -23,14 +45,89 @@ class ClassType(str, enum.Enum):
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    __table_args__ = (
+        Index("ix_schedules_day_room_start", "day", "room", "start_minute"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
     day = Column(SQLEnum(DayOfWeek), nullable=False)
     time = Column(String, nullable=False)
+    # Parsed from ``time`` whenever it is set; minutes since midnight
+    start_minute = Column(Integer, nullable=True)
+    end_minute = Column(Integer, nullable=True)
     room = Column(String, nullable=False)
     class_type = Column(SQLEnum(ClassType), default=ClassType.LECTURE, nullable=False)
     semester = Column(String, nullable=False)
     
     # Relationships with passive_deletes
     subject = relationship("Subject", back_populates="schedules", passive_deletes=True)
+    cancellations = relationship("ClassCancellation", back_populates="schedule", cascade="all, delete-orphan", passive_deletes=True)
+
+    @validates("time")
+    def _parse_time(self, key, value):
+        self.start_minute, self.end_minute = parse_time_range(value)
+        return format_time_range(self.start_minute, self.end_minute)
+
+
+class SemesterCalendar(Base):
+    """Teaching period of a semester; without one the default dates apply"""
+    __tablename__ = "semester_calendars"
+
+    id = Column(Integer, primary_key=True, index=True)
+    semester = Column(String, unique=True, index=True, nullable=False)
+    starts_on = Column(Date, nullable=False)
+    ends_on = Column(Date, nullable=False)
+
+    holidays = relationship("SemesterHoliday", back_populates="calendar", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class SemesterHoliday(Base):
+    """A day without teaching"""
+    __tablename__ = "semester_holidays"
+    __table_args__ = (
+        UniqueConstraint("calendar_id", "date", name="uq_semester_holidays_calendar_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    calendar_id = Column(Integer, ForeignKey("semester_calendars.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    name = Column(String, nullable=False)
+
+    calendar = relationship("SemesterCalendar", back_populates="holidays", passive_deletes=True)
+
+
+class ClassCancellation(Base):
+    """One session of a weekly class that does not take place"""
+    __tablename__ = "class_cancellations"
+    __table_args__ = (
+        UniqueConstraint("schedule_id", "date", name="uq_class_cancellations_schedule_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    schedule_id = Column(Integer, ForeignKey("schedules.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    reason = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    schedule = relationship("Schedule", back_populates="cancellations", passive_deletes=True)
+
+
+class ClassOccurrence(Base):
+    """One dated session of a weekly class, materialized by services.occurrences"""
+    __tablename__ = "class_occurrences"
+    __table_args__ = (
+        Index("ix_class_occurrences_subject_starts", "subject_id", "starts_at"),
+        Index("ix_class_occurrences_starts", "starts_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    schedule_id = Column(Integer, ForeignKey("schedules.id", ondelete="CASCADE"), nullable=False, index=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
+    semester = Column(String, nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    room = Column(String, nullable=False)
+    class_type = Column(SQLEnum(ClassType), nullable=False)
+    cancelled = Column(Boolean, default=False, nullable=False)
+    note = Column(String, nullable=True)  # Cancellation reason
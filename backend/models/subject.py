@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, CheckConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 import enum
 from database import Base
@@ -19,10 +19,26 @@ class Subject(Base):
     semester = Column(SQLEnum(Semester), nullable=False)
     description = Column(Text, nullable=True)
     teacher_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    # Seats; NULL means unlimited. enrolled_count is maintained by services.enrollments
+    capacity = Column(Integer, nullable=True)
+    enrolled_count = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Relationships - cascade delete for child records
     teacher = relationship("User", foreign_keys=[teacher_id], back_populates="taught_subjects")
     enrollments = relationship("Enrollment", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
+    waitlist_entries = relationship("WaitlistEntry", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
     schedules = relationship("Schedule", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
     grades = relationship("Grade", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
     assignments = relationship("Assignment", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
+    exams = relationship("Exam", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class SubjectPrerequisite(Base):
+    """``subject_id`` requires passing ``prerequisite_id`` first"""
+    __tablename__ = "subject_prerequisites"
+    __table_args__ = (
+        CheckConstraint("subject_id != prerequisite_id", name="ck_subject_prerequisites_not_self"),
+    )
+
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True)
+    prerequisite_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Enum as SQLEnum, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Enum as SQLEnum, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -21,6 +21,10 @@ class ThesisStatus(str, enum.Enum):
 
 class Thesis(Base):
     __tablename__ = "theses"
+    __table_args__ = (
+        Index("ix_theses_student_submission_deadline", "student_id", "submission_deadline"),
+        Index("ix_theses_student_defense_date", "student_id", "defense_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, BigInteger, Enum as SQLEnum
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from database import Base
+from models.document import DocumentType
+
+
+class UploadSession(Base):
+    """A resumable upload in progress; becomes a Document on finalize"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, also names the partial file
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    original_filename = Column(String, nullable=False)
+    mime_type = Column(String, nullable=False)
+    document_type = Column(SQLEnum(DocumentType), nullable=False)
+    description = Column(String, nullable=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="SET NULL"), nullable=True)
+    thesis_id = Column(Integer, ForeignKey("theses.id", ondelete="SET NULL"), nullable=True)
+    total_size = Column(BigInteger, nullable=False)
+    offset = Column(BigInteger, default=0, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="upload_sessions", passive_deletes=True)
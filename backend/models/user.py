@@ -24,6 +24,7 @@ class User(Base):
     phone = Column(String, nullable=True)
     address = Column(String, nullable=True)
     profile_picture_url = Column(String, nullable=True)
+    study_group = Column(String, nullable=True)  # e.g. "INF-1A"; exam seating keeps a group apart
     
     # Settings fields
     theme = Column(String, default="light", nullable=False)
@@ -32,9 +33,11 @@ class User(Base):
     notifications_enabled = Column(Boolean, default=True, nullable=False)
     two_factor_enabled = Column(Boolean, default=False, nullable=False)
     two_factor_secret = Column(String, nullable=True)  # For 2FA TOTP secret
+    calendar_token = Column(String, unique=True, index=True, nullable=True)  # Secret in the .ics feed URL
 
     # Relationships - cascade delete for owned records
     enrollments = relationship("Enrollment", back_populates="student", foreign_keys="Enrollment.student_id", cascade="all, delete-orphan", passive_deletes=True)
+    waitlist_entries = relationship("WaitlistEntry", back_populates="student", foreign_keys="WaitlistEntry.student_id", cascade="all, delete-orphan", passive_deletes=True)
     grades = relationship("Grade", back_populates="student", foreign_keys="Grade.student_id", cascade="all, delete-orphan", passive_deletes=True)
     payments = relationship("Payment", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     dormitory_applications = relationship("DormitoryApplication", back_populates="student", cascade="all, delete-orphan", passive_deletes=True)
@@ -43,6 +46,7 @@ class User(Base):
     submissions = relationship("StudentSubmission", back_populates="student", cascade="all, delete-orphan", passive_deletes=True)
     activity_logs = relationship("ActivityLog", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     documents = relationship("Document", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    upload_sessions = relationship("UploadSession", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     
     # For teachers - no cascade delete (subjects should remain if teacher is deleted)
     taught_subjects = relationship("Subject", back_populates="teacher", foreign_keys="Subject.teacher_id")
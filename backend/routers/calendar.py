@@ -0,0 +1,84 @@
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import Optional
+from database import get_db
+from auth import get_current_active_user
+from models.user import User
+from models.activity_log import ActivityLog
+from services import calendar_feed
+
+router = APIRouter(prefix="/api/calendar", tags=["Calendar"])
+
+
+# ============== SCHEMAS ==============
+
+class CalendarFeedResponse(BaseModel):
+    url: str
+
+
+# ============== HELPERS ==============
+
+def feed_response(user: User) -> CalendarFeedResponse:
+    return CalendarFeedResponse(url=f"{router.prefix}/feed/{user.calendar_token}.ics")
+
+
+def new_token(db: Session, user: User, request: Request, action: str):
+    user.calendar_token = secrets.token_urlsafe(24)
+    log = ActivityLog(
+        user_id=user.id,
+        action=action,
+        details="Calendar feed URL issued",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+
+
+# ============== ENDPOINTS ==============
+
+@router.get("/feed", response_model=CalendarFeedResponse)
+def get_calendar_feed_url(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the secret URL of the user's .ics feed, creating it on first use"""
+    if not current_user.calendar_token:
+        new_token(db, current_user, request, "calendar_feed_created")
+    return feed_response(current_user)
+
+
+@router.post("/feed/reset", response_model=CalendarFeedResponse)
+def reset_calendar_feed_url(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Replace the feed URL; the old one stops working"""
+    new_token(db, current_user, request, "calendar_feed_reset")
+    return feed_response(current_user)
+
+
+@router.get("/feed/{token}.ics")
+def get_calendar_feed(
+    token: str,
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
+):
+    """The user's classes, assignment due dates and thesis deadlines as iCalendar.
+
+    No login: calendar apps cannot send a JWT, the token in the URL is the
+    credential. Answers 304 when ``If-None-Match`` has the current ETag.
+    """
+    user = db.query(User).filter(User.calendar_token == token).first()
+    if not user or not user.is_active:
+        raise HTTPException(status_code=404, detail="Calendar feed not found")
+
+    feed = calendar_feed.feed(db, user)
+    headers = {"ETag": feed.etag, "Cache-Control": "private, max-age=300"}
+    if calendar_feed.etag_matches(if_none_match, feed.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed.body, media_type="text/calendar; charset=utf-8", headers=headers)
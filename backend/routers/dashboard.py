@@ -1,9 +1,9 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import datetime
 from database import get_db
 from auth import get_current_active_user
 from models.user import User, UserRole
@@ -12,6 +12,8 @@ from models.enrollment import Enrollment, EnrollmentStatus
 from models.schedule import Schedule
 from models.grade import Grade
 from models.notification import Notification
+from models.exam import Exam
+from services import exams as exam_service
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
@@ -112,12 +114,18 @@ def get_dashboard_stats(
         Notification.read == False
     ).scalar() or 0
     
+    # Count upcoming exams of the user's subjects
+    upcoming_exams = db.query(func.count(Exam.id)).filter(
+        Exam.subject_id.in_(exam_service.subject_ids_of(db, current_user)),
+        Exam.starts_at >= datetime.now()
+    ).scalar() or 0
+    
     return DashboardStats(
         enrolled_subjects=enrolled_count,
         total_credits=total_credits,
         average_grade=avg_grade,
         unread_notifications=unread,
-        upcoming_exams=2  # Placeholder
+        upcoming_exams=upcoming_exams
     )
 
 
@@ -198,33 +206,25 @@ def get_dashboard_schedule(
 
 @router.get("/exams", response_model=List[DashboardExam])
 def get_dashboard_exams(
+    limit: int = Query(5, ge=1, le=50),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get upcoming exams for dashboard"""
-    # Return sample exam data (in a real app, this would come from an exams table)
-    if current_user.role == UserRole.STUDENT:
-        enrollments = db.query(Enrollment).filter(
-            Enrollment.student_id == current_user.id,
-            Enrollment.status == EnrollmentStatus.CONFIRMED
-        ).limit(3).all()
-        
-        exams = []
-        for i, enrollment in enumerate(enrollments):
-            if enrollment.subject:
-                exam_date = datetime.now() + timedelta(days=30 + i * 7)
-                exams.append(DashboardExam(
-                    id=i + 1,
-                    subject_code=enrollment.subject.code,
-                    subject_name=enrollment.subject.name,
-                    date=exam_date.strftime("%B %d, %Y"),
-                    time="09:00",
-                    room=f"PK6 A{100 + i}",
-                    type="Final Exam"
-                ))
-        return exams
+    """Get upcoming exams of the user's subjects for dashboard"""
+    rows = exam_service.upcoming(db, exam_service.subject_ids_of(db, current_user)).limit(limit).all()
     
-    return []
+    return [
+        DashboardExam(
+            id=exam.id,
+            subject_code=code,
+            subject_name=name,
+            date=exam.starts_at.strftime("%B %d, %Y"),
+            time=exam.starts_at.strftime("%H:%M"),
+            room=exam.room,
+            type=exam.exam_type.value
+        )
+        for exam, code, name in rows
+    ]
 
 
 @router.get("/notifications", response_model=List[DashboardNotification])
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from database import get_db
+from auth import get_current_active_user
+from models.user import User
+from services import deadlines
+
+router = APIRouter(prefix="/api/deadlines", tags=["Deadlines"])
+
+
+# ============== SCHEMAS ==============
+
+class DeadlineResponse(BaseModel):
+    kind: str
+    id: int
+    title: str
+    due_at: datetime
+    subject_id: Optional[int] = None
+    subject_code: Optional[str] = None
+    subject_name: Optional[str] = None
+    amount: Optional[float] = None
+    status: Optional[str] = None
+
+
+# ============== ENDPOINTS ==============
+
+@router.get("/", response_model=List[DeadlineResponse])
+def get_deadlines(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(deadlines.DEFAULT_LIMIT, ge=1, le=deadlines.MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """What's due next: assignments, exams, thesis dates and unpaid payments
+    in one list, soonest first, from ``start`` (default now) until before ``end``"""
+    start = start or datetime.now()
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return [
+        DeadlineResponse(**deadline._asdict())
+        for deadline in deadlines.upcoming(db, current_user, start, end, limit)
+    ]
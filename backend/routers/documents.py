@@ -1,20 +1,26 @@
 import os
 import uuid
+import hashlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Query, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, ConfigDict
 from io import BytesIO
 from database import get_db
 from auth import get_current_active_user, require_admin
 from models.user import User, UserRole
-from models.document import Document, DocumentType
+from models.document import Document, DocumentType, PreviewStatus
 from models.enrollment import Enrollment
-from models.grade import Grade
 from models.subject import Subject
 from models.activity_log import ActivityLog
+from models.upload_session import UploadSession
+from services import transcripts, pdf, previews, reconciler, resumable_uploads
+from services.scheduler import scheduler
 
 router = APIRouter(prefix="/api/documents", tags=["Documents"])
 
@@ -22,6 +28,15 @@ router = APIRouter(prefix="/api/documents", tags=["Documents"])
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+ALLOWED_MIME_TYPES = [
+    "application/pdf",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "image/jpeg",
+    "image/png",
+    "text/plain"
+]
+
 
 # ============== SCHEMAS ==============
 
@@ -35,6 +50,8 @@ class DocumentResponse(BaseModel):
     document_type: DocumentType
     description: Optional[str] = None
     uploaded_at: Optional[datetime] = None
+    preview_status: PreviewStatus = PreviewStatus.UNSUPPORTED
+    file_missing: bool = False
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -47,6 +64,43 @@ class DocumentUploadResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    mime_type: str
+    size: int
+    document_type: DocumentType
+    description: Optional[str] = None
+    assignment_id: Optional[int] = None
+    thesis_id: Optional[int] = None
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    offset: int
+    expires_at: datetime
+    chunk_size: int = resumable_uploads.RECOMMENDED_CHUNK_SIZE
+
+
+class BatchTranscriptRequest(BaseModel):
+    subject_id: Optional[int] = None
+    semester: Optional[str] = None
+
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    done: int
+    subject_id: Optional[int] = None
+    semester: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_ready: bool
+
+
 # ============== HELPER FUNCTIONS ==============
 
 def generate_enrollment_proof_html(user: User, db: Session) -> str:
@@ -118,105 +172,98 @@ def generate_enrollment_proof_html(user: User, db: Session) -> str:
 
 def generate_grade_transcript_html(user: User, db: Session) -> str:
     """Generate HTML for grade transcript"""
-    grades = db.query(Grade).filter(Grade.student_id == user.id).all()
-    
-    grades_html = ""
-    total_credits = 0
-    weighted_sum = 0
-    
-    for g in grades:
-        subject = db.query(Subject).filter(Subject.id == g.subject_id).first()
-        if subject:
-            credits = subject.credits or 0
-            total_credits += credits
-            weighted_sum += g.numeric_grade * credits
-            grades_html += f"<tr><td>{subject.code}</td><td>{subject.name}</td><td>{credits}</td><td>{g.grade.value}</td><td>{g.numeric_grade:.2f}</td><td>{g.semester}</td></tr>"
-    
-    gpa = weighted_sum / total_credits if total_credits > 0 else 0
-    
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Grade Transcript - AIS TUKE</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; padding: 40px; }}
-            h1 {{ color: #c41e3a; }}
-            .header {{ border-bottom: 2px solid #c41e3a; padding-bottom: 20px; margin-bottom: 30px; }}
-            .info {{ margin: 20px 0; }}
-            .info p {{ margin: 5px 0; }}
-            table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
-            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: left; }}
-            th {{ background-color: #c41e3a; color: white; }}
-            .summary {{ margin-top: 30px; padding: 20px; background: #f5f5f5; }}
-            .footer {{ margin-top: 50px; font-size: 12px; color: #666; }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Technical University of Košice</h1>
-            <h2>Official Grade Transcript</h2>
-        </div>
-        
-        <div class="info">
-            <p><strong>Student Name:</strong> {user.full_name or 'N/A'}</p>
-            <p><strong>Email:</strong> {user.email}</p>
-            <p><strong>Student ID:</strong> {user.id}</p>
-            <p><strong>Date Issued:</strong> {datetime.now().strftime('%B %d, %Y')}</p>
-        </div>
-        
-        <h3>Academic Record</h3>
-        <table>
-            <tr>
-                <th>Code</th>
-                <th>Subject Name</th>
-                <th>Credits</th>
-                <th>Grade</th>
-                <th>Points</th>
-                <th>Semester</th>
-            </tr>
-            {grades_html}
-        </table>
-        
-        <div class="summary">
-            <p><strong>Total Credits:</strong> {total_credits}</p>
-            <p><strong>GPA:</strong> {gpa:.2f}</p>
-        </div>
-        
-        <div class="footer">
-            <p>This document was generated electronically and is valid without signature.</p>
-            <p>Technical University of Košice, Letná 9, 042 00 Košice, Slovakia</p>
-        </div>
-    </body>
-    </html>
-    """
+    rows = transcripts.load_transcript_rows(db, [user.id])[user.id]
+    student = {"id": user.id, "full_name": user.full_name, "email": user.email}
+    return transcripts.render_grade_transcript_html(student, rows, datetime.now())
+
+
+def grade_transcript_data(user: User, db: Session) -> dict:
+    """Collect the data rendered into a grade transcript PDF"""
+    rows = transcripts.load_transcript_rows(db, [user.id])[user.id]
+    total_credits = sum(credits or 0 for _, _, credits, _, _, _ in rows)
+    weighted_sum = sum(numeric * (credits or 0) for _, _, credits, _, numeric, _ in rows)
+    return {
+        "user_id": user.id,
+        "full_name": user.full_name,
+        "email": user.email,
+        "issued_on": datetime.now().strftime('%B %d, %Y'),
+        "rows": rows,
+        "total_credits": total_credits,
+        "gpa": weighted_sum / total_credits if total_credits > 0 else 0,
+    }
+
+
+def enrollment_proof_data(user: User, db: Session) -> dict:
+    """Collect the data rendered into an enrollment proof PDF"""
+    rows = db.query(Subject.code, Subject.name, Enrollment.semester, Enrollment.status).join(
+        Subject, Subject.id == Enrollment.subject_id
+    ).filter(Enrollment.student_id == user.id).order_by(Enrollment.id).all()
+    return {
+        "user_id": user.id,
+        "full_name": user.full_name,
+        "email": user.email,
+        "issued_on": datetime.now().strftime('%B %d, %Y'),
+        "rows": [(code, name, semester, status.value) for code, name, semester, status in rows],
+    }
+
+
+def invoice_data(payment, user: Optional[User]) -> dict:
+    """Collect the data rendered into an invoice PDF"""
+    return {
+        "invoice_number": payment.invoice_number,
+        "created_on": payment.created_at.strftime('%B %d, %Y') if payment.created_at else None,
+        "due_on": payment.due_date.strftime('%B %d, %Y') if payment.due_date else None,
+        "full_name": user.full_name if user else None,
+        "email": user.email if user else None,
+        "payment_type": payment.payment_type.value,
+        "description": payment.description,
+        "amount": payment.amount,
+        "status": payment.status.value,
+        "paid_on": payment.paid_date.strftime('%B %d, %Y') if payment.paid_date else None,
+        "payment_method": payment.payment_method.value if payment.payment_method else None,
+    }
+
+
+def pdf_response(kind: str, data: dict, filename: str) -> Response:
+    """Render through the shared PDF worker pool and return it as a download"""
+    try:
+        content = pdf.renderer.render(kind, data)
+    except pdf.PdfQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Document rendering is busy, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except FutureTimeoutError:
+        # The render keeps running in the pool and lands in the cache, so a retry is cheap
+        raise HTTPException(
+            status_code=504,
+            detail="Document rendering timed out, please retry shortly",
+            headers={"Retry-After": "10"}
+        )
+    return Response(
+        content=content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 # ============== UPLOAD ENDPOINTS ==============
 
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_document(
+    request: Request,
     file: UploadFile = File(...),
     document_type: DocumentType = Form(...),
     description: Optional[str] = Form(None),
     assignment_id: Optional[int] = Form(None),
     thesis_id: Optional[int] = Form(None),
-    request: Request = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload a document"""
     # Validate file type
-    allowed_types = [
-        "application/pdf",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "image/jpeg",
-        "image/png",
-        "text/plain"
-    ]
-    
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"File type not allowed. Allowed types: PDF, DOC, DOCX, JPEG, PNG, TXT"
@@ -240,10 +287,12 @@ async def upload_document(
         file_path=file_path,
         file_size=len(content),
         mime_type=file.content_type,
+        sha256=hashlib.sha256(content).hexdigest(),
         document_type=document_type,
         description=description,
         assignment_id=assignment_id,
-        thesis_id=thesis_id
+        thesis_id=thesis_id,
+        preview_status=PreviewStatus.PENDING if previews.supports_preview(file.content_type) else PreviewStatus.UNSUPPORTED
     )
     db.add(doc)
     
@@ -252,14 +301,17 @@ async def upload_document(
         user_id=current_user.id,
         action="document_uploaded",
         details=f"Uploaded document: {file.filename} ({document_type.value})",
-        ip_address=request.client.host if request and request.client else None,
-        user_agent=request.headers.get("user-agent") if request else None
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
     )
     db.add(log)
     
     db.commit()
     db.refresh(doc)
     
+    # Thumbnail/preview is rendered in the background once the row exists
+    previews.pipeline.submit(doc.id, doc.file_path, doc.mime_type)
+    
     return DocumentUploadResponse(
         id=doc.id,
         filename=doc.original_filename,
@@ -277,6 +329,232 @@ def get_my_uploads(
     return docs
 
 
+# ============== RESUMABLE UPLOAD ENDPOINTS ==============
+
+def get_upload_session(upload_id: str, db: Session, current_user: User) -> UploadSession:
+    session = db.query(UploadSession).filter(UploadSession.id == upload_id).first()
+    if not session or session.expires_at < datetime.now():
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    if session.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return session
+
+
+def upload_session_response(session: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session.id,
+        filename=session.original_filename,
+        size=session.total_size,
+        offset=session.offset,
+        expires_at=session.expires_at
+    )
+
+
+def upload_offset_headers(session: UploadSession) -> dict:
+    return {
+        "Upload-Offset": str(session.offset),
+        "Upload-Length": str(session.total_size),
+        "Upload-Expires": session.expires_at.isoformat()
+    }
+
+
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+    upload: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Start a resumable upload; send the bytes with PATCH, then finalize"""
+    if upload.mime_type not in ALLOWED_MIME_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: PDF, DOC, DOCX, JPEG, PNG, TXT"
+        )
+    
+    if upload.size <= 0 or upload.size > resumable_uploads.MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload size must be between 1 byte and {resumable_uploads.MAX_UPLOAD_SIZE} bytes"
+        )
+    
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        original_filename=upload.filename,
+        mime_type=upload.mime_type,
+        document_type=upload.document_type,
+        description=upload.description,
+        assignment_id=upload.assignment_id,
+        thesis_id=upload.thesis_id,
+        total_size=upload.size,
+        offset=0,
+        expires_at=resumable_uploads.new_expiry()
+    )
+    resumable_uploads.create_partial(session.id)
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED,
+        content=jsonable_encoder(upload_session_response(session)),
+        headers={"Location": f"/api/documents/uploads/{session.id}", **upload_offset_headers(session)}
+    )
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+def get_upload_status(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the committed offset of a resumable upload (where to resume from)"""
+    session = get_upload_session(upload_id, db, current_user)
+    return JSONResponse(
+        content=jsonable_encoder(upload_session_response(session)),
+        headers=upload_offset_headers(session)
+    )
+
+
+@router.patch("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def append_upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Append the request body at ``Upload-Offset``; the body is streamed to disk.
+
+    The body has to be read on the event loop, so the file and database
+    calls go to the thread pool instead of blocking it.
+    """
+    session = await run_in_threadpool(get_upload_session, upload_id, db, current_user)
+    
+    lock = resumable_uploads.session_lock(upload_id)
+    if not lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another chunk for this upload is in progress")
+    try:
+        try:
+            f = await run_in_threadpool(resumable_uploads.open_for_append, session, upload_offset)
+        except resumable_uploads.OffsetMismatch as e:
+            raise HTTPException(status_code=409, detail=str(e), headers=upload_offset_headers(session))
+        
+        written = 0
+        try:
+            try:
+                async for chunk in request.stream():
+                    resumable_uploads.check_chunk_size(session, written + len(chunk))
+                    await run_in_threadpool(f.write, chunk)
+                    written += len(chunk)
+            finally:
+                await run_in_threadpool(f.close)
+        except resumable_uploads.UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e), headers=upload_offset_headers(session))
+        finally:
+            # Commit whatever reached the disk so a dropped connection can resume
+            if written:
+                session.offset += written
+                session.expires_at = resumable_uploads.new_expiry()
+                await run_in_threadpool(db.commit)
+    finally:
+        lock.release()
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=upload_offset_headers(session))
+
+
+@router.post("/uploads/{upload_id}/finalize", response_model=DocumentUploadResponse)
+def finalize_upload(
+    upload_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Hash the completed upload and turn it into a Document"""
+    session = get_upload_session(upload_id, db, current_user)
+    
+    lock = resumable_uploads.session_lock(upload_id)
+    if not lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A chunk for this upload is still in progress")
+    try:
+        if session.offset != session.total_size:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete: {session.offset} of {session.total_size} bytes received",
+                headers=upload_offset_headers(session)
+            )
+        
+        partial_path = resumable_uploads.partial_path(session.id)
+        with open(partial_path, "r+b") as f:
+            f.truncate(session.total_size)
+        digest = resumable_uploads.file_sha256(partial_path)
+        
+        file_ext = os.path.splitext(session.original_filename)[1]
+        unique_filename = f"{uuid.uuid4()}{file_ext}"
+        file_path = os.path.join(UPLOAD_DIR, unique_filename)
+        
+        doc = Document(
+            user_id=current_user.id,
+            filename=unique_filename,
+            original_filename=session.original_filename,
+            file_path=file_path,
+            file_size=session.total_size,
+            mime_type=session.mime_type,
+            sha256=digest,
+            document_type=session.document_type,
+            description=session.description,
+            assignment_id=session.assignment_id,
+            thesis_id=session.thesis_id,
+            preview_status=PreviewStatus.PENDING if previews.supports_preview(session.mime_type) else PreviewStatus.UNSUPPORTED
+        )
+        db.add(doc)
+        
+        log = ActivityLog(
+            user_id=current_user.id,
+            action="document_uploaded",
+            details=f"Uploaded document: {session.original_filename} ({session.document_type.value}, resumable)",
+            ip_address=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent")
+        )
+        db.add(log)
+        db.delete(session)
+        
+        # Move the blob into place, and back out again if the commit fails
+        os.replace(partial_path, file_path)
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            os.replace(file_path, partial_path)
+            raise
+        db.refresh(doc)
+    finally:
+        lock.release()
+    resumable_uploads.release_lock(upload_id)
+    
+    previews.pipeline.submit(doc.id, doc.file_path, doc.mime_type)
+    
+    return DocumentUploadResponse(
+        id=doc.id,
+        filename=doc.original_filename,
+        message="Document uploaded successfully"
+    )
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Abort a resumable upload and discard received bytes"""
+    session = get_upload_session(upload_id, db, current_user)
+    db.delete(session)
+    db.commit()
+    resumable_uploads.remove_partial(upload_id)
+    return None
+
+
 @router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_document(
     document_id: int,
@@ -292,9 +570,11 @@ def delete_document(
     if doc.user_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Delete file from disk
+    # Delete file and its preview from disk
     if os.path.exists(doc.file_path):
         os.remove(doc.file_path)
+    if doc.preview_path and os.path.exists(doc.preview_path):
+        os.remove(doc.preview_path)
     
     db.delete(doc)
     db.commit()
@@ -328,12 +608,48 @@ def download_uploaded_document(
     )
 
 
+@router.get("/{document_id}/preview")
+def get_document_preview(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the thumbnail (images) or first page (PDFs) of an uploaded document"""
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Only owner or admin can preview
+    if doc.user_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    if doc.preview_status == PreviewStatus.PENDING:
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"status": doc.preview_status.value})
+    
+    if doc.preview_status != PreviewStatus.READY or not doc.preview_path or not os.path.exists(doc.preview_path):
+        raise HTTPException(status_code=404, detail="Preview not available")
+    
+    return FileResponse(
+        path=doc.preview_path,
+        media_type=doc.preview_mime_type,
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
+
+
 @router.get("/download/enrollment-proof")
 def download_enrollment_proof(
+    format: str = Query("html", pattern="^(html|pdf)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Download proof of enrollment as HTML (can be printed to PDF)"""
+    """Download proof of enrollment as HTML or PDF"""
+    if format == "pdf":
+        return pdf_response(
+            "enrollment_proof",
+            enrollment_proof_data(current_user, db),
+            f"enrollment_proof_{current_user.id}.pdf"
+        )
+
     html_content = generate_enrollment_proof_html(current_user, db)
     
     return StreamingResponse(
@@ -347,10 +663,18 @@ def download_enrollment_proof(
 
 @router.get("/download/grade-transcript")
 def download_grade_transcript(
+    format: str = Query("html", pattern="^(html|pdf)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Download grade transcript as HTML (can be printed to PDF)"""
+    """Download grade transcript as HTML or PDF"""
+    if format == "pdf":
+        return pdf_response(
+            "grade_transcript",
+            grade_transcript_data(current_user, db),
+            f"grade_transcript_{current_user.id}.pdf"
+        )
+
     html_content = generate_grade_transcript_html(current_user, db)
     
     return StreamingResponse(
@@ -365,10 +689,11 @@ def download_grade_transcript(
 @router.get("/download/invoice/{payment_id}")
 def download_invoice(
     payment_id: int,
+    format: str = Query("html", pattern="^(html|pdf)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Download payment invoice as HTML"""
+    """Download payment invoice as HTML or PDF"""
     from models.payment import Payment
     
     payment = db.query(Payment).filter(Payment.id == payment_id).first()
@@ -381,6 +706,9 @@ def download_invoice(
     
     user = db.query(User).filter(User.id == payment.user_id).first()
     
+    if format == "pdf":
+        return pdf_response("invoice", invoice_data(payment, user), f"invoice_{payment.invoice_number}.pdf")
+    
     html_content = f"""
     <!DOCTYPE html>
     <html>
@@ -449,3 +777,156 @@ def download_invoice(
         }
     )
 
+
+@router.get("/pdf/stats")
+def get_pdf_renderer_stats(
+    current_user: User = Depends(require_admin)
+):
+    """PDF worker pool and cache statistics (admin only)"""
+    return pdf.renderer.stats()
+
+
+# ============== BATCH ENDPOINTS ==============
+
+@router.get("/batch/grade-transcripts")
+def stream_batch_grade_transcripts(
+    request: Request,
+    subject_id: Optional[int] = None,
+    semester: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Stream a ZIP of grade transcripts for a cohort (admin only).
+
+    The cohort is every student, optionally narrowed to those enrolled in
+    ``subject_id`` and/or ``semester``. Progress can be polled through the
+    job id returned in the ``X-Batch-Job-Id`` header.
+    """
+    job = transcripts.create_job(current_user.id, subject_id, semester)
+
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="batch_transcripts_streamed",
+        details=f"Streamed batch transcripts (subject={subject_id}, semester={semester}), job {job.id}",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+
+    return StreamingResponse(
+        transcripts.stream_transcripts_zip(job),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename=grade_transcripts_{job.id}.zip",
+            "X-Batch-Job-Id": job.id
+        }
+    )
+
+
+@router.post("/batch/grade-transcripts", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def start_batch_grade_transcripts(
+    batch: BatchTranscriptRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Generate a cohort transcript ZIP in the background and store it (admin only)"""
+    job = transcripts.create_job(current_user.id, batch.subject_id, batch.semester)
+
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="batch_transcripts_started",
+        details=f"Started batch transcripts (subject={batch.subject_id}, semester={batch.semester}), job {job.id}",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+
+    transcripts.start_transcripts_job(job)
+    return job.to_dict()
+
+
+@router.get("/batch/jobs/{job_id}", response_model=BatchJobResponse)
+def get_batch_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """Get progress of a batch transcript job (admin only)"""
+    job = transcripts.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.to_dict()
+
+
+@router.get("/batch/jobs/{job_id}/download")
+def download_batch_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """Download the stored ZIP of a completed batch job (admin only)"""
+    job = transcripts.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    if job.status != "completed" or not job.artifact_path:
+        raise HTTPException(status_code=409, detail=f"Batch job is {job.status}")
+
+    if not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=404, detail="File not found on server")
+
+    return FileResponse(
+        path=job.artifact_path,
+        filename=os.path.basename(job.artifact_path),
+        media_type="application/zip"
+    )
+
+
+# ============== MAINTENANCE ENDPOINTS ==============
+
+@router.get("/maintenance/reconcile")
+def get_reconcile_status(
+    current_user: User = Depends(require_admin)
+):
+    """Status and last report of the uploads reconciler (admin only)"""
+    job = scheduler.get_job(reconciler.JOB_NAME)
+    return {
+        "job": job.to_dict() if job else None,
+        "last_report": reconciler.last_report,
+    }
+
+
+@router.post("/maintenance/reconcile", status_code=status.HTTP_202_ACCEPTED)
+def run_reconcile(
+    request: Request,
+    dry_run: bool = True,
+    action: str = Query(reconciler.ACTION_QUARANTINE, pattern="^(quarantine|delete)$"),
+    max_ops_per_second: Optional[float] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Trigger the uploads reconciler now (admin only, dry run by default)"""
+    if scheduler.get_job(reconciler.JOB_NAME) is None:
+        reconciler.register(scheduler)
+    
+    started = scheduler.run_now(
+        reconciler.JOB_NAME,
+        dry_run=dry_run,
+        action=action,
+        max_ops_per_second=max_ops_per_second
+    )
+    if not started:
+        raise HTTPException(status_code=409, detail="Reconciler is already running")
+    
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="uploads_reconcile_started",
+        details=f"Started uploads reconciler (dry_run={dry_run}, action={action})",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+    
+    return {"message": "Reconciler started", "dry_run": dry_run, "action": action}
@@ -1,16 +1,80 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from database import get_db
-from auth import get_current_active_user, require_student, require_teacher
+from auth import get_current_active_user, require_student, require_teacher, require_admin
 from models.user import User, UserRole
-from models.enrollment import Enrollment, EnrollmentStatus
+from models.enrollment import Enrollment, EnrollmentStatus, WaitlistEntry
 from models.subject import Subject
-from schemas.enrollment import EnrollmentCreate, EnrollmentUpdate, EnrollmentResponse
+from models.activity_log import ActivityLog
+from schemas.enrollment import (
+    EnrollmentCreate, EnrollmentUpdate, EnrollmentResponse, EnrollmentBatchCreate, EnrollmentBatchResponse,
+    WaitlistCreate, WaitlistResponse, AdmissionGateUpdate
+)
+from services import enrollments as seats
+from services import prerequisites
+from services import admission
+from services import timetable
 
 router = APIRouter(prefix="/api/enrollments", tags=["enrollments"])
 
 
+# The admission endpoints are async so they read the gates on the event
+# loop that owns them (see services/admission.py)
+
+@router.get("/queue/{ticket_id}")
+async def get_queue_position(ticket_id: str):
+    """Position and ETA of a waiting-room ticket.
+    
+    No login needed: the ticket itself is an unguessable token, and polling
+    it must not cost a database lookup during a spike.
+    """
+    ticket = admission.ticket_status(ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found or expired")
+    return ticket
+
+
+@router.get("/maintenance/admission")
+async def get_admission_gates(
+    current_user: User = Depends(require_admin)
+):
+    """Configuration and counters of the admission gates in this worker (admin only)"""
+    return [gate.to_dict() for gate in admission.gates.values()]
+
+
+@router.put("/maintenance/admission/{gate_name}")
+async def update_admission_gate(
+    gate_name: str,
+    gate_update: AdmissionGateUpdate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Change an admission gate's rate, burst or queue limits at runtime (admin only)"""
+    gate = admission.gates.get(gate_name)
+    if gate is None:
+        raise HTTPException(status_code=404, detail="Admission gate not found")
+    
+    changes = gate_update.model_dump(exclude_none=True)
+    gate.configure(**changes)
+    
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="admission_gate_updated",
+        details=f"Updated admission gate {gate_name}: {changes}",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    # The commit blocks; keep it off the event loop
+    await run_in_threadpool(db.commit)
+    
+    return gate.to_dict()
+
+
 @router.get("/", response_model=List[EnrollmentResponse])
 def get_enrollments(
     db: Session = Depends(get_db),
@@ -37,6 +101,14 @@ def get_enrollments(
     return result
 
 
+def check_prerequisites(db: Session, student_id: int, subject_id: int):
+    """400 listing the subject codes still to pass, if any"""
+    lacking = prerequisites.missing(db, student_id, [subject_id]).get(subject_id)
+    if lacking:
+        codes = sorted(row.code for row in db.query(Subject.code).filter(Subject.id.in_(lacking)))
+        raise HTTPException(status_code=400, detail=f"Missing prerequisites: {', '.join(codes)}")
+
+
 @router.post("/", response_model=EnrollmentResponse, status_code=status.HTTP_201_CREATED)
 def create_enrollment(
     enrollment: EnrollmentCreate,
@@ -44,18 +116,14 @@ def create_enrollment(
     current_user: User = Depends(require_student)
 ):
     """Enroll in a subject - only students can enroll"""
-    # Check if subject exists
-    subject = db.query(Subject).filter(Subject.id == enrollment.subject_id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Subject not found")
+    check_prerequisites(db, current_user.id, enrollment.subject_id)
     
-    # Check if already enrolled
-    existing = db.query(Enrollment).filter(
-        Enrollment.student_id == current_user.id,
-        Enrollment.subject_id == enrollment.subject_id
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Already enrolled in this subject")
+    # Take a seat and insert in one transaction; a failed insert gives the seat back
+    if not seats.reserve_seat(db, enrollment.subject_id):
+        db.rollback()
+        if db.query(Subject.id).filter(Subject.id == enrollment.subject_id).first() is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        raise HTTPException(status_code=409, detail="Subject is full")
     
     db_enrollment = Enrollment(
         student_id=current_user.id,
@@ -64,9 +132,16 @@ def create_enrollment(
         status=EnrollmentStatus.CONFIRMED  # Auto-confirm for now
     )
     db.add(db_enrollment)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Already enrolled in this subject")
     db.refresh(db_enrollment)
     
+    # Clashes don't block enrolling (the student may skip a seminar), they are only reported
+    warnings = timetable.enrollment_warnings(db, current_user.id, db_enrollment.subject_id, db_enrollment.semester)
+    
     return EnrollmentResponse(
         id=db_enrollment.id,
         student_id=db_enrollment.student_id,
@@ -75,10 +150,130 @@ def create_enrollment(
         enrolled_date=db_enrollment.enrolled_date,
         semester=db_enrollment.semester,
         subject_name=db_enrollment.subject.name if db_enrollment.subject else None,
-        subject_code=db_enrollment.subject.code if db_enrollment.subject else None
+        subject_code=db_enrollment.subject.code if db_enrollment.subject else None,
+        warnings=warnings
     )
 
 
+@router.post("/batch", response_model=EnrollmentBatchResponse, status_code=status.HTTP_201_CREATED)
+def create_enrollment_batch(
+    batch: EnrollmentBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student)
+):
+    """Enroll in several subjects at once - only students can enroll.
+    
+    In ``all_or_nothing`` mode any failing subject enrolls nothing; in
+    ``partial`` mode the failing subjects are reported in ``failed``.
+    Responds 409 with the failures when nothing was enrolled.
+    """
+    try:
+        enrolled, failed = seats.enroll_batch(
+            db, current_user.id, batch.subject_ids, batch.semester, partial=batch.mode == "partial"
+        )
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Already enrolled in one of these subjects")
+    
+    if not enrolled:
+        raise HTTPException(status_code=409, detail={"message": "No subject could be enrolled", "failed": failed})
+    
+    return EnrollmentBatchResponse(
+        mode=batch.mode,
+        enrolled=[EnrollmentResponse(**row) for row in enrolled],
+        failed=failed
+    )
+
+
+def waitlist_response(db: Session, entry: WaitlistEntry) -> WaitlistResponse:
+    return WaitlistResponse(
+        id=entry.id,
+        student_id=entry.student_id,
+        subject_id=entry.subject_id,
+        semester=entry.semester,
+        status="waiting",
+        position=seats.waitlist_rank(db, entry),
+        created_at=entry.created_at,
+        subject_name=entry.subject.name if entry.subject else None,
+        subject_code=entry.subject.code if entry.subject else None
+    )
+
+
+@router.get("/waitlist", response_model=List[WaitlistResponse])
+def get_waitlist_entries(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student)
+):
+    """Waitlists the current student is queued on, with their positions"""
+    entries = db.query(WaitlistEntry).filter(WaitlistEntry.student_id == current_user.id).all()
+    return [waitlist_response(db, entry) for entry in entries]
+
+
+@router.post("/waitlist", response_model=WaitlistResponse, status_code=status.HTTP_201_CREATED)
+def join_waitlist(
+    waitlist: WaitlistCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student)
+):
+    """Queue for a seat in a full subject - the student is enrolled and
+    notified automatically when a seat frees up"""
+    subject = db.query(Subject).filter(Subject.id == waitlist.subject_id).first()
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    if subject.capacity is None or subject.enrolled_count < subject.capacity:
+        raise HTTPException(status_code=409, detail="Subject has free seats, enroll directly")
+    
+    existing = db.query(Enrollment.id).filter(
+        Enrollment.student_id == current_user.id,
+        Enrollment.subject_id == waitlist.subject_id,
+        Enrollment.semester == waitlist.semester
+    ).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Already enrolled in this subject")
+    
+    check_prerequisites(db, current_user.id, waitlist.subject_id)
+    
+    try:
+        entry_id = seats.join_waitlist(db, current_user.id, waitlist.subject_id, waitlist.semester)
+        # A seat freed since the check above goes to the waitlist right away
+        promoted = seats.promote_waitlisted(db, waitlist.subject_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Already on the waitlist for this subject")
+    
+    if current_user.id in promoted:
+        return WaitlistResponse(
+            id=entry_id,
+            student_id=current_user.id,
+            subject_id=subject.id,
+            semester=waitlist.semester,
+            status="enrolled",
+            subject_name=subject.name,
+            subject_code=subject.code
+        )
+    return waitlist_response(db, db.query(WaitlistEntry).filter(WaitlistEntry.id == entry_id).one())
+
+
+@router.delete("/waitlist/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+def leave_waitlist(
+    entry_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student)
+):
+    """Leave a waitlist"""
+    entry = db.query(WaitlistEntry).filter(WaitlistEntry.id == entry_id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+    
+    if entry.student_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to remove this waitlist entry")
+    
+    db.delete(entry)
+    db.commit()
+    return None
+
+
 @router.put("/{enrollment_id}", response_model=EnrollmentResponse)
 def update_enrollment(
     enrollment_id: int,
@@ -92,7 +287,11 @@ def update_enrollment(
         raise HTTPException(status_code=404, detail="Enrollment not found")
     
     if enrollment_update.status:
-        db_enrollment.status = enrollment_update.status
+        try:
+            seats.change_status(db, db_enrollment, enrollment_update.status)
+        except seats.SubjectFull:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Subject is full")
     
     db.commit()
     db.refresh(db_enrollment)
@@ -124,6 +323,9 @@ def delete_enrollment(
     if current_user.role == UserRole.STUDENT and db_enrollment.student_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this enrollment")
     
+    # The freed seat goes to the head of the waitlist in this transaction
+    if seats.holds_seat(db_enrollment.status):
+        seats.free_seat(db, db_enrollment.subject_id)
     db.delete(db_enrollment)
     db.commit()
     return None
@@ -0,0 +1,361 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field
+from database import get_db
+from auth import get_current_active_user, require_student, require_teacher
+from models.user import User, UserRole
+from models.subject import Subject
+from models.exam import Exam, ExamType, ExamRegistration
+from models.activity_log import ActivityLog
+from services import exams
+from services import exam_seating
+
+router = APIRouter(prefix="/api/exams", tags=["Exams"])
+
+
+# ============== SCHEMAS ==============
+
+class ExamBase(BaseModel):
+    subject_id: int
+    semester: str
+    exam_type: ExamType = ExamType.FINAL
+    starts_at: datetime
+    duration_minutes: int = Field(90, ge=1)
+    room: str
+    capacity: int = Field(..., ge=1)
+    registration_deadline: Optional[datetime] = None
+
+
+class ExamCreate(ExamBase):
+    pass
+
+
+class ExamUpdate(BaseModel):
+    exam_type: Optional[ExamType] = None
+    starts_at: Optional[datetime] = None
+    duration_minutes: Optional[int] = Field(None, ge=1)
+    room: Optional[str] = None
+    capacity: Optional[int] = Field(None, ge=1)
+    registration_deadline: Optional[datetime] = None
+
+
+class ExamResponse(ExamBase):
+    id: int
+    registered_count: int
+    seats_left: int
+    subject_code: Optional[str] = None
+    subject_name: Optional[str] = None
+    # For students: whether they registered, and their seat once allocated
+    registered: Optional[bool] = None
+    seat_room: Optional[str] = None
+    seat_number: Optional[int] = None
+
+
+class ExamRegistrationResponse(BaseModel):
+    id: int
+    exam_id: int
+    student_id: int
+    student_name: Optional[str] = None
+    study_group: Optional[str] = None
+    registered_at: Optional[datetime] = None
+    room: Optional[str] = None
+    seat_number: Optional[int] = None
+
+
+class ExamRoom(BaseModel):
+    room: str
+    capacity: int = Field(..., ge=1)
+
+
+class ExamSeatingRequest(BaseModel):
+    # Empty: everyone sits in the exam's own room
+    rooms: List[ExamRoom] = []
+
+
+class ExamRoomUsage(ExamRoom):
+    seated: int
+
+
+class ExamSeatingResponse(BaseModel):
+    exam_id: int
+    seated: int
+    rooms: List[ExamRoomUsage]
+    adjacent_same_group: int
+
+
+# ============== HELPERS ==============
+
+def exam_response(exam: Exam, code: Optional[str], name: Optional[str], seats: Optional[dict] = None) -> ExamResponse:
+    """``seats`` is the student's ``exams.seats_of``, None for staff"""
+    seat_room, seat_number = (seats or {}).get(exam.id, (None, None))
+    return ExamResponse(
+        id=exam.id,
+        subject_id=exam.subject_id,
+        semester=exam.semester,
+        exam_type=exam.exam_type,
+        starts_at=exam.starts_at,
+        duration_minutes=exam.duration_minutes,
+        room=exam.room,
+        capacity=exam.capacity,
+        registration_deadline=exam.registration_deadline,
+        registered_count=exam.registered_count,
+        seats_left=max(0, exam.capacity - exam.registered_count),
+        subject_code=code,
+        subject_name=name,
+        registered=exam.id in seats if seats is not None else None,
+        seat_room=seat_room,
+        seat_number=seat_number
+    )
+
+
+def get_own_exam(db: Session, exam_id: int, current_user: User) -> Exam:
+    """The exam, if the user teaches its subject or is an admin"""
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if exam.subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return exam
+
+
+def log_activity(db: Session, user: User, request: Request, action: str, details: str):
+    db.add(ActivityLog(
+        user_id=user.id,
+        action=action,
+        details=details,
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    ))
+
+
+# ============== ENDPOINTS ==============
+
+@router.get("/", response_model=List[ExamResponse])
+def get_exams(
+    subject_id: Optional[int] = None,
+    include_past: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Exams of the user's subjects (enrolled or taught; all for admins), soonest first"""
+    if current_user.role == UserRole.ADMIN:
+        subject_ids = [subject_id] if subject_id else [row.id for row in db.query(Subject.id)]
+    else:
+        subject_ids = exams.subject_ids_of(db, current_user)
+        if subject_id:
+            subject_ids = [subject_id] if subject_id in subject_ids else []
+
+    rows = exams.upcoming(db, subject_ids, datetime.min if include_past else None).all()
+    seats = None
+    if current_user.role == UserRole.STUDENT:
+        seats = exams.seats_of(db, current_user.id, [exam.id for exam, _, _ in rows])
+    return [exam_response(exam, code, name, seats) for exam, code, name in rows]
+
+
+@router.get("/{exam_id}", response_model=ExamResponse)
+def get_exam(
+    exam_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a specific exam"""
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    seats = None
+    if current_user.role == UserRole.STUDENT:
+        seats = exams.seats_of(db, current_user.id, [exam.id])
+    return exam_response(exam, exam.subject.code, exam.subject.name, seats)
+
+
+@router.post("/", response_model=ExamResponse, status_code=status.HTTP_201_CREATED)
+def create_exam(
+    exam: ExamCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Create an exam date - only the subject's teacher or an admin"""
+    subject = db.query(Subject).filter(Subject.id == exam.subject_id).first()
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    if subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    db_exam = Exam(**exam.model_dump())
+    db.add(db_exam)
+    db.flush()
+    log_activity(db, current_user, request, "exam_created",
+                 f"Created {db_exam.exam_type.value} of {subject.code} on {db_exam.starts_at:%Y-%m-%d %H:%M} in {db_exam.room}")
+    db.commit()
+    db.refresh(db_exam)
+    return exam_response(db_exam, subject.code, subject.name)
+
+
+@router.put("/{exam_id}", response_model=ExamResponse)
+def update_exam(
+    exam_id: int,
+    exam_update: ExamUpdate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Update an exam - only the subject's teacher or an admin"""
+    db_exam = get_own_exam(db, exam_id, current_user)
+
+    update_data = exam_update.model_dump(exclude_unset=True)
+    if "capacity" in update_data and update_data["capacity"] < db_exam.registered_count:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{db_exam.registered_count} students are registered, capacity cannot be lower"
+        )
+    for field, value in update_data.items():
+        setattr(db_exam, field, value)
+
+    log_activity(db, current_user, request, "exam_updated",
+                 f"Updated exam {db_exam.id}: {', '.join(update_data) or 'nothing'}")
+    try:
+        db.commit()
+    except IntegrityError:
+        # A registration came in between the check and the commit
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Capacity cannot be lower than the registered count")
+    db.refresh(db_exam)
+    return exam_response(db_exam, db_exam.subject.code, db_exam.subject.name)
+
+
+@router.delete("/{exam_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_exam(
+    exam_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Delete an exam and its registrations - only the subject's teacher or an admin"""
+    db_exam = get_own_exam(db, exam_id, current_user)
+
+    db.query(ExamRegistration).filter(ExamRegistration.exam_id == exam_id).delete(synchronize_session=False)
+    log_activity(db, current_user, request, "exam_deleted",
+                 f"Deleted {db_exam.exam_type.value} of {db_exam.subject.code} on {db_exam.starts_at:%Y-%m-%d %H:%M}")
+    db.delete(db_exam)
+    db.commit()
+    return None
+
+
+@router.get("/{exam_id}/registrations", response_model=List[ExamRegistrationResponse])
+def get_exam_registrations(
+    exam_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Students registered for an exam - only the subject's teacher or an admin"""
+    get_own_exam(db, exam_id, current_user)
+    rows = db.query(ExamRegistration, User.full_name, User.study_group).join(
+        User, User.id == ExamRegistration.student_id
+    ).filter(
+        ExamRegistration.exam_id == exam_id
+    ).order_by(ExamRegistration.room, ExamRegistration.seat_number, ExamRegistration.id).all()
+    return [
+        ExamRegistrationResponse(
+            id=registration.id,
+            exam_id=registration.exam_id,
+            student_id=registration.student_id,
+            student_name=full_name,
+            study_group=study_group,
+            registered_at=registration.registered_at,
+            room=registration.room,
+            seat_number=registration.seat_number
+        )
+        for registration, full_name, study_group in rows
+    ]
+
+
+@router.post("/{exam_id}/seating", response_model=ExamSeatingResponse)
+def allocate_exam_seats(
+    exam_id: int,
+    seating: ExamSeatingRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Assign every registered student a room and seat, keeping students of
+    a study group apart; replaces earlier seats - only the subject's
+    teacher or an admin"""
+    db_exam = get_own_exam(db, exam_id, current_user)
+
+    rooms = [(room.room, room.capacity) for room in seating.rooms]
+    try:
+        report = exam_seating.allocate_exam(db, db_exam, rooms)
+    except exam_seating.SeatingError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    log_activity(db, current_user, request, "exam_seats_allocated",
+                 f"Seated {report['seated']} students of exam {exam_id} in "
+                 f"{', '.join(room['room'] for room in report['rooms'])}")
+    db.commit()
+    return ExamSeatingResponse(exam_id=exam_id, **report)
+
+
+@router.post("/{exam_id}/register", response_model=ExamRegistrationResponse, status_code=status.HTTP_201_CREATED)
+def register_for_exam(
+    exam_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student)
+):
+    """Take a seat at an exam of one of the student's subjects"""
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    try:
+        registration = exams.register(db, exam, current_user.id)
+    except exams.RegistrationClosed:
+        raise HTTPException(status_code=400, detail="Registration for this exam is closed")
+    except exams.NotEnrolled:
+        raise HTTPException(status_code=403, detail="Not enrolled in this subject")
+    except exams.ExamFull:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Exam is full")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Already registered for this exam")
+
+    log_activity(db, current_user, request, "exam_registered",
+                 f"Registered for {exam.exam_type.value} of {exam.subject.code} on {exam.starts_at:%Y-%m-%d %H:%M}")
+    db.commit()
+    db.refresh(registration)
+    return ExamRegistrationResponse(
+        id=registration.id,
+        exam_id=registration.exam_id,
+        student_id=registration.student_id,
+        student_name=current_user.full_name,
+        study_group=current_user.study_group,
+        registered_at=registration.registered_at
+    )
+
+
+@router.delete("/{exam_id}/register", status_code=status.HTTP_204_NO_CONTENT)
+def unregister_from_exam(
+    exam_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student)
+):
+    """Give up a seat at an exam before registration closes"""
+    registration = db.query(ExamRegistration).filter(
+        ExamRegistration.exam_id == exam_id,
+        ExamRegistration.student_id == current_user.id
+    ).first()
+    if not registration:
+        raise HTTPException(status_code=404, detail="Not registered for this exam")
+    if not exams.registration_open(registration.exam):
+        raise HTTPException(status_code=400, detail="Registration for this exam is closed")
+
+    exams.unregister(db, registration)
+    log_activity(db, current_user, request, "exam_unregistered", f"Unregistered from exam {exam_id}")
+    db.commit()
+    return None
@@ -1,13 +1,22 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+import io
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from database import get_db
 from auth import get_current_active_user, require_admin
 from models.user import User, UserRole
-from models.payment import Payment, PaymentType, PaymentStatus, PaymentMethod
+from models.payment import Payment, PaymentType, PaymentStatus, PaymentMethod, BillingRun
 from models.activity_log import ActivityLog
+from services import payments as payment_listing
+from services import invoices
+from services import billing
+from services import overdue
+from services import bank_import
+from services import finance_reports
+from services.scheduler import scheduler
 
 router = APIRouter(prefix="/api/payments", tags=["Payments"])
 
@@ -51,61 +60,139 @@ class PaymentPayRequest(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BillingCriteria(BaseModel):
+    role: UserRole = UserRole.STUDENT
+    user_ids: Optional[List[int]] = None
+    subject_id: Optional[int] = None
+    semester: Optional[str] = None
+    dormitory_id: Optional[int] = None
+    dormitory_residents: bool = False
+
+
+class BillingRunCreate(BaseModel):
+    run_id: str = Field(..., min_length=1, max_length=64)
+    payment_type: PaymentType
+    description: str
+    amount: Optional[float] = Field(None, gt=0)  # omitted for rent runs: each resident's dormitory rent
+    due_date: Optional[datetime] = None
+    criteria: BillingCriteria = BillingCriteria()
+
+
+class BillingRunResponse(BaseModel):
+    run_id: str
+    payment_type: PaymentType
+    description: str
+    payments_created: int
+    total_amount: float
+    first_invoice_number: Optional[str] = None
+    last_invoice_number: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    replayed: bool = False
+
+
+class BillingPreviewResponse(BaseModel):
+    users: int
+    total_amount: float
+
+
 # ============== HELPER FUNCTIONS ==============
 
 def enrich_payment(payment: Payment, db: Session) -> PaymentResponse:
-    user = db.query(User).filter(User.id == payment.user_id).first()
-    return PaymentResponse(
-        id=payment.id,
-        user_id=payment.user_id,
-        payment_type=payment.payment_type,
-        description=payment.description,
-        amount=payment.amount,
-        status=payment.status,
-        due_date=payment.due_date,
-        paid_date=payment.paid_date,
-        payment_method=payment.payment_method,
-        invoice_number=payment.invoice_number,
-        created_at=payment.created_at,
-        user_name=user.full_name if user else None,
-        user_email=user.email if user else None
+    """Response for a single payment; listings use ``payment_listing`` instead"""
+    user = db.query(User.full_name, User.email).filter(User.id == payment.user_id).first()
+    response = PaymentResponse.model_validate(payment)
+    if user:
+        response.user_name = user.full_name
+        response.user_email = user.email
+    return response
+
+
+def payment_filters(
+    status_filter: Optional[PaymentStatus] = Query(None, alias="status"),
+    payment_type: Optional[PaymentType] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[int] = Query(None, ge=1, description="Id of the last payment on the previous page")
+) -> dict:
+    return {
+        "status": status_filter,
+        "payment_type": payment_type,
+        "due_from": due_from,
+        "due_to": due_to,
+        "user_id": user_id,
+        "cursor": cursor,
+    }
+
+
+def billing_run_response(run, replayed: bool = False) -> BillingRunResponse:
+    return BillingRunResponse(
+        run_id=run.id,
+        payment_type=run.payment_type,
+        description=run.description,
+        payments_created=run.payments_created,
+        total_amount=run.total_amount,
+        first_invoice_number=run.first_invoice_number,
+        last_invoice_number=run.last_invoice_number,
+        created_at=run.created_at,
+        finished_at=run.finished_at,
+        replayed=replayed
     )
 
 
+def list_payment_page(db: Session, response: Response, filters: dict, limit: Optional[int]) -> List[dict]:
+    """Run the joined listing query and expose the next page cursor as a header"""
+    rows = payment_listing.list_payments(db, limit=limit, **filters)
+    cursor = payment_listing.next_cursor(rows, limit)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = str(cursor)
+    return rows
+
+
 # ============== ENDPOINTS ==============
 
 @router.get("/me", response_model=List[PaymentResponse])
 def get_my_payments(
+    response: Response,
+    filters: dict = Depends(payment_filters),
+    limit: Optional[int] = Query(None, ge=1, le=payment_listing.MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get current user's payments"""
-    payments = db.query(Payment).filter(Payment.user_id == current_user.id).order_by(Payment.created_at.desc()).all()
-    return [enrich_payment(p, db) for p in payments]
+    filters["user_id"] = current_user.id
+    return list_payment_page(db, response, filters, limit)
 
 
 @router.get("/all", response_model=List[PaymentResponse])
 def get_all_payments(
+    response: Response,
+    filters: dict = Depends(payment_filters),
+    limit: int = Query(payment_listing.DEFAULT_PAGE_SIZE, ge=1, le=payment_listing.MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
-    """Get all payments (admin only)"""
-    payments = db.query(Payment).order_by(Payment.created_at.desc()).all()
-    return [enrich_payment(p, db) for p in payments]
+    """Get all payments (admin only), one page at a time.
+    
+    Pass the ``X-Next-Cursor`` header of a page as ``cursor`` to fetch the next one.
+    """
+    return list_payment_page(db, response, filters, limit)
 
 
 @router.get("/", response_model=List[PaymentResponse])
 def get_payments(
+    response: Response,
+    filters: dict = Depends(payment_filters),
+    limit: Optional[int] = Query(None, ge=1, le=payment_listing.MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get payments - students see their own, admins see all"""
-    if current_user.role == UserRole.ADMIN:
-        payments = db.query(Payment).order_by(Payment.created_at.desc()).all()
-    else:
-        payments = db.query(Payment).filter(Payment.user_id == current_user.id).order_by(Payment.created_at.desc()).all()
+    if current_user.role != UserRole.ADMIN:
+        filters["user_id"] = current_user.id
     
-    return [enrich_payment(p, db) for p in payments]
+    return list_payment_page(db, response, filters, limit)
 
 
 @router.post("/", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
@@ -121,9 +208,7 @@ def create_payment(
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Generate invoice number
-    payment_count = db.query(Payment).count()
-    invoice_number = f"INV-{datetime.now().year}-{payment_count + 1000:04d}"
+    invoice_number = invoices.next_invoice_number(db)
     
     db_payment = Payment(
         user_id=payment.user_id,
@@ -152,6 +237,64 @@ def create_payment(
     return enrich_payment(db_payment, db)
 
 
+@router.post("/billing-runs/preview", response_model=BillingPreviewResponse)
+def preview_billing_run(
+    run: BillingRunCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Count the users a billing run would bill, without creating anything (admin only)"""
+    try:
+        return billing.preview_billing(db, run.model_dump(exclude={"run_id"}))
+    except billing.BillingRunInvalid as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/billing-runs", response_model=BillingRunResponse, status_code=status.HTTP_201_CREATED)
+def create_billing_run(
+    run: BillingRunCreate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Bill every user matching the criteria in one transaction (admin only).
+    
+    Idempotent per ``run_id``: re-submitting the same run returns the stored
+    result with status 200 instead of billing again.
+    """
+    try:
+        db_run, created = billing.run_billing(
+            db,
+            run.run_id,
+            run.model_dump(exclude={"run_id"}),
+            created_by=current_user.id,
+            ip_address=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent")
+        )
+    except billing.BillingRunInvalid as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except billing.BillingRunConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return billing_run_response(db_run, replayed=not created)
+
+
+@router.get("/billing-runs/{run_id}", response_model=BillingRunResponse)
+def get_billing_run(
+    run_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Get the result of a billing run (admin only)"""
+    db_run = db.query(BillingRun).filter(BillingRun.id == run_id).first()
+    if not db_run:
+        raise HTTPException(status_code=404, detail="Billing run not found")
+    return billing_run_response(db_run)
+
+
 @router.put("/{payment_id}/pay", response_model=PaymentResponse)
 def pay_payment(
     payment_id: int,
@@ -249,3 +392,141 @@ def get_users_for_payment(
     """Get list of users for payment creation (admin only)"""
     users = db.query(User).filter(User.is_active == True).all()
     return [{"id": u.id, "email": u.email, "full_name": u.full_name, "role": u.role.value} for u in users]
+
+
+@router.post("/bank-statements")
+def import_bank_statement(
+    request: Request,
+    file: UploadFile = File(...),
+    statement_format: Optional[str] = Query(None, pattern="^(csv|camt)$"),
+    dry_run: bool = False,
+    report: str = Query("json", pattern="^(json|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Mark payments paid from a bank statement (admin only).
+    
+    CSV needs a reference and an amount column; CAMT.053 XML is detected
+    from a ``.xml`` filename or passed as ``statement_format=camt``. Lines
+    are matched by the invoice number in their reference and the exact
+    amount. ``report=csv`` returns the full mismatch report as CSV.
+    """
+    filename = file.filename or ""
+    if statement_format is None:
+        is_xml = filename.lower().endswith(".xml") or (file.content_type or "").endswith("xml")
+        statement_format = bank_import.FORMAT_CAMT if is_xml else bank_import.FORMAT_CSV
+    
+    if statement_format == bank_import.FORMAT_CSV:
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", errors="replace", newline="")
+    else:
+        stream = file.file
+    
+    try:
+        result = bank_import.import_statement(
+            db,
+            stream,
+            statement_format,
+            user_id=current_user.id,
+            filename=filename,
+            dry_run=dry_run,
+            ip_address=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent")
+        )
+    except bank_import.StatementError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if report == "csv":
+        return StreamingResponse(
+            bank_import.mismatch_csv(result["mismatches"]),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": "attachment; filename=bank_statement_mismatches.csv",
+                "X-Matched": str(result["matched"]),
+                "X-Applied": str(result["applied"]),
+            }
+        )
+    
+    result["mismatches_truncated"] = len(result["mismatches"]) > bank_import.MISMATCH_SAMPLE_LIMIT
+    result["mismatches"] = result["mismatches"][:bank_import.MISMATCH_SAMPLE_LIMIT]
+    return result
+
+
+# ============== REPORT ENDPOINTS ==============
+
+@router.get("/reports/summary")
+def get_finance_summary(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Totals by type, status, payment method and month (admin only)"""
+    return finance_reports.summary(db, date_from, date_to)
+
+
+@router.get("/reports/outstanding")
+def get_outstanding_balances(
+    limit: int = Query(100, ge=1, le=payment_listing.MAX_PAGE_SIZE),
+    min_balance: float = Query(0.01, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Users with unpaid balances, largest first (admin only)"""
+    return finance_reports.outstanding_balances(db, limit, min_balance)
+
+
+@router.get("/reports/export")
+def export_payments_csv(
+    filters: dict = Depends(payment_filters),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Stream all payments matching the filters as CSV (admin only)"""
+    return StreamingResponse(
+        finance_reports.export_csv(db, filters),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename=payments_{datetime.now().strftime('%Y%m%d')}.csv"
+        }
+    )
+
+
+# ============== MAINTENANCE ENDPOINTS ==============
+
+@router.get("/maintenance/overdue-sweeper")
+def get_overdue_sweeper_status(
+    current_user: User = Depends(require_admin)
+):
+    """Metrics of the overdue payments sweeper in this worker (admin only)"""
+    job = scheduler.get_job(overdue.JOB_NAME)
+    return {
+        "job": job.to_dict() if job else None,
+        "leader": job.lease.current_holder() if job and job.lease else None,
+        "metrics": overdue.metrics,
+    }
+
+
+@router.post("/maintenance/overdue-sweeper", status_code=status.HTTP_202_ACCEPTED)
+def run_overdue_sweeper(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Run the overdue payments sweeper now (admin only)"""
+    if scheduler.get_job(overdue.JOB_NAME) is None:
+        overdue.register(scheduler)
+    
+    if not scheduler.run_now(overdue.JOB_NAME):
+        raise HTTPException(status_code=409, detail="Overdue sweeper is already running")
+    
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="overdue_sweep_started",
+        details="Started overdue payments sweeper",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+    
+    return {"message": "Overdue sweeper started"}
@@ -21,6 +21,7 @@ class UserProfileResponse(BaseModel):
     phone: Optional[str] = None
     address: Optional[str] = None
     profile_picture_url: Optional[str] = None
+    study_group: Optional[str] = None
     theme: str = "light"
     language: str = "en"
     notifications_enabled: bool = True
@@ -63,6 +64,7 @@ def get_my_profile(
         phone=current_user.phone,
         address=current_user.address,
         profile_picture_url=current_user.profile_picture_url,
+        study_group=current_user.study_group,
         theme=current_user.theme or "light",
         language=current_user.language or "en",
         notifications_enabled=current_user.notifications_enabled if current_user.notifications_enabled is not None else True,
@@ -111,6 +113,7 @@ def update_my_profile(
         phone=current_user.phone,
         address=current_user.address,
         profile_picture_url=current_user.profile_picture_url,
+        study_group=current_user.study_group,
         theme=current_user.theme or "light",
         language=current_user.language or "en",
         notifications_enabled=current_user.notifications_enabled if current_user.notifications_enabled is not None else True,
@@ -1,12 +1,21 @@
+from datetime import date, datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
+from sqlalchemy.exc import IntegrityError
 from database import get_db
-from auth import get_current_active_user, require_teacher
+from auth import get_current_active_user, require_teacher, require_admin
 from models.user import User, UserRole
-from models.schedule import Schedule, DayOfWeek, ClassType
+from models.schedule import (
+    Schedule, DayOfWeek, ClassType, SemesterCalendar, SemesterHoliday, ClassCancellation,
+    parse_time_range, format_time_range
+)
 from models.subject import Subject
+from models.activity_log import ActivityLog
+from services import timetable
+from services import timetabling
+from services import occurrences
 
 router = APIRouter(prefix="/api/schedules", tags=["schedules"])
 
@@ -21,7 +30,10 @@ class ScheduleBase(BaseModel):
 
 
 class ScheduleCreate(ScheduleBase):
-    pass
+    @field_validator("time")
+    @classmethod
+    def normalize_time(cls, value):
+        return format_time_range(*parse_time_range(value))
 
 
 class ScheduleUpdate(BaseModel):
@@ -30,6 +42,13 @@ class ScheduleUpdate(BaseModel):
     room: Optional[str] = None
     class_type: Optional[ClassType] = None
 
+    @field_validator("time")
+    @classmethod
+    def normalize_time(cls, value):
+        if value is None:
+            return value
+        return format_time_range(*parse_time_range(value))
+
 
 class ScheduleResponse(ScheduleBase):
     id: int
@@ -40,6 +59,100 @@ class ScheduleResponse(ScheduleBase):
         from_attributes = True
 
 
+class TimetableGenerateRequest(BaseModel):
+    semester: str
+    # Default: every subject taught in the semester's season (Winter/Summer)
+    subject_ids: Optional[List[int]] = None
+    # Default: every room seen in any schedule; labs default to rooms with "lab" in the name
+    rooms: Optional[List[str]] = None
+    lab_rooms: Optional[List[str]] = None
+    class_types: List[ClassType] = Field(default=[ClassType.LECTURE, ClassType.LAB], min_length=1)
+    max_seconds: float = Field(5.0, gt=0, le=120)
+    seed: Optional[int] = None
+    # Solve and report without replacing the schedules
+    dry_run: bool = False
+
+
+class TimetableJobResponse(BaseModel):
+    job_id: str
+    status: str
+    semester: str
+    dry_run: bool
+    report: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class HolidayItem(BaseModel):
+    date: date
+    name: str
+
+
+class SemesterCalendarUpdate(BaseModel):
+    semester: str
+    starts_on: date
+    ends_on: date
+    holidays: List[HolidayItem] = []
+
+    @model_validator(mode="after")
+    def check_dates(self):
+        if self.ends_on < self.starts_on:
+            raise ValueError("ends_on must not be before starts_on")
+        return self
+
+
+class SemesterCalendarResponse(BaseModel):
+    semester: str
+    starts_on: date
+    ends_on: date
+    holidays: List[HolidayItem] = []
+    # True when no calendar was set and the usual TUKE dates apply
+    is_default: bool = False
+
+
+class ClassCancellationCreate(BaseModel):
+    date: date
+    reason: Optional[str] = None
+
+
+class ClassCancellationResponse(BaseModel):
+    id: int
+    schedule_id: int
+    date: date
+    reason: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ClassOccurrenceResponse(BaseModel):
+    id: int
+    schedule_id: int
+    subject_id: int
+    subject_code: Optional[str] = None
+    subject_name: Optional[str] = None
+    semester: str
+    starts_at: datetime
+    ends_at: datetime
+    room: str
+    class_type: ClassType
+    cancelled: bool
+    note: Optional[str] = None
+
+
+class FreeRoomResponse(BaseModel):
+    room: str
+    free_until: Optional[str] = None
+
+
+def check_conflicts(db: Session, semester: str, day: DayOfWeek, time: str, room: str, teacher_id: Optional[int], schedule_id: Optional[int] = None):
+    """409 if the slot double-books its room or the subject's teacher"""
+    conflicts = timetable.schedule_conflicts(db, semester, day, time, room, teacher_id, schedule_id=schedule_id)
+    if conflicts:
+        raise HTTPException(status_code=409, detail={"message": "Schedule conflicts with existing classes", "conflicts": conflicts})
+
+
 @router.get("/", response_model=List[ScheduleResponse])
 def get_schedules(
     semester: Optional[str] = None,
@@ -68,6 +181,202 @@ def get_schedules(
     return result
 
 
+@router.get("/free-rooms", response_model=List[FreeRoomResponse])
+def get_free_rooms(
+    semester: str,
+    day: DayOfWeek,
+    time: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Rooms without a class in the ``time`` window (e.g. ``10:00-11:40``) -
+    only teachers. ``free_until`` is when the room's next class that day starts."""
+    try:
+        return timetable.free_rooms(db, semester, day, time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/occurrences", response_model=List[ClassOccurrenceResponse])
+def get_class_occurrences(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Dated class sessions from ``start`` (default today) until before ``end``
+    (default a week later) - the student's classes, the teacher's own
+    subjects, or everything for admins. Holidays are left out, cancelled
+    sessions are marked."""
+    start = start or date.today()
+    end = end or start + timedelta(days=7)
+    if end <= start or end - start > timedelta(days=366):
+        raise HTTPException(status_code=400, detail="end must be after start and at most a year later")
+    
+    sessions = occurrences.for_user(
+        db, current_user, datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+    ).all()
+    subjects = {
+        row.id: row
+        for row in db.query(Subject.id, Subject.code, Subject.name).filter(Subject.id.in_({s.subject_id for s in sessions}))
+    }
+    return [
+        ClassOccurrenceResponse(
+            id=session.id,
+            schedule_id=session.schedule_id,
+            subject_id=session.subject_id,
+            subject_code=subjects[session.subject_id].code if session.subject_id in subjects else None,
+            subject_name=subjects[session.subject_id].name if session.subject_id in subjects else None,
+            semester=session.semester,
+            starts_at=session.starts_at,
+            ends_at=session.ends_at,
+            room=session.room,
+            class_type=session.class_type,
+            cancelled=session.cancelled,
+            note=session.note
+        )
+        for session in sessions
+    ]
+
+
+@router.get("/calendar", response_model=SemesterCalendarResponse)
+def get_semester_calendar(
+    semester: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Teaching period and holidays of a semester"""
+    calendar = db.query(SemesterCalendar).filter(SemesterCalendar.semester == semester).first()
+    if calendar:
+        return SemesterCalendarResponse(
+            semester=calendar.semester,
+            starts_on=calendar.starts_on,
+            ends_on=calendar.ends_on,
+            holidays=[HolidayItem(date=h.date, name=h.name) for h in sorted(calendar.holidays, key=lambda h: h.date)]
+        )
+    
+    period = occurrences.default_period(semester)
+    if period is None:
+        raise HTTPException(status_code=404, detail="Semester calendar not found")
+    return SemesterCalendarResponse(semester=semester, starts_on=period[0], ends_on=period[1], is_default=True)
+
+
+@router.put("/calendar", response_model=SemesterCalendarResponse)
+def set_semester_calendar(
+    calendar_update: SemesterCalendarUpdate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Set a semester's teaching period and holidays (admin only); its class
+    sessions are recomputed"""
+    calendar = db.query(SemesterCalendar).filter(SemesterCalendar.semester == calendar_update.semester).first()
+    if not calendar:
+        calendar = SemesterCalendar(semester=calendar_update.semester)
+        db.add(calendar)
+    calendar.starts_on = calendar_update.starts_on
+    calendar.ends_on = calendar_update.ends_on
+    holidays = {h.date: h.name for h in calendar_update.holidays}
+    # Remove the old holidays first, a kept date would hit the unique constraint
+    calendar.holidays = []
+    db.flush()
+    calendar.holidays = [SemesterHoliday(date=day, name=name) for day, name in sorted(holidays.items())]
+    
+    sessions = occurrences.rebuild_semester(db, calendar.semester)
+    
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="semester_calendar_updated",
+        details=f"Set calendar of {calendar.semester}: {calendar.starts_on} - {calendar.ends_on}, "
+                f"{len(holidays)} holidays, {sessions} class sessions",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+    db.refresh(calendar)
+    
+    return SemesterCalendarResponse(
+        semester=calendar.semester,
+        starts_on=calendar.starts_on,
+        ends_on=calendar.ends_on,
+        holidays=[HolidayItem(date=h.date, name=h.name) for h in sorted(calendar.holidays, key=lambda h: h.date)]
+    )
+
+
+@router.delete("/cancellations/{cancellation_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_class_cancellation(
+    cancellation_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Undo a cancellation - only teachers"""
+    cancellation = db.query(ClassCancellation).filter(ClassCancellation.id == cancellation_id).first()
+    if not cancellation:
+        raise HTTPException(status_code=404, detail="Cancellation not found")
+    
+    if cancellation.schedule.subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    schedule_id = cancellation.schedule_id
+    db.delete(cancellation)
+    occurrences.rebuild(db, [schedule_id])
+    db.commit()
+    return None
+
+
+@router.post("/generate", response_model=TimetableJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def generate_timetable(
+    generate: TimetableGenerateRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Generate a clash-free weekly timetable in the background (admin only).
+    
+    Replaces the schedules of the chosen subjects for the semester in one
+    transaction when done; poll ``/generate/{job_id}`` for the report.
+    """
+    job = timetabling.create_job(
+        current_user.id,
+        generate.semester,
+        subject_ids=generate.subject_ids,
+        rooms=generate.rooms,
+        lab_rooms=generate.lab_rooms,
+        class_types=generate.class_types,
+        max_seconds=generate.max_seconds,
+        seed=generate.seed,
+        dry_run=generate.dry_run
+    )
+    if job is None:
+        raise HTTPException(status_code=409, detail="A timetable is already being generated for this semester")
+    
+    log = ActivityLog(
+        user_id=current_user.id,
+        action="timetable_generation_started",
+        details=f"Started timetable generation for {generate.semester} (dry_run={generate.dry_run}), job {job.id}",
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent")
+    )
+    db.add(log)
+    db.commit()
+    
+    timetabling.start_job(job)
+    return job.to_dict()
+
+
+@router.get("/generate/{job_id}", response_model=TimetableJobResponse)
+def get_timetable_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """Status and quality report of a timetable generation job (admin only)"""
+    job = timetabling.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Timetable job not found")
+    return job.to_dict()
+
+
 @router.post("/", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
 def create_schedule(
     schedule: ScheduleCreate,
@@ -82,6 +391,8 @@ def create_schedule(
     if subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    check_conflicts(db, schedule.semester, schedule.day, schedule.time, schedule.room, subject.teacher_id)
+    
     db_schedule = Schedule(
         subject_id=schedule.subject_id,
         day=schedule.day,
@@ -91,6 +402,8 @@ def create_schedule(
         semester=schedule.semester
     )
     db.add(db_schedule)
+    db.flush()
+    occurrences.rebuild(db, [db_schedule.id])
     db.commit()
     db.refresh(db_schedule)
     
@@ -123,9 +436,19 @@ def update_schedule(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     update_data = schedule_update.model_dump(exclude_unset=True)
+    check_conflicts(
+        db,
+        db_schedule.semester,
+        update_data.get("day") or db_schedule.day,
+        update_data.get("time") or db_schedule.time,
+        update_data.get("room") or db_schedule.room,
+        db_schedule.subject.teacher_id,
+        schedule_id=db_schedule.id
+    )
     for field, value in update_data.items():
         setattr(db_schedule, field, value)
     
+    occurrences.rebuild(db, [db_schedule.id])
     db.commit()
     db.refresh(db_schedule)
     
@@ -156,6 +479,39 @@ def delete_schedule(
     if db_schedule.subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    db.query(ClassCancellation).filter(ClassCancellation.schedule_id == schedule_id).delete(synchronize_session=False)
     db.delete(db_schedule)
+    occurrences.rebuild(db, [schedule_id])
     db.commit()
     return None
+
+
+@router.post("/{schedule_id}/cancellations", response_model=ClassCancellationResponse, status_code=status.HTTP_201_CREATED)
+def cancel_class(
+    schedule_id: int,
+    cancellation: ClassCancellationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Cancel one session of a weekly class - only teachers"""
+    db_schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
+    if not db_schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    
+    if db_schedule.subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    if list(DayOfWeek)[cancellation.date.weekday()] != db_schedule.day:
+        raise HTTPException(status_code=400, detail=f"This class takes place on {db_schedule.day.value}s")
+    
+    db_cancellation = ClassCancellation(schedule_id=schedule_id, date=cancellation.date, reason=cancellation.reason)
+    db.add(db_cancellation)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="This session is already cancelled")
+    occurrences.rebuild(db, [schedule_id])
+    db.commit()
+    db.refresh(db_cancellation)
+    return db_cancellation
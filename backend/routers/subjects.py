@@ -1,13 +1,17 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from database import get_db
 from auth import get_current_active_user, require_teacher
 from models.user import User, UserRole
-from models.subject import Subject, Semester
-from models.enrollment import Enrollment
-from schemas.subject import SubjectCreate, SubjectUpdate, SubjectResponse
+from models.subject import Subject, Semester, SubjectPrerequisite
+from models.schedule import Schedule, ClassCancellation, ClassOccurrence
+from models.exam import Exam, ExamRegistration
+from schemas.subject import (
+    SubjectCreate, SubjectUpdate, SubjectResponse, SubjectSummary, PrerequisitesUpdate, PrerequisitesResponse
+)
+from services import enrollments as seats
+from services import prerequisites
 
 router = APIRouter(prefix="/api/subjects", tags=["subjects"])
 
@@ -28,14 +32,8 @@ def get_subjects(
     
     subjects = query.offset(skip).limit(limit).all()
     
-    # Add enrollment count for each subject
     result = []
     for subject in subjects:
-        enrolled_count = db.query(func.count(Enrollment.id)).filter(
-            Enrollment.subject_id == subject.id,
-            Enrollment.status == "confirmed"
-        ).scalar() or 0
-        
         result.append(SubjectResponse(
             id=subject.id,
             code=subject.code,
@@ -45,7 +43,8 @@ def get_subjects(
             description=subject.description,
             teacher_id=subject.teacher_id,
             teacher_name=subject.teacher.full_name if subject.teacher else None,
-            enrolled_count=enrolled_count
+            capacity=subject.capacity,
+            enrolled_count=subject.enrolled_count
         ))
     
     return result
@@ -62,11 +61,6 @@ def get_subject(
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    enrolled_count = db.query(func.count(Enrollment.id)).filter(
-        Enrollment.subject_id == subject.id,
-        Enrollment.status == "confirmed"
-    ).scalar() or 0
-    
     return SubjectResponse(
         id=subject.id,
         code=subject.code,
@@ -76,7 +70,8 @@ def get_subject(
         description=subject.description,
         teacher_id=subject.teacher_id,
         teacher_name=subject.teacher.full_name if subject.teacher else None,
-        enrolled_count=enrolled_count
+        capacity=subject.capacity,
+        enrolled_count=subject.enrolled_count
     )
 
 
@@ -105,6 +100,7 @@ def create_subject(
         credits=subject.credits,
         semester=semester_value,
         description=subject.description,
+        capacity=subject.capacity,
         teacher_id=teacher_id
     )
     
@@ -125,6 +121,7 @@ def create_subject(
         description=db_subject.description,
         teacher_id=db_subject.teacher_id,
         teacher_name=db_subject.teacher.full_name if db_subject.teacher else None,
+        capacity=db_subject.capacity,
         enrolled_count=0
     )
 
@@ -149,14 +146,14 @@ def update_subject(
     for field, value in update_data.items():
         setattr(db_subject, field, value)
     
+    # Seats added by a larger capacity go to the waitlist first
+    if "capacity" in update_data:
+        db.flush()
+        seats.promote_waitlisted(db, subject_id)
+    
     db.commit()
     db.refresh(db_subject)
     
-    enrolled_count = db.query(func.count(Enrollment.id)).filter(
-        Enrollment.subject_id == db_subject.id,
-        Enrollment.status == "confirmed"
-    ).scalar() or 0
-    
     return SubjectResponse(
         id=db_subject.id,
         code=db_subject.code,
@@ -166,7 +163,8 @@ def update_subject(
         description=db_subject.description,
         teacher_id=db_subject.teacher_id,
         teacher_name=db_subject.teacher.full_name if db_subject.teacher else None,
-        enrolled_count=enrolled_count
+        capacity=db_subject.capacity,
+        enrolled_count=db_subject.enrolled_count
     )
 
 
@@ -186,6 +184,74 @@ def delete_subject(
         raise HTTPException(status_code=403, detail="Not authorized to delete this subject")
     
     # Delete the subject - cascade will handle related records
+    db.query(SubjectPrerequisite).filter(
+        (SubjectPrerequisite.subject_id == subject_id) | (SubjectPrerequisite.prerequisite_id == subject_id)
+    ).delete(synchronize_session=False)
+    db.query(ClassCancellation).filter(
+        ClassCancellation.schedule_id.in_(db.query(Schedule.id).filter(Schedule.subject_id == subject_id))
+    ).delete(synchronize_session=False)
+    db.query(ClassOccurrence).filter(ClassOccurrence.subject_id == subject_id).delete(synchronize_session=False)
+    db.query(ExamRegistration).filter(
+        ExamRegistration.exam_id.in_(db.query(Exam.id).filter(Exam.subject_id == subject_id))
+    ).delete(synchronize_session=False)
+    db.query(Exam).filter(Exam.subject_id == subject_id).delete(synchronize_session=False)
     db.delete(db_subject)
     db.commit()
     return None
+
+
+def prerequisites_response(db: Session, subject_id: int) -> PrerequisitesResponse:
+    direct_ids = [row.prerequisite_id for row in db.query(SubjectPrerequisite.prerequisite_id).filter(
+        SubjectPrerequisite.subject_id == subject_id
+    )]
+    required_ids = prerequisites.required(db, subject_id)
+    subjects = {
+        subject.id: SubjectSummary.model_validate(subject)
+        for subject in db.query(Subject).filter(Subject.id.in_(set(direct_ids) | required_ids))
+    }
+    return PrerequisitesResponse(
+        subject_id=subject_id,
+        direct=sorted((subjects[i] for i in direct_ids if i in subjects), key=lambda s: s.code),
+        required=sorted((subjects[i] for i in required_ids if i in subjects), key=lambda s: s.code)
+    )
+
+
+@router.get("/{subject_id}/prerequisites", response_model=PrerequisitesResponse)
+def get_prerequisites(
+    subject_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Direct and transitive prerequisites of a subject"""
+    if db.query(Subject.id).filter(Subject.id == subject_id).first() is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return prerequisites_response(db, subject_id)
+
+
+@router.put("/{subject_id}/prerequisites", response_model=PrerequisitesResponse)
+def update_prerequisites(
+    subject_id: int,
+    prerequisites_update: PrerequisitesUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teacher)
+):
+    """Replace a subject's direct prerequisites - only its teacher or an admin"""
+    db_subject = db.query(Subject).filter(Subject.id == subject_id).first()
+    if not db_subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    if db_subject.teacher_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to update this subject")
+    
+    requested = set(prerequisites_update.prerequisite_ids)
+    found = {row.id for row in db.query(Subject.id).filter(Subject.id.in_(requested))}
+    if requested - found:
+        raise HTTPException(status_code=400, detail=f"Unknown prerequisite subjects: {sorted(requested - found)}")
+    
+    try:
+        prerequisites.set_prerequisites(db, subject_id, sorted(requested))
+    except prerequisites.PrerequisiteCycle:
+        raise HTTPException(status_code=400, detail="Prerequisites would form a cycle")
+    db.commit()
+    
+    return prerequisites_response(db, subject_id)
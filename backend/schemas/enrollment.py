@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 from models.enrollment import EnrollmentStatus
 
@@ -13,6 +13,13 @@ class EnrollmentCreate(EnrollmentBase):
     pass
 
 
+class EnrollmentBatchCreate(BaseModel):
+    semester: str
+    subject_ids: List[int] = Field(..., min_length=1, max_length=20)
+    # all_or_nothing: any failure enrolls nothing; partial: enroll what passes
+    mode: Literal["all_or_nothing", "partial"] = "all_or_nothing"
+
+
 class EnrollmentUpdate(BaseModel):
     status: Optional[EnrollmentStatus] = None
 
@@ -24,6 +31,42 @@ class EnrollmentResponse(EnrollmentBase):
     enrolled_date: Optional[datetime] = None
     subject_name: Optional[str] = None
     subject_code: Optional[str] = None
+    # Timetable clashes with the student's other subjects, set on enroll
+    warnings: List[str] = []
 
     class Config:
         from_attributes = True
+
+
+class EnrollmentBatchFailure(BaseModel):
+    subject_id: int
+    reason: str
+    missing_prerequisites: Optional[List[int]] = None
+
+
+class EnrollmentBatchResponse(BaseModel):
+    mode: str
+    enrolled: List[EnrollmentResponse]
+    failed: List[EnrollmentBatchFailure]
+
+
+class WaitlistCreate(EnrollmentBase):
+    pass
+
+
+class WaitlistResponse(EnrollmentBase):
+    id: int
+    student_id: int
+    status: Literal["waiting", "enrolled"]
+    position: Optional[int] = None  # 1 = next to be promoted
+    created_at: Optional[datetime] = None
+    subject_name: Optional[str] = None
+    subject_code: Optional[str] = None
+
+
+class AdmissionGateUpdate(BaseModel):
+    rate: Optional[float] = Field(None, gt=0)
+    burst: Optional[int] = Field(None, ge=1)
+    max_concurrent: Optional[int] = Field(None, ge=1)
+    max_queue: Optional[int] = Field(None, ge=0)
+    max_wait: Optional[float] = Field(None, ge=0)
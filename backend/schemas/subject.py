@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
 from models.subject import Semester
 
 
@@ -9,6 +9,7 @@ class SubjectBase(BaseModel):
     credits: int
     semester: Semester
     description: Optional[str] = None
+    capacity: Optional[int] = Field(None, ge=1)  # None = unlimited
 
 
 class SubjectCreate(SubjectBase):
@@ -22,6 +23,7 @@ class SubjectUpdate(BaseModel):
     credits: Optional[int] = None
     semester: Optional[Semester] = None
     description: Optional[str] = None
+    capacity: Optional[int] = Field(None, ge=1)
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -33,3 +35,22 @@ class SubjectResponse(SubjectBase):
     enrolled_count: Optional[int] = 0
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class SubjectSummary(BaseModel):
+    id: int
+    code: str
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PrerequisitesUpdate(BaseModel):
+    prerequisite_ids: List[int] = Field(default_factory=list, max_length=50)
+
+
+class PrerequisitesResponse(BaseModel):
+    subject_id: int
+    direct: List[SubjectSummary]
+    # Everything that must be passed first, including indirect prerequisites
+    required: List[SubjectSummary]
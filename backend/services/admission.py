@@ -0,0 +1,307 @@
+"""Admission control (a virtual waiting room) for registration-day spikes.
+
+Each gate is a token bucket: ``rate`` requests per second are admitted on
+average, with bursts of up to ``burst``. On top of that, at most
+``max_concurrent`` admitted requests may be inside the handlers at once.
+Bursts beyond the connection pool otherwise stall the server: request
+threads hold every pooled connection while the async auth dependency
+blocks the event loop waiting for one. A request that finds no free
+token or slot gets a ticket at the back of the gate's FIFO queue and waits up to
+``max_wait`` seconds. Tokens always go to the oldest ticket, so later
+arrivals never overtake earlier ones. When the wait runs out the client
+gets 503 with its ticket (``X-Queue-Ticket``), its position and an ETA.
+The ticket keeps its place in the queue. A retry that sends the ticket
+back waits in the same place, or goes straight through if its turn has
+come in the meantime. ``GET /api/enrollments/queue/{ticket}`` reports the
+position without retrying.
+
+Which routes go through which gate is configured in ``ADMISSION_ROUTES``
+and ``GATES``. The state lives in the event loop of each worker process,
+so with several workers every worker admits its own ``rate``.
+"""
+import asyncio
+import re
+import secrets
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+TICKET_HEADER = "x-queue-ticket"
+
+# Seconds an admitted ticket is held for a client that is not waiting on it
+READY_TTL = 30
+# Seconds a queued ticket survives without its client asking about it
+TICKET_TTL = 120
+
+GATES = {
+    # max_concurrent across all gates stays below the engine's pool (5 + 10 overflow)
+    "enrollment_writes": {"rate": 50.0, "burst": 50, "max_concurrent": 4, "max_queue": 20000, "max_wait": 10.0},
+    "subject_reads": {"rate": 200.0, "burst": 200, "max_concurrent": 8, "max_queue": 20000, "max_wait": 5.0},
+}
+
+ADMISSION_ROUTES = [
+    ("POST", re.compile(r"^/api/enrollments(/batch|/waitlist)?/?$"), "enrollment_writes"),
+    ("PUT", re.compile(r"^/api/enrollments/\d+/?$"), "enrollment_writes"),
+    ("DELETE", re.compile(r"^/api/enrollments/\d+/?$"), "enrollment_writes"),
+    ("GET", re.compile(r"^/api/subjects(/\d+)?/?$"), "subject_reads"),
+]
+
+WAITING = "waiting"
+READY = "ready"
+ADMITTED = "admitted"
+EXPIRED = "expired"
+
+
+class QueueFull(Exception):
+    """The gate's queue is at ``max_queue``"""
+
+
+class Ticket:
+    __slots__ = ("id", "gate", "seq", "status", "issued_at", "expires_at", "waiter")
+
+    def __init__(self, gate: "AdmissionGate", seq: int, now: float):
+        self.id = secrets.token_urlsafe(16)
+        self.gate = gate
+        self.seq = seq
+        self.status = WAITING
+        self.issued_at = now
+        self.expires_at = now + TICKET_TTL
+        self.waiter: Optional[asyncio.Future] = None
+
+
+class AdmissionGate:
+    """Token bucket and concurrency limit with a FIFO queue in front of them"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.queue: deque = deque()
+        self.ready: deque = deque()
+        self.next_seq = 0
+        self.pump: Optional[asyncio.Task] = None
+        self.stats = {"admitted": 0, "queued": 0, "timed_out": 0, "rejected": 0, "expired": 0, "max_queue_length": 0}
+
+    def configure(self, rate: Optional[float] = None, burst: Optional[int] = None, max_concurrent: Optional[int] = None,
+                  max_queue: Optional[int] = None, max_wait: Optional[float] = None):
+        self._refill(time.monotonic())
+        if rate is not None:
+            self.rate = rate
+        if burst is not None:
+            self.burst = burst
+            self.tokens = min(self.tokens, burst)
+        if max_concurrent is not None:
+            self.max_concurrent = max_concurrent
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if max_wait is not None:
+            self.max_wait = max_wait
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _can_admit(self) -> bool:
+        return self.tokens >= 1 and self.in_flight < self.max_concurrent
+
+    def _admit(self):
+        self.tokens -= 1
+        self.in_flight += 1
+
+    def release(self):
+        """An admitted request finished; let the next ticket in"""
+        self.in_flight -= 1
+        self._advance(time.monotonic())
+
+    def _advance(self, now: float):
+        """Hand free tokens and slots to the tickets at the head of the queue"""
+        self._refill(now)
+        while self.ready and (self.ready[0].status != READY or self.ready[0].expires_at < now):
+            ticket = self.ready.popleft()
+            if ticket.status == READY:
+                # Admitted but never claimed; give its slot back
+                ticket.status = EXPIRED
+                self.in_flight -= 1
+                self.stats["expired"] += 1
+            tickets.pop(ticket.id, None)
+        while self.queue:
+            head = self.queue[0]
+            if head.expires_at < now:
+                # Nobody came back for it; skip without spending a token
+                self.queue.popleft()
+                head.status = EXPIRED
+                tickets.pop(head.id, None)
+                self.stats["expired"] += 1
+                continue
+            if not self._can_admit():
+                return
+            self.queue.popleft()
+            self._admit()
+            head.status = READY
+            head.expires_at = now + READY_TTL
+            self.ready.append(head)
+            if head.waiter is not None and not head.waiter.done():
+                head.waiter.set_result(True)
+
+    def _ensure_pump(self):
+        loop = asyncio.get_running_loop()
+        if self.pump is None or self.pump.done() or self.pump.get_loop() is not loop:
+            self.pump = loop.create_task(self._run_pump())
+
+    async def _run_pump(self):
+        while self.queue:
+            self._advance(time.monotonic())
+            # Waiting for a slot is woken by release(); only token refills need polling
+            await asyncio.sleep(max(0.001, (1 - self.tokens) / self.rate) if self.tokens < 1 else 0.05)
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in the queue (an upper bound if tickets ahead expire)"""
+        if ticket.status != WAITING or not self.queue:
+            return 0
+        return ticket.seq - self.queue[0].seq + 1
+
+    def eta(self, ticket: Ticket) -> float:
+        position = self.position(ticket)
+        if position == 0:
+            return 0.0
+        return round(max(0.0, position - self.tokens) / self.rate, 1)
+
+    def enter(self, now: float) -> Optional[Ticket]:
+        """Admit right away (returns None) or return a ticket at the back of the queue"""
+        self._advance(now)
+        if not self.queue and self._can_admit():
+            self._admit()
+            return None
+        if len(self.queue) >= self.max_queue:
+            raise QueueFull()
+        ticket = Ticket(self, self.next_seq, now)
+        self.next_seq += 1
+        self.queue.append(ticket)
+        self.stats["queued"] += 1
+        self.stats["max_queue_length"] = max(self.stats["max_queue_length"], len(self.queue))
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> bool:
+        """Wait up to ``max_wait`` for the ticket's turn; True once admitted"""
+        if ticket.status == WAITING:
+            ticket.expires_at = time.monotonic() + TICKET_TTL
+            ticket.waiter = asyncio.get_running_loop().create_future()
+            self._ensure_pump()
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.waiter), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                ticket.waiter = None
+        if ticket.status == READY:
+            ticket.status = ADMITTED
+            tickets.pop(ticket.id, None)
+            return True
+        return False
+
+    def to_dict(self) -> dict:
+        self._refill(time.monotonic())
+        return {
+            "name": self.name,
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "max_concurrent": self.max_concurrent,
+            "tokens": round(self.tokens, 2),
+            "in_flight": self.in_flight,
+            "queue_length": len(self.queue),
+            **self.stats,
+        }
+
+
+gates: Dict[str, AdmissionGate] = {name: AdmissionGate(name, **config) for name, config in GATES.items()}
+tickets: Dict[str, Ticket] = {}
+
+
+def ticket_status(ticket_id: str) -> Optional[dict]:
+    ticket = tickets.get(ticket_id)
+    if ticket is None:
+        return None
+    gate = ticket.gate
+    gate._advance(time.monotonic())
+    if ticket.status == WAITING:
+        ticket.expires_at = time.monotonic() + TICKET_TTL
+    return {
+        "ticket": ticket.id,
+        "gate": gate.name,
+        "status": ticket.status,
+        "position": gate.position(ticket),
+        "eta_seconds": gate.eta(ticket),
+    }
+
+
+# ============== MIDDLEWARE ==============
+
+class AdmissionMiddleware:
+    """ASGI middleware queueing requests to ``routes`` behind their gate"""
+
+    def __init__(self, app, routes=None, gates_by_name=None):
+        self.app = app
+        self.routes = ADMISSION_ROUTES if routes is None else routes
+        self.gates = gates if gates_by_name is None else gates_by_name
+
+    def _gate(self, scope) -> Optional[AdmissionGate]:
+        method = scope["method"]
+        path = scope["path"]
+        for m, pattern, name in self.routes:
+            if method == m and pattern.match(path):
+                return self.gates.get(name)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        gate = self._gate(scope) if scope["type"] == "http" else None
+        if gate is None:
+            return await self.app(scope, receive, send)
+
+        now = time.monotonic()
+        ticket = tickets.get(Headers(scope=scope).get(TICKET_HEADER) or "")
+        if ticket is None or ticket.gate is not gate:
+            try:
+                ticket = gate.enter(now)
+            except QueueFull:
+                gate.stats["rejected"] += 1
+                retry_after = max(1, round(len(gate.queue) / gate.rate))
+                return await JSONResponse(
+                    {"detail": "Too many requests are waiting, please try again later"},
+                    status_code=503,
+                    headers={"Retry-After": str(retry_after)}
+                )(scope, receive, send)
+            if ticket is not None:
+                tickets[ticket.id] = ticket
+        else:
+            gate._advance(now)
+
+        if ticket is not None and not await gate.wait(ticket):
+            gate.stats["timed_out"] += 1
+            eta = gate.eta(ticket)
+            return await JSONResponse(
+                {
+                    "detail": "You are in the queue, please retry with your ticket",
+                    "ticket": ticket.id,
+                    "position": gate.position(ticket),
+                    "eta_seconds": eta,
+                },
+                status_code=503,
+                headers={"Retry-After": str(max(1, round(eta))), "X-Queue-Ticket": ticket.id}
+            )(scope, receive, send)
+
+        gate.stats["admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
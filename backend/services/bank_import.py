@@ -0,0 +1,331 @@
+"""Reconcile bank statements against open invoices.
+
+Statements are parsed one line (CSV) or one entry (CAMT.053 XML) at a time,
+so memory depends on the number of open invoices, not the file size. Open
+invoices are loaded once into a dict keyed by invoice number. Each credit
+line is matched by the invoice number found in its reference and by the
+exact amount in cents. All matches are applied with one executemany UPDATE
+that only touches payments still pending or overdue, so an invoice paid in
+the meantime is never overwritten. Everything else goes into the mismatch
+report.
+"""
+import csv
+import io
+import itertools
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from functools import lru_cache
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.orm import Session
+
+from models.payment import Payment, PaymentStatus, PaymentMethod
+from models.activity_log import ActivityLog
+
+FORMAT_CSV = "csv"
+FORMAT_CAMT = "camt"
+
+OPEN_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+INVOICE_PATTERN = re.compile(r"INV-\d{4}-\d+", re.IGNORECASE)
+MISMATCH_SAMPLE_LIMIT = 1000
+
+REASON_NO_REFERENCE = "no_reference"
+REASON_UNKNOWN_INVOICE = "unknown_invoice"
+REASON_AMOUNT_MISMATCH = "amount_mismatch"
+REASON_DUPLICATE = "duplicate"
+REASON_INVALID_LINE = "invalid_line"
+
+CSV_COLUMNS = {
+    "reference": ("reference", "variable_symbol", "vs", "remittance_information", "message", "description"),
+    "amount": ("amount", "credit"),
+    "booking_date": ("booking_date", "date", "value_date"),
+    "counterparty": ("counterparty", "payer", "name"),
+}
+
+
+class StatementError(Exception):
+    """The statement cannot be read at all (bad header, malformed XML)"""
+
+
+class StatementLine:
+    __slots__ = ("line", "reference", "amount", "booking_date", "counterparty", "error")
+
+    def __init__(self, line: int, reference: str = "", amount: Optional[float] = None,
+                 booking_date: Optional[datetime] = None, counterparty: str = "", error: Optional[str] = None):
+        self.line = line
+        self.reference = reference
+        self.amount = amount
+        self.booking_date = booking_date
+        self.counterparty = counterparty
+        self.error = error
+
+
+# ============== PARSING ==============
+
+def parse_amount(value: str) -> float:
+    """Parse ``1234.50``, ``1 234,50``, ``1,234.50`` or ``1.234,50``"""
+    value = value.replace(" ", "").replace("\u00a0", "").replace("€", "")
+    if "," in value and ("." not in value or value.rfind(",") > value.rfind(".")):
+        value = value.replace(".", "").replace(",", ".")
+    return float(value.replace(",", ""))
+
+
+@lru_cache(maxsize=1024)
+def parse_date(value: str) -> Optional[datetime]:
+    # Cached: a statement repeats a handful of booking dates on every line
+    value = value.strip()
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value[:19], fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _csv_field_map(header: List[str]) -> Dict[str, int]:
+    normalized = [h.strip().lower().replace(" ", "_") for h in header]
+    fields = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in normalized:
+                fields[field] = normalized.index(alias)
+                break
+    if "reference" not in fields or "amount" not in fields:
+        raise StatementError("CSV header must contain a reference and an amount column")
+    return fields
+
+
+def parse_csv(stream: IO[str]) -> Iterator[StatementLine]:
+    header_line = stream.readline()
+    if not header_line.strip():
+        return
+    try:
+        dialect = csv.Sniffer().sniff(header_line, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(itertools.chain([header_line], stream), dialect)
+
+    fields = _csv_field_map(next(reader))
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        line = StatementLine(reader.line_num)
+        try:
+            line.reference = row[fields["reference"]].strip()
+            line.amount = parse_amount(row[fields["amount"]])
+            if "booking_date" in fields:
+                line.booking_date = parse_date(row[fields["booking_date"]])
+            if "counterparty" in fields:
+                line.counterparty = row[fields["counterparty"]].strip()
+        except (IndexError, ValueError) as e:
+            line.error = f"Cannot parse line: {e}"
+        yield line
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find(element, *path: str):
+    """Namespace-agnostic child lookup along ``path``"""
+    for name in path:
+        if element is None:
+            return None
+        element = next((child for child in element if _local(child.tag) == name), None)
+    return element
+
+
+def _text(element) -> str:
+    return element.text.strip() if element is not None and element.text else ""
+
+
+def parse_camt(stream: IO[bytes]) -> Iterator[StatementLine]:
+    """Credit entries of a CAMT.053 statement, streamed with iterparse"""
+    index = 0
+    try:
+        for event, element in ET.iterparse(stream, events=("end",)):
+            if _local(element.tag) != "Ntry":
+                continue
+            index += 1
+            if _text(_find(element, "CdtDbtInd")) == "CRDT":
+                details = _find(element, "NtryDtls", "TxDtls")
+                remittance = _find(details, "RmtInf")
+                reference = _text(_find(remittance, "Strd", "CdtrRefInf", "Ref")) or " ".join(
+                    _text(child) for child in (remittance if remittance is not None else []) if _local(child.tag) == "Ustrd"
+                )
+                line = StatementLine(
+                    index,
+                    reference=reference,
+                    booking_date=parse_date(_text(_find(element, "BookgDt", "Dt")) or _text(_find(element, "BookgDt", "DtTm"))),
+                    counterparty=_text(_find(details, "RltdPties", "Dbtr", "Nm"))
+                )
+                try:
+                    line.amount = parse_amount(_text(_find(element, "Amt")))
+                except ValueError as e:
+                    line.error = f"Cannot parse amount: {e}"
+                yield line
+            element.clear()
+    except ET.ParseError as e:
+        raise StatementError(f"Malformed CAMT statement: {e}")
+
+
+# ============== MATCHING ==============
+
+def load_open_invoices(db: Session) -> Dict[str, Tuple[int, int]]:
+    """Invoice number -> (payment id, amount in cents) for every open payment"""
+    rows = db.query(Payment.id, Payment.invoice_number, Payment.amount).filter(
+        Payment.status.in_(OPEN_STATUSES),
+        Payment.invoice_number.isnot(None)
+    ).all()
+    return {number.upper(): (payment_id, round(amount * 100)) for payment_id, number, amount in rows}
+
+
+def _mismatch(line: StatementLine, reason: str, invoice_number: Optional[str] = None,
+              expected_amount: Optional[float] = None) -> dict:
+    return {
+        "line": line.line,
+        "reference": line.reference,
+        "amount": line.amount,
+        "booking_date": line.booking_date,
+        "counterparty": line.counterparty,
+        "invoice_number": invoice_number,
+        "expected_amount": expected_amount,
+        "reason": reason,
+        "detail": line.error,
+    }
+
+
+def match_lines(lines: Iterator[StatementLine], open_invoices: Dict[str, Tuple[int, int]]):
+    """Yield ``("match", params)`` or ``("mismatch", report_row)`` per credit line"""
+    seen = set()
+    for line in lines:
+        if line.error:
+            yield "mismatch", _mismatch(line, REASON_INVALID_LINE)
+            continue
+        if line.amount is None or line.amount <= 0:
+            continue  # debits and zero lines are not payments to us
+
+        found = INVOICE_PATTERN.search(line.reference)
+        if not found:
+            yield "mismatch", _mismatch(line, REASON_NO_REFERENCE)
+            continue
+        invoice_number = found.group(0).upper()
+        invoice = open_invoices.get(invoice_number)
+        if invoice is None:
+            yield "mismatch", _mismatch(line, REASON_UNKNOWN_INVOICE, invoice_number)
+            continue
+        payment_id, expected_cents = invoice
+        if invoice_number in seen:
+            yield "mismatch", _mismatch(line, REASON_DUPLICATE, invoice_number, expected_cents / 100)
+            continue
+        if round(line.amount * 100) != expected_cents:
+            yield "mismatch", _mismatch(line, REASON_AMOUNT_MISMATCH, invoice_number, expected_cents / 100)
+            continue
+        seen.add(invoice_number)
+        yield "match", {
+            "payment_id": payment_id,
+            "paid_date": line.booking_date or datetime.now(),
+            "amount": line.amount,
+        }
+
+
+def import_statement(
+    db: Session,
+    stream,
+    statement_format: str,
+    user_id: int,
+    filename: Optional[str] = None,
+    dry_run: bool = False,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+) -> dict:
+    """Parse, match and (unless ``dry_run``) apply a statement; returns the report.
+
+    ``stream`` is a text stream for CSV and a binary stream for CAMT.
+    """
+    lines = parse_csv(stream) if statement_format == FORMAT_CSV else parse_camt(stream)
+    open_invoices = load_open_invoices(db)
+
+    matches: List[dict] = []
+    mismatches: List[dict] = []
+    matched_amount = 0.0
+    mismatch_counts: Dict[str, int] = {}
+    lines_read = 0
+
+    def counted():
+        nonlocal lines_read
+        for line in lines:
+            lines_read += 1
+            yield line
+
+    for kind, item in match_lines(counted(), open_invoices):
+        if kind == "match":
+            matches.append(item)
+            matched_amount += item["amount"]
+        else:
+            mismatches.append(item)
+            mismatch_counts[item["reason"]] = mismatch_counts.get(item["reason"], 0) + 1
+
+    applied = 0
+    if matches and not dry_run:
+        table = Payment.__table__
+        result = db.execute(
+            update(table).where(
+                table.c.id == bindparam("payment_id"),
+                # Expanding IN lists cannot be used with executemany
+                or_(*(table.c.status == open_status for open_status in OPEN_STATUSES))
+            ).values(
+                status=PaymentStatus.PAID,
+                paid_date=bindparam("paid_date"),
+                payment_method=PaymentMethod.BANK_TRANSFER
+            ),
+            [{"payment_id": m["payment_id"], "paid_date": m["paid_date"]} for m in matches]
+        )
+        applied = result.rowcount
+
+    report = {
+        "filename": filename,
+        "format": statement_format,
+        "dry_run": dry_run,
+        "lines_read": lines_read,
+        "matched": len(matches),
+        "matched_amount": round(matched_amount, 2),
+        "applied": applied,
+        "mismatched": len(mismatches),
+        "mismatch_counts": mismatch_counts,
+        "mismatches": mismatches,
+    }
+    if not dry_run:
+        db.add(ActivityLog(
+            user_id=user_id,
+            action="bank_statement_imported",
+            details=(
+                f"Imported bank statement {filename or ''}: {applied} payments marked paid "
+                f"(€{report['matched_amount']:.2f}), {len(mismatches)} mismatches"
+            ),
+            ip_address=ip_address,
+            user_agent=user_agent
+        ))
+        db.commit()
+    return report
+
+
+def mismatch_csv(mismatches: List[dict]) -> Iterator[str]:
+    """Render the mismatch report as CSV, one row at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = [
+        "line", "reference", "amount", "booking_date", "counterparty",
+        "invoice_number", "expected_amount", "reason", "detail"
+    ]
+    writer.writerow(columns)
+    for row in mismatches:
+        writer.writerow([row[c] if row[c] is not None else "" for c in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,192 @@
+"""Bulk billing runs: one payment per targeted user, in one transaction.
+
+Targets are read in keyset-paginated chunks. Each chunk takes a block of
+invoice numbers from ``services.invoices`` and is written with a single
+bulk insert. The whole run, its ``BillingRun`` row and one summary
+``ActivityLog`` entry are committed together, so a failed run leaves
+nothing behind. The run id is the idempotency key: submitting the same id
+again returns the stored run, and reusing it with different parameters is
+rejected.
+"""
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import Float, and_, exists, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.user import User, UserRole
+from models.payment import Payment, PaymentType, PaymentStatus, BillingRun
+from models.enrollment import Enrollment, EnrollmentStatus
+from models.dormitory import Dormitory, DormitoryApplication, ApplicationStatus
+from models.activity_log import ActivityLog
+from services import invoices
+
+CHUNK_SIZE = 1000
+
+INACTIVE_ENROLLMENTS = (EnrollmentStatus.WITHDRAWN, EnrollmentStatus.REJECTED)
+
+
+class BillingRunConflict(Exception):
+    """The run id was already used with different parameters"""
+
+
+class BillingRunInvalid(Exception):
+    """The run parameters cannot produce payments"""
+
+
+def canonical_parameters(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _residence(criteria: dict):
+    """Approved dormitory application of the user, optionally for one dormitory"""
+    condition = and_(
+        DormitoryApplication.student_id == User.id,
+        DormitoryApplication.status == ApplicationStatus.APPROVED
+    )
+    if criteria.get("dormitory_id") is not None:
+        condition = and_(condition, DormitoryApplication.dormitory_id == criteria["dormitory_id"])
+    return condition
+
+
+def _target_query(db: Session, params: dict):
+    """Query of ``(user_id, amount)`` for every user the run bills"""
+    criteria = params.get("criteria") or {}
+    residents_only = criteria.get("dormitory_residents") or criteria.get("dormitory_id") is not None
+
+    if params.get("amount") is not None:
+        amount = literal(float(params["amount"]), Float)
+    elif residents_only:
+        # Rent runs without a fixed amount bill each resident their dormitory's rent
+        amount = select(Dormitory.monthly_rent).join(
+            DormitoryApplication, DormitoryApplication.dormitory_id == Dormitory.id
+        ).where(_residence(criteria)).order_by(DormitoryApplication.id.desc()).limit(1).scalar_subquery()
+    else:
+        raise BillingRunInvalid("amount is required unless billing dormitory residents")
+
+    query = db.query(User.id, amount.label("amount")).filter(
+        User.is_active == True,
+        User.role == UserRole(criteria.get("role") or UserRole.STUDENT)
+    )
+    if criteria.get("user_ids"):
+        query = query.filter(User.id.in_(criteria["user_ids"]))
+    if criteria.get("subject_id") is not None or criteria.get("semester"):
+        enrolled = exists().where(
+            Enrollment.student_id == User.id,
+            Enrollment.status.notin_(INACTIVE_ENROLLMENTS)
+        )
+        if criteria.get("subject_id") is not None:
+            enrolled = enrolled.where(Enrollment.subject_id == criteria["subject_id"])
+        if criteria.get("semester"):
+            enrolled = enrolled.where(Enrollment.semester == criteria["semester"])
+        query = query.filter(enrolled)
+    if residents_only:
+        query = query.filter(exists().where(_residence(criteria)))
+    return query
+
+
+def iter_targets(db: Session, params: dict, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Tuple[int, float]]]:
+    last_id = 0
+    while True:
+        rows = _target_query(db, params).filter(User.id > last_id).order_by(User.id).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def preview_billing(db: Session, params: dict) -> dict:
+    """What a run would create, without writing anything"""
+    users = 0
+    total = 0.0
+    for rows in iter_targets(db, params):
+        users += len(rows)
+        total += sum(amount or 0 for _, amount in rows)
+    return {"users": users, "total_amount": round(total, 2)}
+
+
+def _existing_run(db: Session, run_id: str, parameters: str) -> Optional[BillingRun]:
+    run = db.query(BillingRun).filter(BillingRun.id == run_id).first()
+    if run is not None and run.parameters != parameters:
+        raise BillingRunConflict(f"Billing run {run_id} already exists with different parameters")
+    return run
+
+
+def run_billing(
+    db: Session,
+    run_id: str,
+    params: dict,
+    created_by: int,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+) -> Tuple[BillingRun, bool]:
+    """Execute a billing run; returns the run and whether it was created now"""
+    parameters = canonical_parameters(params)
+    run = _existing_run(db, run_id, parameters)
+    if run is not None:
+        return run, False
+
+    payment_type = PaymentType(params["payment_type"])
+    run = BillingRun(
+        id=run_id,
+        created_by=created_by,
+        payment_type=payment_type,
+        description=params["description"],
+        parameters=parameters
+    )
+    db.add(run)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Another request created the same run first
+        db.rollback()
+        return _existing_run(db, run_id, parameters), False
+
+    try:
+        created = 0
+        total = 0.0
+        first_number = last_number = None
+        for rows in iter_targets(db, params):
+            numbers = invoices.allocate_invoice_numbers(db, len(rows))
+            db.execute(insert(Payment), [
+                {
+                    "user_id": user_id,
+                    "payment_type": payment_type,
+                    "description": params["description"],
+                    "amount": amount,
+                    "status": PaymentStatus.PENDING,
+                    "due_date": params.get("due_date"),
+                    "invoice_number": number,
+                    "billing_run_id": run_id,
+                }
+                for (user_id, amount), number in zip(rows, numbers)
+            ])
+            created += len(rows)
+            total += sum(amount for _, amount in rows)
+            first_number = first_number or numbers[0]
+            last_number = numbers[-1]
+
+        run.payments_created = created
+        run.total_amount = round(total, 2)
+        run.first_invoice_number = first_number
+        run.last_invoice_number = last_number
+        run.finished_at = datetime.now()
+
+        db.add(ActivityLog(
+            user_id=created_by,
+            action="billing_run",
+            details=(
+                f"Billing run {run_id}: {created} {payment_type.value} payments, €{run.total_amount:.2f}"
+                + (f" ({first_number} - {last_number})" if created else "")
+            ),
+            ip_address=ip_address,
+            user_agent=user_agent
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(run)
+    return run, True
@@ -0,0 +1,123 @@
+"""Session hooks that keep the in-process caches in step with commits.
+
+A cache registers a ``Tracker`` for the tables it reads. The hooks below
+notice every ORM flush, bulk insert/update/delete or Core statement that
+touches those tables, remember it in ``session.info`` and call the
+tracker's ``invalidate`` once the transaction commits; a rollback forgets
+it. Writes made by other worker processes cannot be seen this way, which
+is why every cache also expires its entries after its own ``CACHE_TTL``.
+
+Seat counters (``subjects.enrolled_count``, ``exams.registered_count``)
+change on every enrollment and registration but never change what the
+caches show, so statements that only move a counter are marked with the
+``seat_counter=True`` execution option and ignored.
+"""
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Type, Union
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SEAT_COUNTER = "seat_counter"
+
+# True: everything may have changed; a dict of id sets: only those did
+Changes = Union[bool, Dict[str, Set[int]]]
+
+
+class Tracker(NamedTuple):
+    key: str  # session.info key holding the changes of the open transaction
+    tables: Set[str]
+    invalidate: Callable[..., None]  # called with no arguments or with the collected id sets
+    flushed: Callable[[Session], Changes]  # what a flush changed
+    statements: Tuple[str, ...] = ("insert", "update", "delete")
+
+
+_trackers: List[Tracker] = []
+
+
+def track(
+    key: str,
+    models: Iterable[Type],
+    invalidate: Callable[..., None],
+    flushed: Optional[Callable[[Session], Changes]] = None,
+    statements: Tuple[str, ...] = ("insert", "update", "delete")
+) -> Tracker:
+    """Call ``invalidate`` after commits that wrote to ``models``.
+
+    ``flushed`` decides what a flush changed; by default any new, dirty or
+    deleted instance of ``models`` changes everything. Bulk statements of
+    the kinds in ``statements`` always change everything.
+    """
+    models = tuple(models)
+    tracker = Tracker(
+        key,
+        {model.__tablename__ for model in models},
+        invalidate,
+        flushed or (lambda session: touched(session, models)),
+        statements
+    )
+    _trackers.append(tracker)
+    return tracker
+
+
+def touched(session: Session, models, states=("new", "dirty", "deleted")) -> bool:
+    """Whether the flush wrote an instance of ``models``"""
+    return any(isinstance(obj, models) for obj in chain.from_iterable(getattr(session, state) for state in states))
+
+
+def pending(session: Session, key: str) -> bool:
+    """Whether the session's open transaction changed what tracker ``key`` caches"""
+    return bool(session.info.get(key))
+
+
+def _record(session: Session, key: str, changes: Changes):
+    if not changes:
+        return
+    current = session.info.get(key)
+    if changes is True or current is True:
+        session.info[key] = True
+        return
+    current = session.info.setdefault(key, {})
+    for name, ids in changes.items():
+        current.setdefault(name, set()).update(ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    for tracker in _trackers:
+        _record(session, tracker.key, tracker.flushed(session))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_execute(orm_execute_state):
+    if orm_execute_state.is_insert:
+        kind = "insert"
+    elif orm_execute_state.is_update:
+        kind = "update"
+    elif orm_execute_state.is_delete:
+        kind = "delete"
+    else:
+        return
+    if orm_execute_state.execution_options.get(SEAT_COUNTER):
+        return
+    table = getattr(getattr(orm_execute_state.statement, "table", None), "name", None)
+    for tracker in _trackers:
+        if table in tracker.tables and kind in tracker.statements:
+            # Bulk statements don't say which rows they touch
+            orm_execute_state.session.info[tracker.key] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    for tracker in _trackers:
+        changes = session.info.pop(tracker.key, None)
+        if changes is True:
+            tracker.invalidate()
+        elif changes:
+            tracker.invalidate(**changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    for tracker in _trackers:
+        session.info.pop(tracker.key, None)
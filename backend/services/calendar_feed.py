@@ -0,0 +1,255 @@
+"""Per-user iCalendar (.ics) feeds.
+
+A feed holds the user's class sessions (from ``class_occurrences``, so
+holidays are left out and cancelled sessions are marked), their
+assignment due dates and their thesis deadlines.
+Calendar apps poll feeds often, and nothing changes between most polls,
+so a rendered feed is cached per user for ``CACHE_TTL`` seconds. A
+commit drops only the feeds showing the subjects and users it touched,
+or every feed after a bulk statement (see ``services.cache_hooks``).
+The ETag is a hash of the feed content without DTSTAMP, so a client
+gets 304 even if its feed was regenerated without changes.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from models.user import User, UserRole
+from models.subject import Subject
+from models.schedule import Schedule, SemesterCalendar, SemesterHoliday, ClassCancellation, ClassOccurrence
+from models.enrollment import Enrollment
+from models.assignment import Assignment
+from models.thesis import Thesis
+from services.enrollments import SEAT_HOLDING_STATUSES
+from services import cache_hooks, occurrences
+
+CACHE_TTL = 300
+MAX_CACHED_FEEDS = 2048
+# Stored datetimes are naive local times of the faculty
+LOCAL_ZONE = ZoneInfo("Europe/Bratislava")
+UID_DOMAIN = "ais.tuke.sk"
+
+_FEED_MODELS = (Subject, Schedule, Enrollment, Assignment, Thesis)
+# Changes to these move sessions of many subjects at once
+_CALENDAR_MODELS = (SemesterCalendar, SemesterHoliday, ClassCancellation)
+_DTSTAMP = "DTSTAMP:{dtstamp}"
+
+_lock = threading.Lock()
+_version = 0
+_feeds: "OrderedDict[int, Feed]" = OrderedDict()
+_readers: Dict[int, Set[int]] = defaultdict(set)  # subject id -> users whose cached feed shows it
+
+
+class Feed(NamedTuple):
+    built_at: float
+    etag: str
+    body: bytes
+    subject_ids: FrozenSet[int]
+
+
+# ============== CACHE INVALIDATION ==============
+
+def _values(obj, attribute: str) -> Set[int]:
+    """Current and pre-flush values of ``attribute`` (a moved row affects both sides)"""
+    history = inspect(obj).attrs[attribute].history
+    return {value for value in chain(history.added, history.unchanged, history.deleted, [getattr(obj, attribute)]) if value is not None}
+
+
+def _flushed(session):
+    """True if every feed may have changed, else the subject and user ids the flush touched"""
+    subjects, users = set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, _CALENDAR_MODELS):
+            return True
+        if isinstance(obj, Subject):
+            subjects |= _values(obj, "id")
+            users |= _values(obj, "teacher_id")
+        elif isinstance(obj, (Schedule, Assignment)):
+            subjects |= _values(obj, "subject_id")
+        elif isinstance(obj, (Enrollment, Thesis)):
+            users |= _values(obj, "student_id")
+    return (subjects or users) and {"subject_ids": subjects, "user_ids": users}
+
+
+def _drop(user_id: int):
+    cached = _feeds.pop(user_id, None)
+    if cached is not None:
+        for subject_id in cached.subject_ids:
+            readers = _readers.get(subject_id)
+            if readers is not None:
+                readers.discard(user_id)
+                if not readers:
+                    del _readers[subject_id]
+
+
+def invalidate(subject_ids: Optional[Iterable[int]] = None, user_ids: Optional[Iterable[int]] = None):
+    """Drop the feeds showing any of ``subject_ids`` and those of ``user_ids``; all without arguments"""
+    global _version
+    with _lock:
+        _version += 1
+        if subject_ids is None and user_ids is None:
+            _feeds.clear()
+            _readers.clear()
+            return
+        stale = set(user_ids or ())
+        for subject_id in subject_ids or ():
+            stale |= _readers.get(subject_id, set())
+        for user_id in stale:
+            _drop(user_id)
+
+
+cache_hooks.track("calendar_changed", _FEED_MODELS + _CALENDAR_MODELS, invalidate, _flushed)
+
+
+# ============== RENDERING ==============
+
+def _utc(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOCAL_ZONE)
+    return value.astimezone(ZoneInfo("UTC")).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _escape(text: str) -> str:
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Split a content line into 75-octet pieces (RFC 5545 3.1)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    pieces, current = [], b""
+    for char in line:
+        size = len(char.encode("utf-8"))
+        if len(current) + size > (75 if not pieces else 74):
+            pieces.append(current.decode("utf-8"))
+            current = b""
+        current += char.encode("utf-8")
+    pieces.append(current.decode("utf-8"))
+    return "\r\n ".join(pieces)
+
+
+def _event(
+    uid: str,
+    start: datetime,
+    end: datetime,
+    summary: str,
+    location: str = "",
+    description: str = "",
+    cancelled: bool = False
+) -> List[str]:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@{UID_DOMAIN}",
+        _DTSTAMP,
+        f"DTSTART:{_utc(start)}",
+        f"DTEND:{_utc(end)}",
+        f"SUMMARY:{_escape(summary)}",
+    ]
+    if cancelled:
+        lines.append("STATUS:CANCELLED")
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def render(db: Session, user: User) -> Tuple[str, bytes, Set[int]]:
+    """(etag, body, subject ids shown) of the user's feed, built from the database"""
+    if user.role == UserRole.STUDENT:
+        classes = occurrences.for_user(db, user)
+        subject_ids = {row.subject_id for row in db.query(Enrollment.subject_id).filter(
+            Enrollment.student_id == user.id,
+            Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+        )}
+        theses = db.query(Thesis).filter(Thesis.student_id == user.id).order_by(Thesis.id).all()
+    else:
+        # Admins get the subjects they teach, like teachers, not every class
+        subject_ids = {row.id for row in db.query(Subject.id).filter(Subject.teacher_id == user.id)}
+        classes = db.query(ClassOccurrence).filter(ClassOccurrence.subject_id.in_(subject_ids)).order_by(
+            ClassOccurrence.starts_at, ClassOccurrence.id
+        )
+        theses = []
+
+    names = {row.id: row for row in db.query(Subject.id, Subject.code, Subject.name).filter(Subject.id.in_(subject_ids))}
+    assignments = db.query(Assignment, Subject.code).join(Subject, Subject.id == Assignment.subject_id).filter(
+        Assignment.subject_id.in_(subject_ids)
+    ).order_by(Assignment.id).all()
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//TUKE//AIS//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:AIS TUKE",
+    ]
+    for session in classes:
+        subject = names.get(session.subject_id)
+        if subject is None:
+            continue
+        lines += _event(
+            f"schedule-{session.schedule_id}-{session.starts_at:%Y%m%d}", session.starts_at, session.ends_at,
+            f"{subject.code} {subject.name} ({session.class_type.value})",
+            location=session.room, description=session.note or "", cancelled=session.cancelled
+        )
+    for assignment, code in assignments:
+        lines += _event(
+            f"assignment-{assignment.id}", assignment.due_date, assignment.due_date,
+            f"{code}: {assignment.title} due", description=assignment.description or ""
+        )
+    for thesis in theses:
+        lines += _event(
+            f"thesis-{thesis.id}-submission", thesis.submission_deadline, thesis.submission_deadline,
+            f"Thesis submission: {thesis.title}"
+        )
+        if thesis.defense_date:
+            lines += _event(
+                f"thesis-{thesis.id}-defense", thesis.defense_date, thesis.defense_date + timedelta(hours=1),
+                f"Thesis defense: {thesis.title}"
+            )
+    lines.append("END:VCALENDAR")
+
+    content = "\r\n".join(_fold(line) for line in lines) + "\r\n"
+    etag = '"' + hashlib.sha256(content.encode("utf-8")).hexdigest()[:32] + '"'
+    dtstamp = datetime.now(ZoneInfo("UTC")).strftime("%Y%m%dT%H%M%SZ")
+    return etag, content.replace(_DTSTAMP, _DTSTAMP.format(dtstamp=dtstamp)).encode("utf-8"), subject_ids
+
+
+def feed(db: Session, user: User) -> Feed:
+    """The user's (cached) feed"""
+    now = time.monotonic()
+    with _lock:
+        cached = _feeds.get(user.id)
+        version = _version
+        if cached is not None and now - cached.built_at < CACHE_TTL:
+            _feeds.move_to_end(user.id)
+            return cached
+    etag, body, subject_ids = render(db, user)
+    built = Feed(now, etag, body, frozenset(subject_ids))
+    with _lock:
+        # Don't store a feed built while anything was invalidated
+        if _version == version:
+            _drop(user.id)
+            _feeds[user.id] = built
+            for subject_id in built.subject_ids:
+                _readers[subject_id].add(user.id)
+            while len(_feeds) > MAX_CACHED_FEEDS:
+                _drop(next(iter(_feeds)))
+    return built
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
@@ -0,0 +1,172 @@
+"""Upcoming deadlines of a user, merged across sources.
+
+Every source (assignments, exams, thesis submission and defense dates,
+unpaid payments) is a generator over an indexed range query ordered by due
+date. ``heapq.merge`` combines the already sorted streams lazily and
+``upcoming`` stops after ``limit`` items. Each source reads keyset pages
+on (due date, id) that start small and double, so a request does not
+read much more than the rows it returns.
+
+Unpaid payments due before ``start`` are still owed, so that source has no
+lower bound: overdue payments sort first and lead the list.
+"""
+import heapq
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query, Session
+
+from models.user import User, UserRole
+from models.subject import Subject
+from models.enrollment import Enrollment
+from models.assignment import Assignment
+from models.thesis import Thesis
+from models.payment import Payment, PaymentStatus
+from models.exam import Exam, ExamRegistration
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+MIN_PAGE_SIZE = 8
+
+KIND_ASSIGNMENT = "assignment"
+KIND_EXAM = "exam"
+KIND_THESIS_SUBMISSION = "thesis_submission"
+KIND_THESIS_DEFENSE = "thesis_defense"
+KIND_PAYMENT = "payment"
+
+UNPAID_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+
+
+class Deadline(NamedTuple):
+    due_at: datetime
+    kind: str
+    id: int
+    title: str
+    subject_id: Optional[int] = None
+    subject_code: Optional[str] = None
+    subject_name: Optional[str] = None
+    amount: Optional[float] = None
+    status: Optional[str] = None
+
+
+def _paged(query: Query, due, key, page_size: int, to_deadline: Callable) -> Iterator[Deadline]:
+    """Rows of ``query`` in (due, key) order, fetched in growing keyset pages"""
+    after = None
+    while True:
+        page = query
+        if after is not None:
+            page = page.filter(or_(due > after[0], and_(due == after[0], key > after[1])))
+        rows = page.order_by(due, key).limit(page_size).all()
+        for row in rows:
+            yield to_deadline(row)
+        if len(rows) < page_size:
+            return
+        after = (rows[-1].due_at, rows[-1].id)
+        page_size *= 2
+
+
+def _assignments(db: Session, subject_ids: List[int], start: datetime, end: Optional[datetime], page_size: int):
+    query = db.query(
+        Assignment.id, Assignment.title, Assignment.due_date.label("due_at"),
+        Subject.id.label("subject_id"), Subject.code, Subject.name
+    ).join(Subject, Subject.id == Assignment.subject_id).filter(
+        Assignment.subject_id.in_(subject_ids),
+        Assignment.due_date >= start
+    )
+    if end is not None:
+        query = query.filter(Assignment.due_date < end)
+    return _paged(query, Assignment.due_date, Assignment.id, page_size, lambda row: Deadline(
+        row.due_at, KIND_ASSIGNMENT, row.id, row.title, row.subject_id, row.code, row.name
+    ))
+
+
+def _exams(db: Session, user: User, subject_ids: List[int], start: datetime, end: Optional[datetime], page_size: int):
+    """Exams the student registered for; a teacher's exams of their subjects"""
+    query = db.query(
+        Exam.id, Exam.exam_type, Exam.room, Exam.starts_at.label("due_at"),
+        Subject.id.label("subject_id"), Subject.code, Subject.name
+    ).join(Subject, Subject.id == Exam.subject_id).filter(Exam.starts_at >= start)
+    if user.role == UserRole.STUDENT:
+        query = query.join(ExamRegistration, ExamRegistration.exam_id == Exam.id).filter(
+            ExamRegistration.student_id == user.id
+        )
+    else:
+        query = query.filter(Exam.subject_id.in_(subject_ids))
+    if end is not None:
+        query = query.filter(Exam.starts_at < end)
+    return _paged(query, Exam.starts_at, Exam.id, page_size, lambda row: Deadline(
+        row.due_at, KIND_EXAM, row.id, f"{row.exam_type.value} ({row.room})", row.subject_id, row.code, row.name
+    ))
+
+
+def _theses(db: Session, student_id: int, column, kind: str, start: datetime, end: Optional[datetime], page_size: int):
+    query = db.query(Thesis.id, Thesis.title, Thesis.status, column.label("due_at")).filter(
+        Thesis.student_id == student_id,
+        column >= start
+    )
+    if end is not None:
+        query = query.filter(column < end)
+    return _paged(query, column, Thesis.id, page_size, lambda row: Deadline(
+        row.due_at, kind, row.id, row.title, status=row.status.value
+    ))
+
+
+def _payments(db: Session, user_id: int, start: datetime, end: Optional[datetime], page_size: int):
+    """Unpaid payments due before ``end``; ``start`` is ignored so overdue ones are kept.
+    Payments without a due date are no deadline and are left out."""
+    query = db.query(
+        Payment.id, Payment.description, Payment.amount, Payment.status, Payment.due_date.label("due_at")
+    ).filter(
+        Payment.user_id == user_id,
+        Payment.status.in_(UNPAID_STATUSES),
+        Payment.due_date.isnot(None)
+    )
+    if end is not None:
+        query = query.filter(Payment.due_date < end)
+    return _paged(query, Payment.due_date, Payment.id, page_size, lambda row: Deadline(
+        row.due_at, KIND_PAYMENT, row.id, row.description, amount=row.amount, status=row.status.value
+    ))
+
+
+def upcoming(
+    db: Session,
+    user: User,
+    start: datetime,
+    end: Optional[datetime] = None,
+    limit: int = DEFAULT_LIMIT
+) -> List[Deadline]:
+    """The first ``limit`` deadlines of ``user`` due in ``[start, end)``, soonest first,
+    after any unpaid payments that were due before ``start``.
+
+    Students get the assignments of their subjects, the exams they
+    registered for, their thesis dates and unpaid payments; teachers and
+    admins the assignments and exams of the subjects they teach and their
+    own unpaid payments.
+    """
+    if user.role == UserRole.STUDENT:
+        subject_ids = [row.subject_id for row in db.query(Enrollment.subject_id).filter(
+            Enrollment.student_id == user.id,
+            Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+        )]
+    else:
+        subject_ids = [row.id for row in db.query(Subject.id).filter(Subject.teacher_id == user.id)]
+
+    sources = [
+        partial(_assignments, db, subject_ids),
+        partial(_exams, db, user, subject_ids),
+        partial(_payments, db, user.id),
+    ]
+    if user.role == UserRole.STUDENT:
+        sources += [
+            partial(_theses, db, user.id, Thesis.submission_deadline, KIND_THESIS_SUBMISSION),
+            partial(_theses, db, user.id, Thesis.defense_date, KIND_THESIS_DEFENSE),
+        ]
+    # Even split of the limit as the first page; a source that runs ahead pages on
+    page_size = max(MIN_PAGE_SIZE, limit // len(sources) + 1)
+    streams = [source(start, end, page_size) for source in sources]
+    merged = heapq.merge(*streams, key=lambda deadline: (deadline.due_at, deadline.kind, deadline.id))
+    return list(islice(merged, limit))
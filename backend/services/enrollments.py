@@ -0,0 +1,263 @@
+"""Seat accounting for subject enrollments.
+
+``subjects.enrolled_count`` counts the enrollments that hold a seat
+(pending or confirmed). A seat is taken with one conditional
+``UPDATE ... WHERE enrolled_count < capacity``, so the check and the
+increment are a single atomic statement and concurrent enrollments can
+never push a subject past its capacity. The caller inserts the enrollment
+in the same transaction, so if the insert fails (e.g. the student is
+already enrolled) the rollback returns the seat too.
+
+A freed seat goes to the waitlist first: ``free_seat`` gives the seat
+back and promotes the student at the head of the subject's waitlist in
+the same transaction, with a notification. The head is found by an index
+seek on (subject_id, position), so promotion costs O(log n) however long
+the waitlist is.
+
+``enroll_batch`` does the same for a whole basket of subjects. It uses
+one query per check (subjects exist, not already enrolled, prerequisites
+passed) and one
+``UPDATE ... WHERE id IN (...) RETURNING id`` to take every seat that is
+still free. The enrollments are inserted in one statement in the same
+transaction.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from models.subject import Subject
+from models.enrollment import Enrollment, EnrollmentStatus, WaitlistEntry
+from models.notification import Notification, NotificationType
+from services import prerequisites
+
+SEAT_HOLDING_STATUSES = (EnrollmentStatus.PENDING, EnrollmentStatus.CONFIRMED)
+
+REASON_NOT_FOUND = "subject_not_found"
+REASON_ALREADY_ENROLLED = "already_enrolled"
+REASON_FULL = "subject_full"
+REASON_PREREQUISITES = "prerequisites_missing"
+
+
+class SubjectFull(Exception):
+    """The subject has no free seat left"""
+
+
+def holds_seat(status: EnrollmentStatus) -> bool:
+    return status in SEAT_HOLDING_STATUSES
+
+
+def reserve_seat(db: Session, subject_id: int) -> bool:
+    """Take one seat; False if the subject does not exist or is full"""
+    result = db.execute(
+        update(Subject).where(
+            Subject.id == subject_id,
+            or_(Subject.capacity.is_(None), Subject.enrolled_count < Subject.capacity)
+        ).values(enrolled_count=Subject.enrolled_count + 1)
+        .execution_options(synchronize_session=False, seat_counter=True)
+    )
+    return result.rowcount == 1
+
+
+def release_seat(db: Session, subject_id: int):
+    db.execute(
+        update(Subject).where(
+            Subject.id == subject_id,
+            Subject.enrolled_count > 0
+        ).values(enrolled_count=Subject.enrolled_count - 1)
+        .execution_options(synchronize_session=False, seat_counter=True)
+    )
+
+
+def free_seat(db: Session, subject_id: int) -> List[int]:
+    """Give a seat back and hand it to the waitlist; returns promoted student ids"""
+    release_seat(db, subject_id)
+    return promote_waitlisted(db, subject_id, limit=1)
+
+
+def change_status(db: Session, enrollment: Enrollment, new_status: EnrollmentStatus):
+    """Set the status, taking or giving back a seat when that changes.
+
+    Raises ``SubjectFull`` when reinstating an enrollment into a full subject.
+    """
+    if holds_seat(new_status) and not holds_seat(enrollment.status):
+        if not reserve_seat(db, enrollment.subject_id):
+            raise SubjectFull()
+    elif holds_seat(enrollment.status) and not holds_seat(new_status):
+        free_seat(db, enrollment.subject_id)
+    enrollment.status = new_status
+
+
+def recount(db: Session, subject_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute ``enrolled_count`` from the enrollments table"""
+    seats = select(func.count(Enrollment.id)).where(
+        Enrollment.subject_id == Subject.id,
+        Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+    ).scalar_subquery()
+    statement = update(Subject).values(enrolled_count=seats)
+    if subject_ids is not None:
+        statement = statement.where(Subject.id.in_(list(subject_ids)))
+    result = db.execute(statement.execution_options(synchronize_session=False, seat_counter=True))
+    return result.rowcount
+
+
+def enroll_batch(
+    db: Session,
+    student_id: int,
+    subject_ids: List[int],
+    semester: str,
+    partial: bool = False
+) -> Tuple[List[dict], List[dict]]:
+    """Enroll a student in several subjects in one transaction.
+
+    Returns ``(enrolled, failures)``; ``enrolled`` rows carry the subject
+    code and name. With ``partial`` the subjects that pass every check
+    are enrolled and the rest are reported. Otherwise any failure rolls
+    everything back and nothing is enrolled. Commits on success. A
+    duplicate inserted concurrently by another request raises
+    ``IntegrityError`` after rollback.
+    """
+    subject_ids = list(dict.fromkeys(subject_ids))
+    subjects = {row.id: row for row in db.query(Subject.id, Subject.code, Subject.name).filter(Subject.id.in_(subject_ids))}
+    enrolled = {row.subject_id for row in db.query(Enrollment.subject_id).filter(
+        Enrollment.student_id == student_id,
+        Enrollment.subject_id.in_(subject_ids),
+        Enrollment.semester == semester
+    )}
+
+    failures = []
+    candidates = []
+    for subject_id in subject_ids:
+        if subject_id not in subjects:
+            failures.append({"subject_id": subject_id, "reason": REASON_NOT_FOUND})
+        elif subject_id in enrolled:
+            failures.append({"subject_id": subject_id, "reason": REASON_ALREADY_ENROLLED})
+        else:
+            candidates.append(subject_id)
+
+    lacking = prerequisites.missing(db, student_id, candidates)
+    if lacking:
+        failures += [
+            {"subject_id": subject_id, "reason": REASON_PREREQUISITES, "missing_prerequisites": sorted(lacking[subject_id])}
+            for subject_id in candidates if subject_id in lacking
+        ]
+        candidates = [subject_id for subject_id in candidates if subject_id not in lacking]
+
+    if failures and not partial:
+        return [], failures
+
+    reserved = set()
+    if candidates:
+        reserved = set(db.execute(
+            update(Subject).where(
+                Subject.id.in_(candidates),
+                or_(Subject.capacity.is_(None), Subject.enrolled_count < Subject.capacity)
+            ).values(enrolled_count=Subject.enrolled_count + 1)
+            .returning(Subject.id)
+            .execution_options(synchronize_session=False, seat_counter=True)
+        ).scalars())
+    failures += [{"subject_id": subject_id, "reason": REASON_FULL} for subject_id in candidates if subject_id not in reserved]
+
+    if (failures and not partial) or not reserved:
+        db.rollback()
+        return [], failures
+
+    try:
+        rows = db.execute(
+            insert(Enrollment).values([
+                {"student_id": student_id, "subject_id": subject_id, "semester": semester,
+                 "status": EnrollmentStatus.CONFIRMED}
+                for subject_id in candidates if subject_id in reserved
+            ]).returning(Enrollment.id, Enrollment.subject_id, Enrollment.status, Enrollment.enrolled_date)
+        ).all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return [
+        {
+            "id": row.id,
+            "student_id": student_id,
+            "subject_id": row.subject_id,
+            "status": row.status,
+            "enrolled_date": row.enrolled_date,
+            "semester": semester,
+            "subject_code": subjects[row.subject_id].code,
+            "subject_name": subjects[row.subject_id].name,
+        }
+        for row in rows
+    ], failures
+
+
+# ============== WAITLIST ==============
+
+def join_waitlist(db: Session, student_id: int, subject_id: int, semester: str) -> int:
+    """Append the student to the subject's waitlist; returns the entry id.
+
+    The position is computed inside the INSERT, so concurrent joins cannot
+    get the same one. Raises ``IntegrityError`` if already waitlisted.
+    """
+    next_position = select(
+        literal(student_id), literal(subject_id), literal(semester),
+        func.coalesce(func.max(WaitlistEntry.position), 0) + 1
+    ).where(WaitlistEntry.subject_id == subject_id)
+    return db.execute(
+        insert(WaitlistEntry).from_select(
+            ["student_id", "subject_id", "semester", "position"], next_position
+        ).returning(WaitlistEntry.id)
+    ).scalar_one()
+
+
+def waitlist_rank(db: Session, entry: WaitlistEntry) -> int:
+    """1-based place of ``entry`` in its subject's waitlist"""
+    ahead = db.query(func.count(WaitlistEntry.id)).filter(
+        WaitlistEntry.subject_id == entry.subject_id,
+        WaitlistEntry.position < entry.position
+    ).scalar()
+    return ahead + 1
+
+
+def _waitlist_head(db: Session, subject_id: int):
+    return db.query(WaitlistEntry.id, WaitlistEntry.student_id, WaitlistEntry.semester).filter(
+        WaitlistEntry.subject_id == subject_id
+    ).order_by(WaitlistEntry.position).first()
+
+
+def promote_waitlisted(db: Session, subject_id: int, limit: Optional[int] = None) -> List[int]:
+    """Move students from the head of the waitlist into free seats.
+
+    Does not commit; the caller's transaction covers the freed seat, the
+    promotions and the notifications.
+    """
+    promoted = []
+    subject = None
+    while limit is None or len(promoted) < limit:
+        head = _waitlist_head(db, subject_id)
+        if head is None:
+            break
+        enrolled = db.query(Enrollment.id).filter(
+            Enrollment.student_id == head.student_id,
+            Enrollment.subject_id == subject_id,
+            Enrollment.semester == head.semester
+        ).first()
+        if enrolled is None and not reserve_seat(db, subject_id):
+            break
+        db.execute(delete(WaitlistEntry).where(WaitlistEntry.id == head.id))
+        if enrolled is not None:
+            continue  # enrolled some other way in the meantime
+        db.execute(insert(Enrollment).values(
+            student_id=head.student_id, subject_id=subject_id, semester=head.semester,
+            status=EnrollmentStatus.CONFIRMED
+        ))
+        if subject is None:
+            subject = db.query(Subject.code, Subject.name).filter(Subject.id == subject_id).one()
+        db.add(Notification(
+            user_id=head.student_id,
+            type=NotificationType.ENROLMENT,
+            title="Enrolled from Waitlist",
+            message=f"A seat opened up in {subject.code} {subject.name} ({head.semester}) and you are now enrolled.",
+            read=False
+        ))
+        promoted.append(head.student_id)
+    return promoted
@@ -0,0 +1,137 @@
+"""Seat allocation for exams spread over several rooms.
+
+``allocate`` is a pure function and runs in one pass, O(n log n):
+
+1. Students of each study group get evenly spaced positions in one
+   sequence of all students (member k of a group of m sits near
+   ``(k + phase) * n / m``, where the phase staggers the groups). Sorting
+   on these positions interleaves the groups, so neighbours in the
+   sequence rarely share a group.
+2. Rooms take consecutive runs of the sequence, each in proportion to its
+   capacity (largest remainder), so every room gets a similar mix.
+3. Within a room the seat numbers are spread over the whole capacity,
+   leaving free seats between students when the room is not full.
+
+``allocate_exam`` loads the registrations, allocates and writes every
+seat with one bulk UPDATE. It does not commit.
+"""
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models.user import User
+from models.exam import Exam, ExamRegistration
+
+
+class SeatingError(ValueError):
+    """The rooms cannot seat the exam"""
+
+
+class Seat(NamedTuple):
+    registration_id: int
+    room: str
+    seat_number: int
+
+
+def _spread(students: Sequence[Tuple[int, Optional[str]]]) -> List[Tuple[int, Optional[str]]]:
+    """Students reordered so that members of a group are evenly spaced"""
+    groups: Dict[Optional[str], list] = defaultdict(list)
+    for student in students:
+        groups[student[1]].append(student)
+    n = len(students)
+    ordered = sorted(groups.values(), key=lambda members: (-len(members), str(members[0][1])))
+    keyed = []
+    for index, members in enumerate(ordered):
+        phase = (index + 0.5) / len(ordered)
+        step = n / len(members)
+        keyed += [((k + phase) * step, index, student) for k, student in enumerate(members)]
+    keyed.sort(key=lambda item: (item[0], item[1]))
+    return [student for _, _, student in keyed]
+
+
+def _room_counts(n: int, capacities: Sequence[int]) -> List[int]:
+    """Split n students over the rooms in proportion to capacity"""
+    total = sum(capacities)
+    quotas = [n * capacity / total for capacity in capacities]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(capacities)), key=lambda r: quotas[r] - counts[r], reverse=True)
+    missing = n - sum(counts)
+    for r in by_remainder:
+        if missing == 0:
+            break
+        if counts[r] < capacities[r]:
+            counts[r] += 1
+            missing -= 1
+    return counts
+
+
+def allocate(students: Sequence[Tuple[int, Optional[str]]], rooms: Sequence[Tuple[str, int]]) -> List[Seat]:
+    """Seats for ``students`` as (registration id, study group) in ``rooms`` as (name, capacity)"""
+    names = [name for name, _ in rooms]
+    if len(set(names)) != len(names):
+        raise SeatingError("Every room may be listed only once")
+    capacity = sum(size for _, size in rooms)
+    if len(students) > capacity:
+        raise SeatingError(f"The rooms hold {capacity} seats but {len(students)} students are registered")
+    if not students:
+        return []
+
+    sequence = iter(_spread(students))
+    seats = []
+    for (room, size), count in zip(rooms, _room_counts(len(students), [size for _, size in rooms])):
+        for i in range(count):
+            registration_id, _ = next(sequence)
+            seats.append(Seat(registration_id, room, i * size // count + 1))
+    return seats
+
+
+def adjacent_same_group(seats: Sequence[Seat], groups: Dict[int, Optional[str]]) -> int:
+    """Pairs of students seated next to each other (by seat number) from the same group"""
+    by_room = defaultdict(list)
+    for seat in seats:
+        by_room[seat.room].append(seat)
+    pairs = 0
+    for room_seats in by_room.values():
+        room_seats.sort(key=lambda seat: seat.seat_number)
+        for left, right in zip(room_seats, room_seats[1:]):
+            group = groups[left.registration_id]
+            if group is not None and group == groups[right.registration_id]:
+                pairs += 1
+    return pairs
+
+
+def allocate_exam(db: Session, exam: Exam, rooms: Optional[Sequence[Tuple[str, int]]] = None) -> dict:
+    """Seat every registered student of ``exam``; by default in its own room.
+
+    Earlier seats of the exam are replaced. Raises ``SeatingError``.
+    """
+    rooms = list(rooms) if rooms else [(exam.room, exam.capacity)]
+    students = [
+        (row.id, row.study_group)
+        for row in db.query(ExamRegistration.id, User.study_group).join(
+            User, User.id == ExamRegistration.student_id
+        ).filter(ExamRegistration.exam_id == exam.id).order_by(ExamRegistration.id)
+    ]
+    seats = allocate(students, rooms)
+
+    # Clear first: the new seats may swap places with old ones (unique room + seat)
+    db.execute(
+        update(ExamRegistration).where(ExamRegistration.exam_id == exam.id)
+        .values(room=None, seat_number=None)
+        .execution_options(synchronize_session=False)
+    )
+    if seats:
+        db.execute(update(ExamRegistration), [
+            {"id": seat.registration_id, "room": seat.room, "seat_number": seat.seat_number} for seat in seats
+        ])
+
+    seated = defaultdict(int)
+    for seat in seats:
+        seated[seat.room] += 1
+    return {
+        "seated": len(seats),
+        "rooms": [{"room": room, "capacity": size, "seated": seated[room]} for room, size in rooms],
+        "adjacent_same_group": adjacent_same_group(seats, dict(students)),
+    }
@@ -0,0 +1,126 @@
+"""Exam registration and upcoming-exam queries.
+
+``exams.registered_count`` counts the registrations of an exam. Like
+enrollment seats (see ``services.enrollments``), a seat is taken with one
+conditional ``UPDATE ... WHERE registered_count < capacity``, so the check
+and the increment are a single atomic statement and concurrent
+registrations can never overfill an exam. The registration is inserted in
+the same transaction; if the insert fails (already registered) the
+rollback returns the seat too.
+
+Upcoming exams are read through the (subject_id, starts_at) index: a range
+scan from "now" for each of the user's subjects.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Query, Session
+
+from models.user import User, UserRole
+from models.subject import Subject
+from models.enrollment import Enrollment
+from models.exam import Exam, ExamRegistration
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+
+class ExamFull(Exception):
+    """No free seat left"""
+
+
+class RegistrationClosed(Exception):
+    """The exam has started or its registration deadline has passed"""
+
+
+class NotEnrolled(Exception):
+    """The student is not enrolled in the exam's subject"""
+
+
+def registration_open(exam: Exam, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.now()
+    return now < (exam.registration_deadline or exam.starts_at) and now < exam.starts_at
+
+
+def reserve_seat(db: Session, exam_id: int) -> bool:
+    """Take one seat; False if the exam does not exist or is full"""
+    result = db.execute(
+        update(Exam).where(
+            Exam.id == exam_id,
+            Exam.registered_count < Exam.capacity
+        ).values(registered_count=Exam.registered_count + 1)
+        .execution_options(synchronize_session=False, seat_counter=True)
+    )
+    return result.rowcount == 1
+
+
+def release_seat(db: Session, exam_id: int):
+    db.execute(
+        update(Exam).where(
+            Exam.id == exam_id,
+            Exam.registered_count > 0
+        ).values(registered_count=Exam.registered_count - 1)
+        .execution_options(synchronize_session=False, seat_counter=True)
+    )
+
+
+def register(db: Session, exam: Exam, student_id: int) -> ExamRegistration:
+    """Register the student for a seat; does not commit.
+
+    Raises ``RegistrationClosed``, ``NotEnrolled`` or ``ExamFull``. A
+    duplicate registration raises ``IntegrityError`` on flush.
+    """
+    if not registration_open(exam):
+        raise RegistrationClosed()
+    enrolled = db.query(Enrollment.id).filter(
+        Enrollment.student_id == student_id,
+        Enrollment.subject_id == exam.subject_id,
+        Enrollment.semester == exam.semester,
+        Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+    ).first()
+    if not enrolled:
+        raise NotEnrolled()
+    if not reserve_seat(db, exam.id):
+        raise ExamFull()
+    registration = ExamRegistration(exam_id=exam.id, student_id=student_id)
+    db.add(registration)
+    db.flush()
+    return registration
+
+
+def unregister(db: Session, registration: ExamRegistration):
+    """Cancel a registration and give its seat back; does not commit"""
+    exam_id = registration.exam_id
+    db.delete(registration)
+    release_seat(db, exam_id)
+
+
+# ============== QUERIES ==============
+
+def subject_ids_of(db: Session, user: User) -> List[int]:
+    """Subjects whose exams the user sees: enrolled (students) or taught"""
+    if user.role == UserRole.STUDENT:
+        return [row.subject_id for row in db.query(Enrollment.subject_id).filter(
+            Enrollment.student_id == user.id,
+            Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+        )]
+    return [row.id for row in db.query(Subject.id).filter(Subject.teacher_id == user.id)]
+
+
+def upcoming(db: Session, subject_ids: Iterable[int], start: Optional[datetime] = None) -> Query:
+    """Query of (Exam, subject code, subject name) for exams of ``subject_ids``
+    starting at or after ``start`` (default now), soonest first"""
+    return db.query(Exam, Subject.code, Subject.name).join(Subject, Subject.id == Exam.subject_id).filter(
+        Exam.subject_id.in_(list(subject_ids)),
+        Exam.starts_at >= (start or datetime.now())
+    ).order_by(Exam.starts_at, Exam.id)
+
+
+def seats_of(db: Session, student_id: int, exam_ids: Iterable[int]) -> Dict[int, Tuple[Optional[str], Optional[int]]]:
+    """exam id -> (room, seat number) for the exams the student registered
+    for; both None until seats are allocated"""
+    return {row.exam_id: (row.room, row.seat_number) for row in db.query(
+        ExamRegistration.exam_id, ExamRegistration.room, ExamRegistration.seat_number
+    ).filter(
+        ExamRegistration.student_id == student_id,
+        ExamRegistration.exam_id.in_(list(exam_ids))
+    )}
@@ -0,0 +1,210 @@
+"""Finance reports aggregated in SQL.
+
+Totals are computed with GROUP BY and window functions in the database, so
+the cost does not depend on shipping payment rows to Python. Results are
+cached in process for ``CACHE_TTL`` seconds, and dropped when a commit
+writes to ``payments`` (see ``services.cache_hooks``).
+"""
+import csv
+import io
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.user import User
+from models.payment import Payment, PaymentStatus
+from services import cache_hooks
+from services import payments as payment_listing
+
+CACHE_TTL = 300
+EXPORT_CHUNK_SIZE = 2000
+
+OUTSTANDING_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+
+_lock = threading.Lock()
+_version = 0
+_cache: Dict[tuple, Tuple[int, float, object]] = {}
+
+
+# ============== CACHE INVALIDATION ==============
+
+def invalidate():
+    global _version
+    with _lock:
+        _version += 1
+        _cache.clear()
+
+
+cache_hooks.track("payments_changed", [Payment], invalidate)
+
+
+def cached(key: tuple, compute: Callable[[], object]):
+    """Return the cached value for ``key`` or compute and store it"""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        version = _version
+        if entry and entry[0] == version and now - entry[1] < CACHE_TTL:
+            return entry[2]
+    value = compute()
+    with _lock:
+        # Don't store a result computed while a write committed
+        if _version == version:
+            _cache[key] = (version, now, value)
+    return value
+
+
+# ============== AGGREGATES ==============
+
+def _month(db: Session, column):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def _in_range(query, column, date_from: Optional[datetime], date_to: Optional[datetime]):
+    if date_from is not None:
+        query = query.filter(column >= date_from)
+    if date_to is not None:
+        query = query.filter(column < date_to)
+    return query
+
+
+def _grouped(db: Session, key, date_from, date_to, date_column=Payment.created_at, statuses=None) -> list:
+    query = db.query(
+        key.label("key"),
+        func.count(Payment.id).label("count"),
+        func.coalesce(func.sum(Payment.amount), 0).label("amount")
+    )
+    if statuses:
+        query = query.filter(Payment.status.in_(statuses))
+    rows = _in_range(query, date_column, date_from, date_to).group_by(key).order_by(key).all()
+    return [
+        {"key": getattr(row.key, "value", row.key), "count": row.count, "amount": round(row.amount, 2)}
+        for row in rows
+    ]
+
+
+def _monthly(db: Session, date_column, date_from, date_to, statuses=None) -> list:
+    """Per-month totals with a running total computed by a window function"""
+    month = _month(db, date_column).label("month")
+    amount = func.coalesce(func.sum(Payment.amount), 0)
+    query = db.query(
+        month,
+        func.count(Payment.id).label("count"),
+        amount.label("amount"),
+        func.sum(amount).over(order_by=month).label("cumulative_amount")
+    ).filter(date_column.isnot(None))
+    if statuses:
+        query = query.filter(Payment.status.in_(statuses))
+    rows = _in_range(query, date_column, date_from, date_to).group_by(month).order_by(month).all()
+    return [
+        {"month": row.month, "count": row.count, "amount": round(row.amount, 2),
+         "cumulative_amount": round(row.cumulative_amount, 2)}
+        for row in rows
+    ]
+
+
+def _summary(db: Session, date_from: Optional[datetime], date_to: Optional[datetime]) -> dict:
+    totals = _in_range(db.query(
+        func.count(Payment.id),
+        func.coalesce(func.sum(Payment.amount), 0),
+        func.coalesce(func.sum(Payment.amount).filter(Payment.status == PaymentStatus.PAID), 0),
+        func.coalesce(func.sum(Payment.amount).filter(Payment.status.in_(OUTSTANDING_STATUSES)), 0),
+    ), Payment.created_at, date_from, date_to).one()
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "generated_at": datetime.now(),
+        "totals": {
+            "count": totals[0],
+            "billed": round(totals[1], 2),
+            "collected": round(totals[2], 2),
+            "outstanding": round(totals[3], 2),
+        },
+        "by_type": _grouped(db, Payment.payment_type, date_from, date_to),
+        "by_status": _grouped(db, Payment.status, date_from, date_to),
+        # Collections are attributed to the day they were paid
+        "by_method": _grouped(db, Payment.payment_method, date_from, date_to, Payment.paid_date, [PaymentStatus.PAID]),
+        "billed_by_month": _monthly(db, Payment.created_at, date_from, date_to),
+        "collected_by_month": _monthly(db, Payment.paid_date, date_from, date_to, [PaymentStatus.PAID]),
+    }
+
+
+def summary(db: Session, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> dict:
+    return cached(("summary", date_from, date_to), lambda: _summary(db, date_from, date_to))
+
+
+def _outstanding(db: Session, limit: int, min_balance: float) -> list:
+    balance = func.sum(Payment.amount)
+    rows = db.query(
+        Payment.user_id,
+        User.full_name,
+        User.email,
+        func.count(Payment.id).label("open_payments"),
+        balance.label("balance"),
+        func.sum(Payment.amount).filter(Payment.status == PaymentStatus.OVERDUE).label("overdue_balance"),
+        func.min(Payment.due_date).label("oldest_due_date"),
+        func.rank().over(order_by=balance.desc()).label("rank"),
+        (balance / func.sum(balance).over()).label("share")
+    ).join(User, User.id == Payment.user_id).filter(
+        Payment.status.in_(OUTSTANDING_STATUSES)
+    ).group_by(Payment.user_id, User.full_name, User.email).having(
+        balance >= min_balance
+    ).order_by(balance.desc(), Payment.user_id).limit(limit).all()
+
+    return [
+        {
+            "user_id": row.user_id,
+            "user_name": row.full_name,
+            "user_email": row.email,
+            "open_payments": row.open_payments,
+            "balance": round(row.balance, 2),
+            "overdue_balance": round(row.overdue_balance or 0, 2),
+            "oldest_due_date": row.oldest_due_date,
+            "rank": row.rank,
+            "share": round(row.share, 4),
+        }
+        for row in rows
+    ]
+
+
+def outstanding_balances(db: Session, limit: int = 100, min_balance: float = 0.01) -> list:
+    return cached(("outstanding", limit, min_balance), lambda: _outstanding(db, limit, min_balance))
+
+
+# ============== CSV EXPORT ==============
+
+EXPORT_COLUMNS = [
+    "id", "invoice_number", "user_id", "user_name", "user_email", "payment_type", "description",
+    "amount", "status", "due_date", "paid_date", "payment_method", "created_at"
+]
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    return getattr(value, "value", value)
+
+
+def export_csv(db: Session, filters: dict) -> Iterator[str]:
+    """Stream matching payments as CSV, reading them in keyset-paginated chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    filters = dict(filters)
+    while True:
+        rows = payment_listing.list_payments(db, limit=EXPORT_CHUNK_SIZE, **filters)
+        for row in rows:
+            writer.writerow([_csv_value(row[column]) for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        filters["cursor"] = payment_listing.next_cursor(rows, EXPORT_CHUNK_SIZE)
+        if filters["cursor"] is None:
+            return
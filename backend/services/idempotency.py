@@ -0,0 +1,269 @@
+"""Idempotency-Key support for retried state-changing requests.
+
+For the routes in ``IDEMPOTENT_ROUTES``, a request carrying an
+``Idempotency-Key`` header first claims the key in ``idempotency_keys``
+(scoped to the authenticated user). Only the request that wins the claim
+runs the handler. Its response is stored compressed, together with a hash
+of the request, and retries get that stored response back without running
+the handler again. Other cases:
+
+* A retry that arrives while the first request is still running gets 409.
+* Reusing a key for a different request (another path or body) gets 422.
+* Server errors and auth/conflict/rate-limit responses are not stored, so
+  the key is released and the client can simply retry.
+
+Keys expire after ``KEY_TTL``. Abandoned claims (e.g. the worker died)
+expire after ``IN_PROGRESS_TIMEOUT``. A scheduled job deletes expired rows.
+"""
+import hashlib
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import JWTError, jwt
+from sqlalchemy import delete
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+
+from auth import SECRET_KEY, ALGORITHM
+from database import SessionLocal, dialect_insert
+from models.idempotency_key import IdempotencyKey
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+KEY_TTL = timedelta(hours=24)
+IN_PROGRESS_TIMEOUT = timedelta(minutes=5)
+CLEANUP_INTERVAL = 60 * 60
+
+JOB_NAME = "idempotency_keys_cleanup"
+
+IDEMPOTENT_ROUTES = [
+    ("PUT", re.compile(r"^/api/payments/\d+/pay/?$")),
+    ("POST", re.compile(r"^/api/assignments/submissions/?$")),
+    ("POST", re.compile(r"^/api/enrollments(/batch)?/?$")),
+    ("POST", re.compile(r"^/api/documents/upload/?$")),
+]
+
+# Outcomes a retry could legitimately change are not replayed
+UNSTORED_STATUSES = {401, 403, 408, 409, 429}
+
+
+def should_store(status_code: int) -> bool:
+    return status_code < 500 and status_code not in UNSTORED_STATUSES
+
+
+def _subject(authorization: Optional[str]) -> Optional[str]:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+# ============== STORE ==============
+
+def claim(key_hash: str, session_factory=SessionLocal) -> Optional[IdempotencyKey]:
+    """Claim the key; returns None if claimed, else the existing (live) row"""
+    now = datetime.now()
+    db = session_factory()
+    try:
+        db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.key_hash == key_hash,
+            IdempotencyKey.expires_at < now
+        ))
+        insert = dialect_insert(db)
+        result = db.execute(
+            insert(IdempotencyKey).values(key_hash=key_hash, expires_at=now + IN_PROGRESS_TIMEOUT)
+            .on_conflict_do_nothing(index_elements=[IdempotencyKey.key_hash])
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return None
+        existing = db.query(IdempotencyKey).filter(IdempotencyKey.key_hash == key_hash).first()
+        if existing is not None:
+            db.expunge(existing)
+        return existing
+    finally:
+        db.close()
+
+
+def complete(key_hash: str, request_hash: str, status_code: int, content_type: Optional[str],
+             location: Optional[str], body: bytes, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key_hash == key_hash).update({
+            IdempotencyKey.request_hash: request_hash,
+            IdempotencyKey.status_code: status_code,
+            IdempotencyKey.content_type: content_type,
+            IdempotencyKey.location: location,
+            IdempotencyKey.body: zlib.compress(body),
+            IdempotencyKey.expires_at: datetime.now() + KEY_TTL,
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def release(key_hash: str, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.key_hash == key_hash,
+            IdempotencyKey.status_code.is_(None)
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def cleanup_expired(session_factory=SessionLocal) -> dict:
+    db = session_factory()
+    try:
+        result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now()))
+        db.commit()
+        return {"expired_keys": result.rowcount}
+    finally:
+        db.close()
+
+
+def register(scheduler):
+    return scheduler.add_job(JOB_NAME, cleanup_expired, CLEANUP_INTERVAL)
+
+
+# ============== MIDDLEWARE ==============
+
+class _RequestDigest:
+    """sha256 of method, path and body. Multipart boundaries are masked,
+    because clients pick a new random boundary for every attempt."""
+
+    def __init__(self, scope, content_type: Optional[str]):
+        query = scope.get("query_string", b"").decode()
+        self._digest = hashlib.sha256(f"{scope['method']} {scope['path']}?{query}\n".encode())
+        self._boundary = None
+        self._tail = b""
+        if content_type and content_type.startswith("multipart/"):
+            found = re.search(r"boundary=\"?([^\";]+)\"?", content_type)
+            if found:
+                self._boundary = found.group(1).encode()
+
+    def update(self, data: bytes):
+        if not self._boundary:
+            self._digest.update(data)
+            return
+        data = (self._tail + data).replace(self._boundary, b"BOUNDARY")
+        # Hold back bytes that may be the start of a boundary split across chunks
+        keep = len(self._boundary) - 1
+        self._digest.update(data[:-keep] if keep else data)
+        self._tail = data[-keep:] if keep else b""
+
+    def hexdigest(self) -> str:
+        self._digest.update(self._tail)
+        self._tail = b""
+        return self._digest.hexdigest()
+
+
+async def _drain(receive, digest):
+    """Read the rest of the request body into ``digest``"""
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return
+        digest.update(message.get("body", b""))
+        if not message.get("more_body", False):
+            return
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying Idempotency-Key semantics to ``routes``"""
+
+    def __init__(self, app, routes=None, session_factory=SessionLocal):
+        self.app = app
+        self.routes = IDEMPOTENT_ROUTES if routes is None else routes
+        self.session_factory = session_factory
+
+    def _applies(self, scope) -> bool:
+        method = scope["method"]
+        path = scope["path"]
+        return any(method == m and pattern.match(path) for m, pattern in self.routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._applies(scope):
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        key = headers.get(HEADER)
+        subject = _subject(headers.get("authorization")) if key else None
+        if not key or subject is None:
+            # Unauthenticated requests fall through and fail in the handler
+            return await self.app(scope, receive, send)
+        if len(key) > MAX_KEY_LENGTH:
+            return await JSONResponse(
+                {"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}, status_code=400
+            )(scope, receive, send)
+
+        key_hash = hashlib.sha256(f"{subject}\0{key}".encode()).hexdigest()
+        request_digest = _RequestDigest(scope, headers.get("content-type"))
+
+        existing = await run_in_threadpool(claim, key_hash, self.session_factory)
+        if existing is not None:
+            if existing.status_code is None:
+                return await JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still being processed"},
+                    status_code=409,
+                    headers={"Retry-After": "1"}
+                )(scope, receive, send)
+            await _drain(receive, request_digest)
+            if existing.request_hash != request_digest.hexdigest():
+                return await JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"}, status_code=422
+                )(scope, receive, send)
+            replay_headers = {"Idempotent-Replayed": "true"}
+            if existing.location:
+                replay_headers["Location"] = existing.location
+            return await Response(
+                zlib.decompress(existing.body),
+                status_code=existing.status_code,
+                media_type=existing.content_type,
+                headers=replay_headers
+            )(scope, receive, send)
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def hashing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_digest.update(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+        except Exception:
+            await run_in_threadpool(release, key_hash, self.session_factory)
+            raise
+
+        if should_store(response["status"]):
+            response_headers = Headers(raw=response["headers"])
+            await run_in_threadpool(
+                complete,
+                key_hash,
+                request_digest.hexdigest(),
+                response["status"],
+                response_headers.get("content-type"),
+                response_headers.get("location"),
+                b"".join(response["body"]),
+                self.session_factory
+            )
+        else:
+            await run_in_threadpool(release, key_hash, self.session_factory)
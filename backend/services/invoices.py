@@ -0,0 +1,67 @@
+"""Invoice number allocation.
+
+Numbers come from a per-year row in ``invoice_sequences`` that is bumped
+with a single ``UPDATE ... RETURNING``. The update takes the row's write
+lock (the database lock on SQLite), so concurrent callers are serialized
+and can never receive the same number, and a rolled-back transaction
+hands its numbers back. Allocation is O(1) regardless of how many payments
+exist, and a whole range can be taken at once for batch billing runs.
+
+Callers allocate inside the transaction that inserts the payments and
+commit promptly, since the sequence row stays locked until then.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Integer, cast, func, update
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from models.payment import Payment, InvoiceSequence
+
+FIRST_INVOICE_NUMBER = 1000
+
+
+def format_invoice_number(year: int, value: int) -> str:
+    return f"INV-{year}-{value:04d}"
+
+
+def _create_sequence(db: Session, year: int):
+    """Create the year's row, continuing after any numbers already issued"""
+    prefix = format_invoice_number(year, 0)[:-4]
+    issued = db.query(
+        func.max(cast(func.substr(Payment.invoice_number, len(prefix) + 1), Integer))
+    ).filter(Payment.invoice_number.like(f"{prefix}%")).scalar()
+    start = max(FIRST_INVOICE_NUMBER, (issued or 0) + 1)
+
+    insert = dialect_insert(db)
+    db.execute(
+        insert(InvoiceSequence).values(year=year, next_value=start).on_conflict_do_nothing(
+            index_elements=[InvoiceSequence.year]
+        )
+    )
+
+
+def allocate_invoice_range(db: Session, count: int, year: Optional[int] = None) -> range:
+    """Reserve ``count`` consecutive numbers for ``year`` and return them"""
+    if count < 1:
+        raise ValueError("count must be positive")
+    year = year or datetime.now().year
+    stmt = update(InvoiceSequence).where(InvoiceSequence.year == year).values(
+        next_value=InvoiceSequence.next_value + count
+    ).returning(InvoiceSequence.next_value).execution_options(synchronize_session=False)
+
+    end = db.execute(stmt).scalar()
+    if end is None:
+        _create_sequence(db, year)
+        end = db.execute(stmt).scalar()
+    return range(end - count, end)
+
+
+def allocate_invoice_numbers(db: Session, count: int, year: Optional[int] = None) -> List[str]:
+    year = year or datetime.now().year
+    return [format_invoice_number(year, value) for value in allocate_invoice_range(db, count, year)]
+
+
+def next_invoice_number(db: Session, year: Optional[int] = None) -> str:
+    return allocate_invoice_numbers(db, 1, year)[0]
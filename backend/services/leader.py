@@ -0,0 +1,90 @@
+"""Database-backed leader election for scheduled jobs.
+
+Every worker process (e.g. ``uvicorn --workers 4``) starts its own
+scheduler. A job registered with a ``LeaderLease`` only runs in the
+process that holds the job's row in ``job_leases``. The lease is taken
+or renewed with one conditional UPDATE, which succeeds only if this
+process already holds it or it has expired. A dead leader is replaced
+once its lease runs out.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, update
+
+from database import SessionLocal, dialect_insert
+from models.job_lease import JobLease
+
+# Identifies this process; the random suffix guards against pid reuse
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    def __init__(self, name: str, ttl: float, session_factory=SessionLocal, holder: str = PROCESS_ID):
+        self.name = name
+        self.ttl = ttl
+        self.session_factory = session_factory
+        self.holder = holder
+        self.is_leader = False
+        self.expires_at: Optional[datetime] = None
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; True if this process is the leader"""
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        db = self.session_factory()
+        try:
+            insert = dialect_insert(db)
+            db.execute(
+                insert(JobLease).values(name=self.name, holder=self.holder, expires_at=expires_at)
+                .on_conflict_do_nothing(index_elements=[JobLease.name])
+            )
+            result = db.execute(
+                update(JobLease).where(
+                    JobLease.name == self.name,
+                    or_(JobLease.holder == self.holder, JobLease.expires_at < now)
+                ).values(holder=self.holder, expires_at=expires_at)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            self.is_leader = result.rowcount == 1
+        finally:
+            db.close()
+        self.expires_at = expires_at if self.is_leader else None
+        return self.is_leader
+
+    def release(self):
+        """Give the lease up early so another process can take over at once"""
+        if not self.is_leader:
+            return
+        db = self.session_factory()
+        try:
+            db.query(JobLease).filter(
+                JobLease.name == self.name, JobLease.holder == self.holder
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self.is_leader = False
+        self.expires_at = None
+
+    def current_holder(self) -> Optional[dict]:
+        db = self.session_factory()
+        try:
+            lease = db.query(JobLease).filter(JobLease.name == self.name).first()
+            if lease is None:
+                return None
+            return {"holder": lease.holder, "expires_at": lease.expires_at}
+        finally:
+            db.close()
+
+    def to_dict(self) -> dict:
+        return {
+            "process": self.holder,
+            "is_leader": self.is_leader,
+            "expires_at": self.expires_at,
+            "ttl_seconds": self.ttl,
+        }
@@ -0,0 +1,168 @@
+"""Dated class sessions materialized from the weekly timetable.
+
+``class_occurrences`` holds one row per session of every weekly
+``Schedule`` row over its semester's teaching period. Holidays are left
+out, and cancelled sessions are kept with ``cancelled`` set so clients
+can show them. The teaching period comes from ``SemesterCalendar``, or
+the usual TUKE dates when a semester has none. Range queries such as
+"my classes next week" are then an index range scan on
+(subject_id, starts_at) instead of every client expanding the weekly
+pattern itself.
+
+The rows are rebuilt in the caller's transaction whenever their inputs
+change: ``rebuild`` for single schedules (create, update, delete,
+cancellations) and ``rebuild_semester`` after calendar edits or
+timetable generation. Nothing here commits.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.orm import Session
+
+from models.user import User, UserRole
+from models.subject import Subject
+from models.schedule import (
+    Schedule, DayOfWeek, SemesterCalendar, SemesterHoliday, ClassCancellation, ClassOccurrence, parse_time_range
+)
+from models.enrollment import Enrollment
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+TEACHING_WEEKS = 13
+
+_DAY_INDEX = {day: index for index, day in enumerate(DayOfWeek)}
+_SEMESTER = re.compile(r"^\s*(Winter|Summer)\s+(\d{4})", re.IGNORECASE)
+
+
+def default_period(semester: str) -> Optional[Tuple[date, date]]:
+    """First and last day of teaching in e.g. ``"Winter 2025/26"``.
+
+    Winter teaching starts on the last Monday of September, summer
+    teaching on the second Monday of February of the following year; both
+    last ``TEACHING_WEEKS`` weeks.
+    """
+    found = _SEMESTER.match(semester or "")
+    if not found:
+        return None
+    season, year = found.group(1).capitalize(), int(found.group(2))
+    if season == "Winter":
+        start = date(year, 9, 30) - timedelta(days=date(year, 9, 30).weekday())
+    else:
+        first = date(year + 1, 2, 1)
+        start = first + timedelta(days=(7 - first.weekday()) % 7 + 7)
+    return start, start + timedelta(weeks=TEACHING_WEEKS) - timedelta(days=1)
+
+
+def teaching_period(db: Session, semester: str) -> Optional[Tuple[date, date, Set[date]]]:
+    """(first day, last day, holidays) of ``semester``, None if unknown"""
+    calendar = db.query(SemesterCalendar).filter(SemesterCalendar.semester == semester).first()
+    if calendar is not None:
+        holidays = {row.date for row in db.query(SemesterHoliday.date).filter(SemesterHoliday.calendar_id == calendar.id)}
+        return calendar.starts_on, calendar.ends_on, holidays
+    period = default_period(semester)
+    return None if period is None else (period[0], period[1], set())
+
+
+# ============== MATERIALIZATION ==============
+
+def _expand(db: Session, schedules: List[Schedule]) -> List[dict]:
+    periods = {semester: teaching_period(db, semester) for semester in {s.semester for s in schedules}}
+    cancelled: Dict[Tuple[int, date], Optional[str]] = {}
+    if schedules:
+        cancelled = {
+            (row.schedule_id, row.date): row.reason
+            for row in db.query(ClassCancellation.schedule_id, ClassCancellation.date, ClassCancellation.reason).filter(
+                ClassCancellation.schedule_id.in_([s.id for s in schedules])
+            )
+        }
+
+    rows = []
+    for schedule in schedules:
+        period = periods[schedule.semester]
+        if period is None:
+            continue
+        start, end = schedule.start_minute, schedule.end_minute
+        if start is None or end is None:
+            # Rows written before the columns existed
+            try:
+                start, end = parse_time_range(schedule.time)
+            except ValueError:
+                continue
+        first, last, holidays = period
+        day = first + timedelta(days=(_DAY_INDEX[schedule.day] - first.weekday()) % 7)
+        while day <= last:
+            if day not in holidays:
+                midnight = datetime(day.year, day.month, day.day)
+                key = (schedule.id, day)
+                rows.append({
+                    "schedule_id": schedule.id,
+                    "subject_id": schedule.subject_id,
+                    "semester": schedule.semester,
+                    "starts_at": midnight + timedelta(minutes=start),
+                    "ends_at": midnight + timedelta(minutes=end),
+                    "room": schedule.room,
+                    "class_type": schedule.class_type,
+                    "cancelled": key in cancelled,
+                    "note": cancelled.get(key),
+                })
+            day += timedelta(weeks=1)
+    return rows
+
+
+def _write(db: Session, rows: List[dict]) -> int:
+    if rows:
+        db.execute(insert(ClassOccurrence), rows)
+    return len(rows)
+
+
+def rebuild(db: Session, schedule_ids: Iterable[int]) -> int:
+    """Re-materialize the sessions of these schedules (deleted ones just lose theirs)"""
+    schedule_ids = list(set(schedule_ids))
+    if not schedule_ids:
+        return 0
+    db.flush()
+    db.execute(delete(ClassOccurrence).where(ClassOccurrence.schedule_id.in_(schedule_ids)))
+    schedules = db.query(Schedule).filter(Schedule.id.in_(schedule_ids)).all()
+    return _write(db, _expand(db, schedules))
+
+
+def rebuild_semester(db: Session, semester: str) -> int:
+    db.flush()
+    db.execute(delete(ClassOccurrence).where(ClassOccurrence.semester == semester))
+    schedules = db.query(Schedule).filter(Schedule.semester == semester).all()
+    return _write(db, _expand(db, schedules))
+
+
+def rebuild_all(db: Session) -> int:
+    semesters = [row.semester for row in db.query(Schedule.semester).distinct()]
+    db.execute(delete(ClassOccurrence))
+    return sum(rebuild_semester(db, semester) for semester in semesters)
+
+
+# ============== QUERIES ==============
+
+def for_user(db: Session, user: User, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Query of the sessions the user attends or teaches (all sessions for
+    admins), starting in ``[start, end)``, ordered by start"""
+    query = db.query(ClassOccurrence)
+    if user.role == UserRole.STUDENT:
+        enrolled = [
+            (row.subject_id, row.semester)
+            for row in db.query(Enrollment.subject_id, Enrollment.semester).filter(
+                Enrollment.student_id == user.id,
+                Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+            )
+        ]
+        query = query.filter(
+            ClassOccurrence.subject_id.in_({subject_id for subject_id, _ in enrolled}),
+            tuple_(ClassOccurrence.subject_id, ClassOccurrence.semester).in_(enrolled)
+        )
+    elif user.role == UserRole.TEACHER:
+        taught = [row.id for row in db.query(Subject.id).filter(Subject.teacher_id == user.id)]
+        query = query.filter(ClassOccurrence.subject_id.in_(taught))
+    if start is not None:
+        query = query.filter(ClassOccurrence.starts_at >= start)
+    if end is not None:
+        query = query.filter(ClassOccurrence.starts_at < end)
+    return query.order_by(ClassOccurrence.starts_at, ClassOccurrence.id)
@@ -0,0 +1,107 @@
+"""Mark pending payments past their due date as overdue.
+
+One set-based ``UPDATE ... RETURNING`` flips every matching payment,
+served by the ``(status, due_date)`` index. The returned rows are grouped
+per user and turned into PAYMENT notifications, which are bulk-inserted in
+batches. The notifications are written in the same transaction as the
+status change, so a payment is never marked without its owner being told.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, update
+
+from database import SessionLocal
+from models.payment import Payment, PaymentStatus
+from models.notification import Notification, NotificationType
+from services.leader import LeaderLease
+
+SWEEP_INTERVAL = 15 * 60
+INITIAL_DELAY = 60
+# Longer than the interval so the leader keeps the lease between runs
+LEASE_TTL = SWEEP_INTERVAL * 2
+NOTIFY_BATCH_SIZE = 1000
+INVOICES_PER_MESSAGE = 5
+
+JOB_NAME = "overdue_payments_sweeper"
+
+_metrics_lock = threading.Lock()
+metrics = {
+    "sweeps": 0,
+    "payments_marked_total": 0,
+    "notifications_total": 0,
+    "last_sweep": None,
+}
+
+
+def _notification(user_id: int, payments: list) -> dict:
+    if len(payments) == 1:
+        invoice_number, description, amount = payments[0]
+        title = "Payment Overdue"
+        message = f"{description} ({invoice_number}, €{amount:.2f}) is past its due date. Please pay it as soon as possible."
+    else:
+        invoices = ", ".join(p[0] or "-" for p in payments[:INVOICES_PER_MESSAGE])
+        if len(payments) > INVOICES_PER_MESSAGE:
+            invoices += f" and {len(payments) - INVOICES_PER_MESSAGE} more"
+        total = sum(p[2] for p in payments)
+        title = "Payments Overdue"
+        message = f"{len(payments)} payments totalling €{total:.2f} are past their due date: {invoices}."
+    return {"user_id": user_id, "type": NotificationType.PAYMENT, "title": title, "message": message, "read": False}
+
+
+def sweep_overdue(
+    now: Optional[datetime] = None,
+    session_factory=SessionLocal,
+    batch_size: int = NOTIFY_BATCH_SIZE
+) -> dict:
+    """Run one sweep and return its report"""
+    started = time.perf_counter()
+    now = now or datetime.now()
+    db = session_factory()
+    try:
+        marked = db.execute(
+            update(Payment).where(
+                Payment.status == PaymentStatus.PENDING,
+                Payment.due_date < now
+            ).values(status=PaymentStatus.OVERDUE)
+            .returning(Payment.user_id, Payment.invoice_number, Payment.description, Payment.amount)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        by_user = defaultdict(list)
+        for user_id, invoice_number, description, amount in marked:
+            by_user[user_id].append((invoice_number, description, amount))
+
+        notifications = [_notification(user_id, payments) for user_id, payments in by_user.items()]
+        for start in range(0, len(notifications), batch_size):
+            db.execute(insert(Notification), notifications[start:start + batch_size])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    report = {
+        "swept_at": now,
+        "payments_marked": len(marked),
+        "users_notified": len(by_user),
+        "duration_seconds": round(time.perf_counter() - started, 4),
+    }
+    with _metrics_lock:
+        metrics["sweeps"] += 1
+        metrics["payments_marked_total"] += report["payments_marked"]
+        metrics["notifications_total"] += report["users_notified"]
+        metrics["last_sweep"] = report
+    return report
+
+
+def register(scheduler):
+    return scheduler.add_job(
+        JOB_NAME, sweep_overdue, SWEEP_INTERVAL,
+        initial_delay=INITIAL_DELAY,
+        lease=LeaderLease(JOB_NAME, LEASE_TTL)
+    )
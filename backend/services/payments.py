@@ -0,0 +1,72 @@
+"""Read path for payment listings.
+
+Every listing is a single query joining payments to their owner, so the
+user's name and email come back with the row instead of one lookup per
+payment. Pages are keyset-paginated on ``Payment.id`` (newest first): the
+cursor is the id of the last row of the previous page.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from models.user import User
+from models.payment import Payment, PaymentType, PaymentStatus
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+LISTING_COLUMNS = (
+    Payment.id,
+    Payment.user_id,
+    Payment.payment_type,
+    Payment.description,
+    Payment.amount,
+    Payment.status,
+    Payment.due_date,
+    Payment.paid_date,
+    Payment.payment_method,
+    Payment.invoice_number,
+    Payment.created_at,
+    User.full_name.label("user_name"),
+    User.email.label("user_email"),
+)
+
+
+def list_payments(
+    db: Session,
+    user_id: Optional[int] = None,
+    status: Optional[PaymentStatus] = None,
+    payment_type: Optional[PaymentType] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """Return payments matching the filters as plain dicts, newest first"""
+    query = db.query(*LISTING_COLUMNS).outerjoin(User, User.id == Payment.user_id)
+
+    if user_id is not None:
+        query = query.filter(Payment.user_id == user_id)
+    if status is not None:
+        query = query.filter(Payment.status == status)
+    if payment_type is not None:
+        query = query.filter(Payment.payment_type == payment_type)
+    if due_from is not None:
+        query = query.filter(Payment.due_date >= due_from)
+    if due_to is not None:
+        query = query.filter(Payment.due_date < due_to)
+    if cursor is not None:
+        query = query.filter(Payment.id < cursor)
+
+    query = query.order_by(Payment.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return [dict(row._mapping) for row in query.all()]
+
+
+def next_cursor(rows: List[dict], limit: Optional[int]) -> Optional[int]:
+    """Cursor for the following page, or None when this page is the last"""
+    if limit is None or len(rows) < limit:
+        return None
+    return rows[-1]["id"]
@@ -0,0 +1,369 @@
+"""Server-side PDF rendering for official documents.
+
+Documents are rendered with fpdf2 in a small process pool. At start-up
+each worker subsets the fonts to the Latin repertoire our documents use
+and builds a template document from them; every render deep-copies the
+template and re-opens the small font from memory, which is several times
+cheaper than parsing the full TTF files. Results are cached by a hash of
+the rendered data (the content version), and identical requests that
+arrive while a render is running share the same future instead of
+queueing a second render.
+"""
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from fontTools import subset as font_subset
+from fontTools.ttLib import TTFont
+from fpdf import FPDF
+
+# Worker pool sizing: renders running at once, and renders allowed to wait
+PDF_WORKERS = 2
+PDF_MAX_PENDING = 32
+PDF_RENDER_TIMEOUT = 30
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+FONT_DIR = "/usr/share/fonts/truetype/dejavu"
+FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+
+# Basic Latin, Latin-1, Latin Extended-A and common punctuation
+FONT_CODEPOINTS = (
+    list(range(0x20, 0x7F)) + list(range(0xA0, 0x180))
+    + [0x2013, 0x2014, 0x2018, 0x2019, 0x201C, 0x201D, 0x2022, 0x2026, 0x20AC]
+)
+
+BRAND_RGB = (196, 30, 58)
+UNIVERSITY = "Technical University of Košice"
+UNIVERSITY_ADDRESS = "Technical University of Košice, Letná 9, 042 00 Košice, Slovakia"
+
+
+class PdfQueueFull(Exception):
+    """Raised when the render queue is at capacity"""
+
+
+# ============== WORKER SIDE ==============
+
+_template: Optional[FPDF] = None
+_font_bytes: Dict[str, bytes] = {}
+_font_family = "Helvetica"
+
+
+def _subset_font(path: str) -> bytes:
+    font = TTFont(path)
+    options = font_subset.Options()
+    options.name_IDs = ["*"]
+    options.layout_features = []
+    options.hinting = False
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=FONT_CODEPOINTS)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.save(output)
+    return output.getvalue()
+
+
+def _build_template() -> FPDF:
+    global _font_family
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=20)
+    pdf.set_margins(20, 20, 20)
+    _font_bytes.clear()
+    try:
+        logging.getLogger("fontTools.subset").setLevel(logging.ERROR)
+        for style, filename in FONT_FILES.items():
+            data = _subset_font(os.path.join(FONT_DIR, filename))
+            # add_font only accepts a path
+            with tempfile.NamedTemporaryFile(suffix=".ttf", delete=False) as f:
+                f.write(data)
+            known = set(pdf.fonts)
+            try:
+                pdf.add_font("DejaVu", style, f.name)
+            finally:
+                os.remove(f.name)
+            for key in set(pdf.fonts) - known:
+                _font_bytes[key] = data
+        _font_family = "DejaVu"
+    except (FileNotFoundError, OSError):
+        # Core fonts are always available but only cover Latin-1
+        _font_bytes.clear()
+        pdf = FPDF(format="A4")
+        pdf.set_auto_page_break(auto=True, margin=20)
+        pdf.set_margins(20, 20, 20)
+        _font_family = "Helvetica"
+    return pdf
+
+
+def init_worker():
+    """Process pool initializer: load fonts into the template document"""
+    global _template
+    _template = _build_template()
+
+
+def _text(value) -> str:
+    text = "" if value is None else str(value)
+    if _font_family == "DejaVu":
+        return text
+    # Strip diacritics the core fonts cannot encode (č, ľ, ť, ...)
+    try:
+        text.encode("latin-1")
+        return text
+    except UnicodeEncodeError:
+        normalized = unicodedata.normalize("NFKD", text)
+        return normalized.encode("latin-1", "ignore").decode("latin-1")
+
+
+def _new_document() -> FPDF:
+    if _template is None:
+        init_worker()
+    pdf = copy.deepcopy(_template)
+    # Deep copies share the parsed font, which subsetting on output mutates
+    for key, font in pdf.fonts.items():
+        if key in _font_bytes:
+            font.ttfont = TTFont(io.BytesIO(_font_bytes[key]))
+    pdf.add_page()
+    return pdf
+
+
+def _header(pdf: FPDF, title: str):
+    pdf.set_font(_font_family, "B", 20)
+    pdf.set_text_color(*BRAND_RGB)
+    pdf.cell(0, 10, _text(UNIVERSITY), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font(_font_family, "B", 15)
+    pdf.cell(0, 9, _text(title), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_draw_color(*BRAND_RGB)
+    pdf.set_line_width(0.6)
+    pdf.line(pdf.l_margin, pdf.get_y() + 2, pdf.w - pdf.r_margin, pdf.get_y() + 2)
+    pdf.ln(8)
+
+
+def _info(pdf: FPDF, pairs: List[tuple]):
+    for label, value in pairs:
+        pdf.set_font(_font_family, "B", 10)
+        pdf.cell(40, 6, _text(f"{label}:"))
+        pdf.set_font(_font_family, "", 10)
+        pdf.cell(0, 6, _text(value), new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+
+
+def _section(pdf: FPDF, title: str):
+    pdf.set_font(_font_family, "B", 12)
+    pdf.cell(0, 8, _text(title), new_x="LMARGIN", new_y="NEXT")
+
+
+def _table(pdf: FPDF, headers: List[str], widths: List[float], rows: List[List]):
+    pdf.set_font(_font_family, "B", 9)
+    pdf.set_fill_color(*BRAND_RGB)
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_draw_color(221, 221, 221)
+    pdf.set_line_width(0.2)
+    for header, width in zip(headers, widths):
+        pdf.cell(width, 8, _text(header), border=1, fill=True)
+    pdf.ln()
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font(_font_family, "", 9)
+    for row in rows:
+        for value, width in zip(row, widths):
+            pdf.cell(width, 7, _text(value), border=1)
+        pdf.ln()
+    pdf.ln(4)
+
+
+def _footer(pdf: FPDF, lines: List[str]):
+    pdf.ln(10)
+    pdf.set_font(_font_family, "", 8)
+    pdf.set_text_color(102, 102, 102)
+    for line in lines:
+        pdf.cell(0, 5, _text(line), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(0, 0, 0)
+
+
+def _student_info(data: dict) -> List[tuple]:
+    return [
+        ("Student Name", data["full_name"] or "N/A"),
+        ("Email", data["email"]),
+        ("Student ID", data["user_id"]),
+        ("Date Issued", data["issued_on"]),
+    ]
+
+
+def _render_grade_transcript(pdf: FPDF, data: dict):
+    _header(pdf, "Official Grade Transcript")
+    _info(pdf, _student_info(data))
+    _section(pdf, "Academic Record")
+    _table(
+        pdf,
+        ["Code", "Subject Name", "Credits", "Grade", "Points", "Semester"],
+        [22, 62, 16, 14, 16, 40],
+        [[code, name, credits or 0, grade, f"{numeric:.2f}", semester]
+         for code, name, credits, grade, numeric, semester in data["rows"]]
+    )
+    pdf.set_font(_font_family, "B", 10)
+    pdf.cell(0, 6, _text(f"Total Credits: {data['total_credits']}"), new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 6, _text(f"GPA: {data['gpa']:.2f}"), new_x="LMARGIN", new_y="NEXT")
+    _footer(pdf, [
+        "This document was generated electronically and is valid without signature.",
+        UNIVERSITY_ADDRESS,
+    ])
+
+
+def _render_enrollment_proof(pdf: FPDF, data: dict):
+    _header(pdf, "Proof of Enrollment")
+    _info(pdf, _student_info(data))
+    _section(pdf, "Enrolled Subjects")
+    _table(pdf, ["Code", "Subject Name", "Semester", "Status"], [25, 75, 40, 30], data["rows"])
+    pdf.set_draw_color(*BRAND_RGB)
+    pdf.set_line_width(0.6)
+    pdf.set_font(_font_family, "B", 10)
+    pdf.multi_cell(80, 6, _text(f"OFFICIAL DOCUMENT\nAIS TUKE Academic Information System\n{data['issued_on']}"), border=1)
+    _footer(pdf, [
+        "This document was generated electronically and is valid without signature.",
+        UNIVERSITY_ADDRESS,
+    ])
+
+
+def _render_invoice(pdf: FPDF, data: dict):
+    _header(pdf, "Invoice")
+    _info(pdf, [
+        ("Invoice Number", data["invoice_number"]),
+        ("Date", data["created_on"] or "N/A"),
+        ("Due Date", data["due_on"] or "N/A"),
+    ])
+    _section(pdf, "Bill To")
+    _info(pdf, [("Name", data["full_name"] or "N/A"), ("Email", data["email"] or "N/A")])
+    _section(pdf, "Payment Details")
+    details = [
+        ("Type", data["payment_type"]),
+        ("Description", data["description"]),
+        ("Status", data["status"].upper()),
+    ]
+    if data["paid_on"]:
+        details.append(("Paid Date", data["paid_on"]))
+    if data["payment_method"]:
+        details.append(("Payment Method", data["payment_method"]))
+    _info(pdf, details)
+    pdf.set_font(_font_family, "B", 16)
+    pdf.set_text_color(*BRAND_RGB)
+    pdf.cell(0, 10, _text(f"Amount: €{data['amount']:.2f}"), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(0, 0, 0)
+    _footer(pdf, ["This document was generated electronically.", UNIVERSITY_ADDRESS])
+
+
+RENDERERS = {
+    "grade_transcript": _render_grade_transcript,
+    "enrollment_proof": _render_enrollment_proof,
+    "invoice": _render_invoice,
+}
+
+
+def render_pdf(kind: str, data: dict) -> bytes:
+    """Render one document in the current process"""
+    pdf = _new_document()
+    RENDERERS[kind](pdf, data)
+    return bytes(pdf.output())
+
+
+# ============== POOL AND CACHE ==============
+
+def content_version(kind: str, data: dict) -> str:
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{kind}:{payload}".encode()).hexdigest()
+
+
+class PdfRenderer:
+    """Bounded process pool with a byte-limited LRU cache in front of it"""
+
+    def __init__(
+        self,
+        workers: int = PDF_WORKERS,
+        max_pending: int = PDF_MAX_PENDING,
+        cache_max_bytes: int = PDF_CACHE_MAX_BYTES
+    ):
+        self.workers = workers
+        self.cache_max_bytes = cache_max_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Re-entrant: a future that is already done runs its callback inline
+        self._lock = threading.RLock()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._in_flight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        return self._pool
+
+    def _store(self, key: str, content: bytes):
+        if len(content) > self.cache_max_bytes:
+            return
+        self._cache[key] = content
+        self._cache_bytes += len(content)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def _on_done(self, key: str, future: Future):
+        self._slots.release()
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if not future.cancelled() and future.exception() is None:
+                self._store(key, future.result())
+
+    def render(self, kind: str, data: dict, timeout: float = PDF_RENDER_TIMEOUT) -> bytes:
+        """Return the PDF for ``data``, rendering it in the pool if not cached"""
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown document kind: {kind}")
+        key = content_version(kind, data)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+            self.misses += 1
+            future = self._in_flight.get(key)
+            if future is None:
+                if not self._slots.acquire(blocking=False):
+                    raise PdfQueueFull("PDF rendering queue is full")
+                try:
+                    future = self._get_pool().submit(render_pdf, kind, data)
+                except Exception:
+                    self._slots.release()
+                    raise
+                self._in_flight[key] = future
+                future.add_done_callback(lambda f, key=key: self._on_done(key, f))
+
+        return future.result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": len(self._in_flight),
+                "cached_documents": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+renderer = PdfRenderer()
@@ -0,0 +1,142 @@
+"""Subject prerequisites and their transitive closure.
+
+The closure maps every subject to the set of all subjects that must be
+passed before it: direct prerequisites, their prerequisites, and so on.
+It is built from the whole catalogue in one query and kept in process
+memory, so checking an enrollment is a set difference against the
+student's passed subjects instead of a recursive query. The closure
+lives for ``CACHE_TTL`` seconds and is dropped when a commit adds or
+removes subjects or prerequisites (see ``services.cache_hooks``).
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.subject import Subject, SubjectPrerequisite
+from models.grade import Grade, GradeLetter
+from services import cache_hooks
+
+CACHE_TTL = 300
+
+_lock = threading.Lock()
+_version = 0
+_closure = None
+_built_at = 0.0
+
+
+class PrerequisiteCycle(Exception):
+    """The new prerequisites would make a subject (indirectly) require itself"""
+
+
+# ============== CACHE INVALIDATION ==============
+
+def invalidate():
+    global _version, _closure
+    with _lock:
+        _version += 1
+        _closure = None
+
+
+def _catalogue_flushed(session) -> bool:
+    # Subject updates never change the graph, only new or deleted subjects do
+    return cache_hooks.touched(session, SubjectPrerequisite, ("dirty",)) or cache_hooks.touched(
+        session, (Subject, SubjectPrerequisite), ("new", "deleted")
+    )
+
+
+cache_hooks.track(
+    "catalogue_changed", [Subject, SubjectPrerequisite], invalidate, _catalogue_flushed, statements=("insert", "delete")
+)
+
+
+# ============== CLOSURE ==============
+
+def _build(db: Session) -> Dict[int, FrozenSet[int]]:
+    existing = select(Subject.id)
+    edges = db.query(SubjectPrerequisite.subject_id, SubjectPrerequisite.prerequisite_id).filter(
+        # Rows left behind by a deleted subject are ignored
+        SubjectPrerequisite.subject_id.in_(existing),
+        SubjectPrerequisite.prerequisite_id.in_(existing)
+    ).all()
+    direct = defaultdict(set)
+    for subject_id, prerequisite_id in edges:
+        direct[subject_id].add(prerequisite_id)
+
+    closure: Dict[int, FrozenSet[int]] = {}
+    for root in direct:
+        seen: Set[int] = set()
+        stack = list(direct[root])
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if node in closure:
+                seen |= closure[node]
+            else:
+                stack.extend(direct.get(node, ()))
+        seen.discard(root)
+        closure[root] = frozenset(seen)
+    return closure
+
+
+def closure(db: Session) -> Dict[int, FrozenSet[int]]:
+    """Subject id -> every subject required before it (cached)"""
+    global _closure, _built_at
+    with _lock:
+        if _closure is not None and time.monotonic() - _built_at < CACHE_TTL:
+            return _closure
+        version = _version
+    built = _build(db)
+    with _lock:
+        # Don't store a closure built while the catalogue changed
+        if _version == version:
+            _closure = built
+            _built_at = time.monotonic()
+    return built
+
+
+def required(db: Session, subject_id: int) -> FrozenSet[int]:
+    return closure(db).get(subject_id, frozenset())
+
+
+def passed_subjects(db: Session, student_id: int) -> Set[int]:
+    rows = db.query(Grade.subject_id).filter(
+        Grade.student_id == student_id,
+        Grade.grade != GradeLetter.FX
+    ).distinct()
+    return {row.subject_id for row in rows}
+
+
+def missing(db: Session, student_id: int, subject_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """Subject id -> prerequisites the student has not passed, for the
+    subjects in ``subject_ids`` that have any missing"""
+    graph = closure(db)
+    requirements = {subject_id: graph.get(subject_id, frozenset()) for subject_id in subject_ids}
+    if not any(requirements.values()):
+        return {}
+    passed = passed_subjects(db, student_id)
+    result = {}
+    for subject_id, needed in requirements.items():
+        lacking = needed - passed
+        if lacking:
+            result[subject_id] = lacking
+    return result
+
+
+def set_prerequisites(db: Session, subject_id: int, prerequisite_ids: List[int]):
+    """Replace a subject's direct prerequisites; does not commit.
+
+    Raises ``PrerequisiteCycle`` if a new prerequisite already requires
+    ``subject_id``.
+    """
+    prerequisite_ids = set(prerequisite_ids)
+    graph = closure(db)
+    if subject_id in prerequisite_ids or any(subject_id in graph.get(p, ()) for p in prerequisite_ids):
+        raise PrerequisiteCycle()
+    db.query(SubjectPrerequisite).filter(SubjectPrerequisite.subject_id == subject_id).delete(synchronize_session=False)
+    db.add_all([SubjectPrerequisite(subject_id=subject_id, prerequisite_id=p) for p in prerequisite_ids])
@@ -0,0 +1,142 @@
+"""Background thumbnail and preview generation for uploaded documents.
+
+JPEG/PNG uploads get a small JPEG thumbnail, PDFs get a single-page PDF
+holding just their first page. Both are written next to the original blob
+as ``<filename>.preview.<ext>``. Rendering runs in a process pool so the
+upload request only pays for a ``submit``; the completion callback records
+the result on the ``Document`` row.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from database import SessionLocal
+from models.document import Document, PreviewStatus
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_WORKERS = 1
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 80
+
+IMAGE_TYPES = {"image/jpeg", "image/png"}
+PDF_TYPES = {"application/pdf"}
+
+
+def supports_preview(mime_type: Optional[str]) -> bool:
+    return mime_type in IMAGE_TYPES or mime_type in PDF_TYPES
+
+
+def preview_path_for(file_path: str, mime_type: str) -> str:
+    extension = "jpg" if mime_type in IMAGE_TYPES else "pdf"
+    return f"{file_path}.preview.{extension}"
+
+
+# ============== WORKER SIDE ==============
+
+def _make_thumbnail(source: str, target: str):
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding
+        image.draft("RGB", THUMBNAIL_SIZE)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(target, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+
+
+def _make_pdf_preview(source: str, target: str):
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(source)
+    if not reader.pages:
+        raise ValueError("PDF has no pages")
+    writer = PdfWriter()
+    writer.add_page(reader.pages[0])
+    writer.compress_identical_objects()
+    with open(target, "wb") as f:
+        writer.write(f)
+
+
+def render_preview(file_path: str, mime_type: str) -> Tuple[str, str]:
+    """Worker entry point: write the preview and return (path, mime type)"""
+    target = preview_path_for(file_path, mime_type)
+    # Write to a temp name so a half-written preview is never served
+    partial = f"{target}.part"
+    try:
+        if mime_type in IMAGE_TYPES:
+            _make_thumbnail(file_path, partial)
+            preview_mime = "image/jpeg"
+        else:
+            _make_pdf_preview(file_path, partial)
+            preview_mime = "application/pdf"
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return target, preview_mime
+
+
+# ============== PIPELINE ==============
+
+class PreviewPipeline:
+    """Submits preview renders to a process pool and records the outcome"""
+
+    def __init__(self, workers: int = PREVIEW_WORKERS, session_factory=SessionLocal):
+        self.workers = workers
+        self.session_factory = session_factory
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def submit(self, document_id: int, file_path: str, mime_type: str) -> Optional[Future]:
+        """Queue a preview for a committed document; returns immediately"""
+        if not supports_preview(mime_type):
+            return None
+        future = self._get_pool().submit(render_preview, file_path, mime_type)
+        future.add_done_callback(lambda f: self._record(document_id, f))
+        return future
+
+    def _record(self, document_id: int, future: Future):
+        db = self.session_factory()
+        try:
+            doc = db.query(Document).filter(Document.id == document_id).first()
+            error = future.exception() if not future.cancelled() else None
+            if future.cancelled() or error is not None:
+                if error is not None:
+                    logger.warning("Preview for document %s failed: %s", document_id, error)
+                if doc:
+                    doc.preview_status = PreviewStatus.FAILED
+                    db.commit()
+                return
+
+            preview_path, preview_mime = future.result()
+            if not doc:
+                # Deleted while the preview was rendering
+                if os.path.exists(preview_path):
+                    os.remove(preview_path)
+                return
+            doc.preview_path = preview_path
+            doc.preview_mime_type = preview_mime
+            doc.preview_status = PreviewStatus.READY
+            db.commit()
+        finally:
+            db.close()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+pipeline = PreviewPipeline()
@@ -0,0 +1,224 @@
+"""Reconcile the uploads directory with the documents table.
+
+Two streaming passes, both in constant memory:
+
+* files -> rows: ``os.scandir`` over the uploads directory, looking names up
+  in indexed batches against ``Document.filename``. Files no row refers to
+  (e.g. left behind when a user's documents were removed by the database
+  cascade) are quarantined or deleted.
+* rows -> files: keyset pagination over ``documents``; rows whose blob is
+  gone get ``file_missing`` set (and cleared again if the file reappears).
+
+Files younger than ``ORPHAN_GRACE_SECONDS`` are skipped so uploads that have
+not committed yet are never touched. ``dry_run`` only reports, and
+``max_ops_per_second`` throttles filesystem work to limit I/O pressure.
+"""
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from database import SessionLocal
+from models.document import Document
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
+QUARANTINE_DIR = os.path.join(BASE_DIR, "quarantine")
+
+RECONCILE_INTERVAL = 6 * 60 * 60
+ORPHAN_GRACE_SECONDS = 60 * 60
+QUARANTINE_RETENTION_DAYS = 30
+CHUNK_SIZE = 500
+SAMPLE_LIMIT = 50
+
+JOB_NAME = "uploads_reconciler"
+
+ACTION_QUARANTINE = "quarantine"
+ACTION_DELETE = "delete"
+
+last_report: Optional[dict] = None
+
+
+class _Throttle:
+    """Spaces out operations to at most ``rate`` per second"""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def blob_name(name: str) -> str:
+    """Map a file in the uploads directory to the document filename it belongs to"""
+    if name.endswith(".part"):
+        name = name[:-len(".part")]
+    if ".preview." in name:
+        name = name.split(".preview.", 1)[0]
+    return name
+
+
+def _known_filenames(db, names: List[str]) -> set:
+    blobs = {blob_name(name) for name in names}
+    rows = db.query(Document.filename).filter(Document.filename.in_(blobs)).all()
+    return {row[0] for row in rows}
+
+
+def _dispose(path: str, name: str, action: str):
+    if action == ACTION_DELETE:
+        os.remove(path)
+    else:
+        os.makedirs(QUARANTINE_DIR, exist_ok=True)
+        shutil.move(path, os.path.join(QUARANTINE_DIR, name))
+
+
+def _sweep_orphans(db, report: dict, dry_run: bool, action: str, throttle: _Throttle, grace_seconds: int):
+    if not os.path.isdir(UPLOAD_DIR):
+        return
+    cutoff = time.time() - grace_seconds
+
+    def flush(batch):
+        known = _known_filenames(db, [entry.name for entry, _ in batch])
+        for entry, size in batch:
+            if blob_name(entry.name) in known:
+                continue
+            report["orphans_found"] += 1
+            report["orphan_bytes"] += size
+            if len(report["sample_orphans"]) < SAMPLE_LIMIT:
+                report["sample_orphans"].append(entry.name)
+            if dry_run:
+                continue
+            throttle.wait()
+            try:
+                _dispose(entry.path, entry.name, action)
+                report["orphans_disposed"] += 1
+            except OSError as e:
+                report["errors"] += 1
+                report["last_error"] = str(e)
+
+    batch = []
+    with os.scandir(UPLOAD_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            throttle.wait()
+            stat = entry.stat(follow_symlinks=False)
+            report["files_scanned"] += 1
+            if stat.st_mtime > cutoff:
+                report["files_too_recent"] += 1
+                continue
+            batch.append((entry, stat.st_size))
+            if len(batch) >= CHUNK_SIZE:
+                flush(batch)
+                batch = []
+    if batch:
+        flush(batch)
+
+
+def _flag_missing_files(db, report: dict, dry_run: bool, throttle: _Throttle):
+    last_id = 0
+    while True:
+        rows = db.query(Document.id, Document.file_path, Document.file_missing).filter(
+            Document.id > last_id
+        ).order_by(Document.id).limit(CHUNK_SIZE).all()
+        if not rows:
+            return
+
+        missing, restored = [], []
+        for doc_id, file_path, file_missing in rows:
+            throttle.wait()
+            exists = os.path.exists(file_path)
+            if not exists:
+                report["rows_missing_file"] += 1
+                if len(report["sample_missing_rows"]) < SAMPLE_LIMIT:
+                    report["sample_missing_rows"].append(doc_id)
+                if not file_missing:
+                    missing.append(doc_id)
+            elif file_missing:
+                restored.append(doc_id)
+        report["rows_scanned"] += len(rows)
+        report["rows_newly_flagged"] += len(missing)
+        report["rows_restored"] += len(restored)
+
+        if not dry_run and (missing or restored):
+            if missing:
+                db.query(Document).filter(Document.id.in_(missing)).update(
+                    {Document.file_missing: True}, synchronize_session=False
+                )
+            if restored:
+                db.query(Document).filter(Document.id.in_(restored)).update(
+                    {Document.file_missing: False}, synchronize_session=False
+                )
+            db.commit()
+        last_id = rows[-1][0]
+
+
+def _purge_quarantine(report: dict, dry_run: bool):
+    if not os.path.isdir(QUARANTINE_DIR):
+        return
+    cutoff = time.time() - QUARANTINE_RETENTION_DAYS * 24 * 60 * 60
+    with os.scandir(QUARANTINE_DIR) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                if not dry_run:
+                    os.remove(entry.path)
+                report["quarantine_purged"] += 1
+
+
+def reconcile_uploads(
+    dry_run: bool = False,
+    action: str = ACTION_QUARANTINE,
+    max_ops_per_second: Optional[float] = None,
+    grace_seconds: int = ORPHAN_GRACE_SECONDS,
+    session_factory=SessionLocal
+) -> dict:
+    """Run both reconciliation passes and return a summary report"""
+    global last_report
+    if action not in (ACTION_QUARANTINE, ACTION_DELETE):
+        raise ValueError(f"Unknown action: {action}")
+
+    report = {
+        "started_at": datetime.now(),
+        "finished_at": None,
+        "dry_run": dry_run,
+        "action": action,
+        "max_ops_per_second": max_ops_per_second,
+        "files_scanned": 0,
+        "files_too_recent": 0,
+        "orphans_found": 0,
+        "orphan_bytes": 0,
+        "orphans_disposed": 0,
+        "rows_scanned": 0,
+        "rows_missing_file": 0,
+        "rows_newly_flagged": 0,
+        "rows_restored": 0,
+        "quarantine_purged": 0,
+        "errors": 0,
+        "last_error": None,
+        "sample_orphans": [],
+        "sample_missing_rows": [],
+    }
+    throttle = _Throttle(max_ops_per_second)
+    db = session_factory()
+    try:
+        _sweep_orphans(db, report, dry_run, action, throttle, grace_seconds)
+        _flag_missing_files(db, report, dry_run, throttle)
+        _purge_quarantine(report, dry_run)
+    finally:
+        db.close()
+        report["finished_at"] = datetime.now()
+        last_report = report
+    return report
+
+
+def register(scheduler):
+    """Schedule a real (non dry-run) quarantine pass every ``RECONCILE_INTERVAL``"""
+    return scheduler.add_job(JOB_NAME, reconcile_uploads, RECONCILE_INTERVAL)
@@ -0,0 +1,132 @@
+"""Storage side of resumable (tus-like) uploads.
+
+A session row tracks the committed offset; bytes are appended straight to
+a partial file named after the session id. The partial file may run ahead
+of the row if a write was interrupted, so every append first truncates it
+back to the committed offset. Partial files live outside the statically
+served uploads directory and are moved into it only on finalize.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+
+from database import SessionLocal
+from models.upload_session import UploadSession
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
+PARTIAL_DIR = os.path.join(BASE_DIR, "partial_uploads")
+
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+RECOMMENDED_CHUNK_SIZE = 8 * 1024 * 1024
+SESSION_TTL = timedelta(hours=24)
+CLEANUP_INTERVAL = 30 * 60
+HASH_BLOCK_SIZE = 1024 * 1024
+
+JOB_NAME = "expired_uploads_cleanup"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+class OffsetMismatch(Exception):
+    """The client's Upload-Offset does not match the committed offset"""
+
+
+class UploadTooLarge(Exception):
+    """The chunk would run past the declared upload size"""
+
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(PARTIAL_DIR, upload_id)
+
+
+def new_expiry() -> datetime:
+    return datetime.now() + SESSION_TTL
+
+
+def session_lock(upload_id: str) -> threading.Lock:
+    """Serialize appends to one upload within this process"""
+    with _locks_guard:
+        lock = _locks.get(upload_id)
+        if lock is None:
+            lock = _locks[upload_id] = threading.Lock()
+        return lock
+
+
+def release_lock(upload_id: str):
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+
+
+def create_partial(upload_id: str):
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    open(partial_path(upload_id), "wb").close()
+
+
+def open_for_append(session: UploadSession, client_offset: int):
+    """Open the partial file positioned at the committed offset"""
+    if client_offset != session.offset:
+        raise OffsetMismatch(f"Expected offset {session.offset}, got {client_offset}")
+    path = partial_path(session.id)
+    mode = "r+b" if os.path.exists(path) else "w+b"
+    f = open(path, mode)
+    # Drop bytes from a previously interrupted append
+    f.truncate(session.offset)
+    f.seek(session.offset)
+    return f
+
+
+def check_chunk_size(session: UploadSession, written: int):
+    if session.offset + written > session.total_size:
+        raise UploadTooLarge(f"Upload exceeds declared size of {session.total_size} bytes")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def remove_partial(upload_id: str):
+    path = partial_path(upload_id)
+    if os.path.exists(path):
+        os.remove(path)
+    release_lock(upload_id)
+
+
+def cleanup_expired(session_factory=SessionLocal) -> dict:
+    """Drop expired sessions and partial files that no session owns"""
+    db = session_factory()
+    removed_sessions = 0
+    removed_files = 0
+    try:
+        now = datetime.now()
+        expired = db.query(UploadSession.id).filter(UploadSession.expires_at < now).all()
+        for (upload_id,) in expired:
+            remove_partial(upload_id)
+            removed_sessions += 1
+        if expired:
+            db.query(UploadSession).filter(UploadSession.expires_at < now).delete(synchronize_session=False)
+            db.commit()
+
+        if os.path.isdir(PARTIAL_DIR):
+            cutoff = (now - SESSION_TTL).timestamp()
+            with os.scandir(PARTIAL_DIR) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False) or entry.stat().st_mtime > cutoff:
+                        continue
+                    if db.query(UploadSession.id).filter(UploadSession.id == entry.name).first() is None:
+                        os.remove(entry.path)
+                        removed_files += 1
+    finally:
+        db.close()
+    return {"expired_sessions": removed_sessions, "stray_partial_files": removed_files}
+
+
+def register(scheduler):
+    return scheduler.add_job(JOB_NAME, cleanup_expired, CLEANUP_INTERVAL)
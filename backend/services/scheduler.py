@@ -0,0 +1,147 @@
+"""Minimal in-process scheduler for periodic maintenance jobs.
+
+Each job runs on its own daemon thread: wait ``interval`` seconds, run,
+record the outcome, repeat. Jobs can also be triggered on demand with
+``run_now``; a job never runs concurrently with itself. Jobs given a
+``LeaderLease`` (see services/leader.py) only run on schedule in the
+process currently holding the lease.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledJob:
+    def __init__(self, name: str, func: Callable, interval: float, initial_delay: Optional[float] = None, lease=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = interval if initial_delay is None else initial_delay
+        self.lease = lease
+        self.runs = 0
+        self.failures = 0
+        self.skipped_not_leader = 0
+        self.last_started_at: Optional[datetime] = None
+        self.last_finished_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_result = None
+        self.last_error: Optional[str] = None
+        self._running = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def run(self, **kwargs):
+        """Run once unless already running; returns the job's result or None"""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            self.last_started_at = datetime.now()
+            try:
+                self.last_result = self.func(**kwargs)
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.exception("Scheduled job %s failed", self.name)
+            finally:
+                self.runs += 1
+                self.last_finished_at = datetime.now()
+                self.last_duration = (self.last_finished_at - self.last_started_at).total_seconds()
+            return self.last_result
+        finally:
+            self._running.release()
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at,
+            "last_finished_at": self.last_finished_at,
+            "last_duration_seconds": self.last_duration,
+            "last_error": self.last_error,
+            "skipped_not_leader": self.skipped_not_leader,
+            "lease": self.lease.to_dict() if self.lease else None,
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._stop = threading.Event()
+        self._threads: Dict[str, threading.Thread] = {}
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable,
+        interval: float,
+        initial_delay: Optional[float] = None,
+        lease=None
+    ) -> ScheduledJob:
+        job = ScheduledJob(name, func, interval, initial_delay, lease)
+        self._jobs[name] = job
+        return job
+
+    def get_job(self, name: str) -> Optional[ScheduledJob]:
+        return self._jobs.get(name)
+
+    def _loop(self, job: ScheduledJob):
+        delay = job.initial_delay
+        while not self._stop.wait(delay):
+            if self._is_leader(job):
+                job.run()
+            else:
+                job.skipped_not_leader += 1
+            delay = job.interval
+
+    def _is_leader(self, job: ScheduledJob) -> bool:
+        if job.lease is None:
+            return True
+        try:
+            return job.lease.acquire()
+        except Exception:
+            logger.exception("Could not acquire lease for job %s", job.name)
+            return False
+
+    def start(self):
+        self._stop.clear()
+        for name, job in self._jobs.items():
+            if name in self._threads and self._threads[name].is_alive():
+                continue
+            thread = threading.Thread(target=self._loop, args=(job,), name=f"scheduler-{name}", daemon=True)
+            self._threads[name] = thread
+            thread.start()
+
+    def run_now(self, name: str, **kwargs) -> bool:
+        """Trigger a job on a background thread; False if it is already running"""
+        job = self._jobs[name]
+        if job.running:
+            return False
+        threading.Thread(target=job.run, kwargs=kwargs, name=f"scheduler-{name}-manual", daemon=True).start()
+        return True
+
+    def shutdown(self):
+        self._stop.set()
+        for thread in self._threads.values():
+            thread.join(timeout=5)
+        self._threads.clear()
+        for job in self._jobs.values():
+            if job.lease is not None:
+                try:
+                    job.lease.release()
+                except Exception:
+                    logger.exception("Could not release lease for job %s", job.name)
+
+    def status(self) -> list:
+        return [job.to_dict() for job in self._jobs.values()]
+
+
+scheduler = Scheduler()
@@ -0,0 +1,263 @@
+"""Interval index over the timetable for clash detection.
+
+For every semester the schedule slots are loaded once into static
+interval trees: one per (day, room) and one per (day, teacher). Each tree
+is a balanced BST over the slots sorted by start, where every node also
+stores the largest end in its subtree. Finding the slots that overlap
+``[start, end)`` takes O(log n + k). A student's own timetable is small,
+so a tree for it is built on demand from the per-subject slot lists.
+The same room trees answer free-room searches: a room is free for a
+window when its tree for that day has no overlapping slot.
+
+The index is cached in process for ``CACHE_TTL`` seconds and dropped
+when a schedule or subject is committed (see ``services.cache_hooks``).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.schedule import Schedule, DayOfWeek, parse_time_range, format_time_range
+from models.subject import Subject
+from models.enrollment import Enrollment
+from services import cache_hooks
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+CACHE_TTL = 60
+
+_lock = threading.Lock()
+_version = 0
+_indexes: Dict[str, Tuple[float, "SemesterIndex"]] = {}
+
+
+class Slot(NamedTuple):
+    id: Optional[int]
+    subject_id: int
+    subject_code: str
+    teacher_id: Optional[int]
+    day: DayOfWeek
+    start: int
+    end: int
+    room: str
+
+    def describe(self) -> str:
+        return f"{self.subject_code} {self.day.value} {format_time_range(self.start, self.end)} in {self.room}"
+
+    def to_dict(self) -> dict:
+        return {
+            "schedule_id": self.id,
+            "subject_id": self.subject_id,
+            "subject_code": self.subject_code,
+            "day": self.day,
+            "time": format_time_range(self.start, self.end),
+            "room": self.room,
+        }
+
+
+class IntervalTree:
+    """Static interval tree over half-open ``[start, end)`` slots"""
+
+    def __init__(self, slots: Iterable[Slot]):
+        self.slots: List[Slot] = sorted(slots, key=lambda s: s.start)
+        self.starts = [slot.start for slot in self.slots]
+        # max_end[i] = largest end in the subtree rooted at sorted index i
+        self.max_end = [0] * len(self.slots)
+        self._build(0, len(self.slots))
+
+    def _build(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -1
+        mid = (lo + hi) // 2
+        end = self.slots[mid].end
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child >= 0:
+                end = max(end, self.max_end[child])
+        self.max_end[mid] = end
+        return mid
+
+    def overlapping(self, start: int, end: int) -> List[Slot]:
+        found: List[Slot] = []
+        self._search(0, len(self.slots), start, end, found)
+        return found
+
+    def _search(self, lo: int, hi: int, start: int, end: int, found: List[Slot]):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.max_end[mid] <= start:
+                return  # everything below ends before the query starts
+            self._search(lo, mid, start, end, found)
+            slot = self.slots[mid]
+            if slot.start >= end:
+                return  # this slot and everything right of it start too late
+            if slot.end > start:
+                found.append(slot)
+            lo = mid + 1
+
+    def next_start(self, minute: int) -> Optional[int]:
+        """Start of the first slot starting at or after ``minute``"""
+        position = bisect_left(self.starts, minute)
+        return self.starts[position] if position < len(self.starts) else None
+
+    def __len__(self):
+        return len(self.slots)
+
+
+class SemesterIndex:
+    def __init__(self, semester: str, slots: Sequence[Slot], rooms: Iterable[str] = ()):
+        self.semester = semester
+        # Every known room, including ones only used in other semesters
+        self.rooms = sorted(set(rooms) | {slot.room for slot in slots})
+        self.by_subject: Dict[int, List[Slot]] = defaultdict(list)
+        by_room = defaultdict(list)
+        by_teacher = defaultdict(list)
+        for slot in slots:
+            self.by_subject[slot.subject_id].append(slot)
+            by_room[(slot.day, slot.room)].append(slot)
+            if slot.teacher_id is not None:
+                by_teacher[(slot.day, slot.teacher_id)].append(slot)
+        self.by_room = {key: IntervalTree(group) for key, group in by_room.items()}
+        self.by_teacher = {key: IntervalTree(group) for key, group in by_teacher.items()}
+
+    @staticmethod
+    def _query(tree: Optional[IntervalTree], slot: Slot) -> List[Slot]:
+        if tree is None:
+            return []
+        return [other for other in tree.overlapping(slot.start, slot.end) if other.id is None or other.id != slot.id]
+
+    def room_conflicts(self, slot: Slot) -> List[Slot]:
+        return self._query(self.by_room.get((slot.day, slot.room)), slot)
+
+    def teacher_conflicts(self, slot: Slot) -> List[Slot]:
+        if slot.teacher_id is None:
+            return []
+        return self._query(self.by_teacher.get((slot.day, slot.teacher_id)), slot)
+
+    def free_rooms(self, day: DayOfWeek, start: int, end: int) -> List[Tuple[str, Optional[int]]]:
+        """(room, start of its next class that day or None) for every room free in ``[start, end)``"""
+        free = []
+        for room in self.rooms:
+            tree = self.by_room.get((day, room))
+            if tree is None:
+                free.append((room, None))
+            elif not tree.overlapping(start, end):
+                free.append((room, tree.next_start(end)))
+        return free
+
+    def student_conflicts(self, subject_ids: Iterable[int], new_subject_id: int) -> List[tuple]:
+        """(new slot, clashing slot) pairs between ``new_subject_id`` and the student's subjects"""
+        by_day = defaultdict(list)
+        for slot in chain.from_iterable(self.by_subject.get(s, ()) for s in subject_ids if s != new_subject_id):
+            by_day[slot.day].append(slot)
+        trees = {day: IntervalTree(group) for day, group in by_day.items()}
+        return [
+            (slot, other)
+            for slot in self.by_subject.get(new_subject_id, ())
+            for other in self._query(trees.get(slot.day), slot)
+        ]
+
+
+# ============== CACHE ==============
+
+def invalidate():
+    global _version
+    with _lock:
+        _version += 1
+        _indexes.clear()
+
+
+cache_hooks.track("timetable_changed", [Schedule, Subject], invalidate)
+
+
+def _load(db: Session, semester: str) -> SemesterIndex:
+    rows = db.query(
+        Schedule.id, Schedule.subject_id, Subject.code, Subject.teacher_id, Schedule.day,
+        Schedule.start_minute, Schedule.end_minute, Schedule.time, Schedule.room
+    ).join(Subject, Subject.id == Schedule.subject_id).filter(Schedule.semester == semester).all()
+    slots = []
+    for row in rows:
+        start, end = row.start_minute, row.end_minute
+        if start is None or end is None:
+            # Rows written before the columns existed
+            try:
+                start, end = parse_time_range(row.time)
+            except ValueError:
+                continue
+        slots.append(Slot(row.id, row.subject_id, row.code, row.teacher_id, row.day, start, end, row.room))
+    rooms = [row.room for row in db.query(Schedule.room).distinct()]
+    return SemesterIndex(semester, slots, rooms)
+
+
+def semester_index(db: Session, semester: str) -> SemesterIndex:
+    """The (cached) interval index of ``semester``"""
+    now = time.monotonic()
+    with _lock:
+        entry = _indexes.get(semester)
+        version = _version
+        if entry is not None and now - entry[0] < CACHE_TTL:
+            return entry[1]
+    index = _load(db, semester)
+    with _lock:
+        # Don't store an index built while the timetable changed, or one
+        # that sees this session's uncommitted changes
+        if _version == version and not cache_hooks.pending(db, "timetable_changed"):
+            _indexes[semester] = (now, index)
+    return index
+
+
+# ============== CHECKS ==============
+
+def schedule_conflicts(
+    db: Session,
+    semester: str,
+    day: DayOfWeek,
+    time_range: str,
+    room: str,
+    teacher_id: Optional[int],
+    schedule_id: Optional[int] = None
+) -> List[dict]:
+    """Room and teacher clashes of a slot with the rest of its semester.
+
+    ``schedule_id`` is the slot being edited, which never clashes with its
+    old self.
+    """
+    start, end = parse_time_range(time_range)
+    slot = Slot(schedule_id, 0, "", teacher_id, day, start, end, room)
+    index = semester_index(db, semester)
+    room_clashes = index.room_conflicts(slot)
+    conflicts = [{"type": "room", **other.to_dict()} for other in room_clashes]
+    conflicts += [
+        {"type": "teacher", **other.to_dict()}
+        for other in index.teacher_conflicts(slot)
+        # A double-booked room with the same teacher is reported once
+        if other not in room_clashes
+    ]
+    return conflicts
+
+
+def free_rooms(db: Session, semester: str, day: DayOfWeek, time_range: str) -> List[dict]:
+    """Rooms with no class of ``semester`` overlapping the window, by name"""
+    start, end = parse_time_range(time_range)
+    return [
+        {"room": room, "free_until": None if next_start is None else f"{next_start // 60:02d}:{next_start % 60:02d}"}
+        for room, next_start in semester_index(db, semester).free_rooms(day, start, end)
+    ]
+
+
+def enrollment_warnings(db: Session, student_id: int, subject_id: int, semester: str) -> List[str]:
+    """Timetable clashes between ``subject_id`` and the student's other subjects in ``semester``"""
+    subject_ids = [row.subject_id for row in db.query(Enrollment.subject_id).filter(
+        Enrollment.student_id == student_id,
+        Enrollment.semester == semester,
+        Enrollment.status.in_(SEAT_HOLDING_STATUSES)
+    )]
+    if not subject_ids:
+        return []
+    index = semester_index(db, semester)
+    return [
+        f"{slot.describe()} clashes with {other.describe()}"
+        for slot, other in index.student_conflicts(subject_ids, subject_id)
+    ]
@@ -0,0 +1,496 @@
+"""Automatic timetable generation for a semester.
+
+Every (subject, class type) pair is one class to place at a grid time
+(weekday x ``SLOT_STARTS``, ``SLOT_MINUTES`` long) in a room. Hard
+constraints are never broken: a room or a teacher holds one class at a
+time, labs go to lab rooms, and classes that are not being regenerated
+(other subjects, or other class types of the same subjects) stay where
+they are and block their room and teacher. The soft cost is the number
+of student clashes: for two classes at the same time, the number of
+students enrolled in both subjects.
+
+Solving is a greedy construction (most constrained class first, cheapest
+feasible place, spreading each teacher's classes over the week) followed
+by simulated annealing over two moves: relocate a class to a free room at
+another time, or swap the places of two classes. The best timetable seen
+during annealing is kept. The solver works on plain data (``Problem``),
+so it can be benchmarked without a database and runs in a worker process
+instead of holding the API process's GIL. A job's background thread only
+loads the problem and writes the result. The result replaces the
+subjects' classes of the generated types for the semester in one
+transaction, and only if every class was placed.
+"""
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session, aliased
+
+from database import SessionLocal
+from models.schedule import Schedule, DayOfWeek, ClassType, ClassCancellation, format_time_range
+from models.subject import Subject, Semester
+from models.enrollment import Enrollment
+from services import timetable
+from services import occurrences
+from services.enrollments import SEAT_HOLDING_STATUSES
+
+DAYS = [DayOfWeek.MONDAY, DayOfWeek.TUESDAY, DayOfWeek.WEDNESDAY, DayOfWeek.THURSDAY, DayOfWeek.FRIDAY]
+SLOT_STARTS = [8 * 60, 10 * 60, 12 * 60, 14 * 60, 16 * 60, 18 * 60]
+SLOT_MINUTES = 100
+LAB_TYPES = (ClassType.LAB,)
+# Jobs of different semesters may solve at the same time
+SOLVER_WORKERS = 2
+# Finished jobs can be polled this long
+JOB_TTL = timedelta(hours=24)
+
+
+class GenerationError(Exception):
+    """The request cannot be turned into a timetable (no subjects, no rooms, unplaced classes)"""
+
+
+class ClassEvent(NamedTuple):
+    subject_id: int
+    subject_code: str
+    class_type: ClassType
+    teacher_id: Optional[int]
+    rooms: Tuple[int, ...]  # indexes into Problem.rooms
+
+
+class Problem(NamedTuple):
+    events: List[ClassEvent]
+    rooms: List[str]
+    times: int  # grid times are 0..times-1
+    # Students shared by two subjects (both orders) and per subject (attending both its classes)
+    overlap: Dict[int, Dict[int, int]]
+    blocked_rooms: Set[Tuple[int, int]]  # (time, room) taken by fixed classes
+    blocked_teachers: Set[Tuple[int, int]]  # (time, teacher_id)
+
+
+def grid_time(t: int) -> Tuple[DayOfWeek, int, int]:
+    day, slot = divmod(t, len(SLOT_STARTS))
+    return DAYS[day], SLOT_STARTS[slot], SLOT_STARTS[slot] + SLOT_MINUTES
+
+
+# ============== SOLVER ==============
+
+class _State:
+    def __init__(self, problem: Problem):
+        self.problem = problem
+        self.place: List[Optional[Tuple[int, int]]] = [None] * len(problem.events)
+        self.room_at: Dict[Tuple[int, int], int] = {}
+        self.teacher_at: Dict[Tuple[int, int], int] = {}
+        self.events_at: List[Set[int]] = [set() for _ in range(problem.times)]
+
+    def weight(self, a: int, b: int) -> int:
+        events = self.problem.events
+        return self.problem.overlap.get(events[a].subject_id, {}).get(events[b].subject_id, 0)
+
+    def cost_at(self, e: int, t: int) -> int:
+        return sum(self.weight(e, other) for other in self.events_at[t] if other != e)
+
+    def room_free(self, t: int, r: int) -> bool:
+        return (t, r) not in self.room_at and (t, r) not in self.problem.blocked_rooms
+
+    def teacher_free(self, e: int, t: int, ignore: Optional[int] = None) -> bool:
+        teacher = self.problem.events[e].teacher_id
+        if teacher is None:
+            return True
+        if (t, teacher) in self.problem.blocked_teachers:
+            return False
+        holder = self.teacher_at.get((t, teacher))
+        return holder is None or holder == ignore
+
+    def put(self, e: int, t: int, r: int):
+        self.place[e] = (t, r)
+        self.room_at[(t, r)] = e
+        teacher = self.problem.events[e].teacher_id
+        if teacher is not None:
+            self.teacher_at[(t, teacher)] = e
+        self.events_at[t].add(e)
+
+    def take(self, e: int):
+        t, r = self.place[e]
+        self.place[e] = None
+        del self.room_at[(t, r)]
+        teacher = self.problem.events[e].teacher_id
+        if teacher is not None and self.teacher_at.get((t, teacher)) == e:
+            del self.teacher_at[(t, teacher)]
+        self.events_at[t].discard(e)
+
+    def total_cost(self) -> int:
+        return sum(self.cost_at(e, place[0]) for e, place in enumerate(self.place) if place) // 2
+
+
+def _greedy(state: _State):
+    problem = state.problem
+    teacher_load = defaultdict(int)
+    for event in problem.events:
+        teacher_load[event.teacher_id] += 1
+    # Most constrained first: busy teachers, few rooms, many shared students
+    order = sorted(
+        range(len(problem.events)),
+        key=lambda e: (
+            -teacher_load[problem.events[e].teacher_id] if problem.events[e].teacher_id is not None else 0,
+            len(problem.events[e].rooms),
+            -sum(problem.overlap.get(problem.events[e].subject_id, {}).values()),
+        )
+    )
+    per_day = len(SLOT_STARTS)
+    for e in order:
+        teacher = problem.events[e].teacher_id
+        best = None
+        for t in range(problem.times):
+            if not state.teacher_free(e, t):
+                continue
+            room = next((r for r in problem.events[e].rooms if state.room_free(t, r)), None)
+            if room is None:
+                continue
+            # Ties go to the day the teacher has the fewest classes on
+            day_start = t - t % per_day
+            teacher_day = 0 if teacher is None else sum(
+                (other, teacher) in state.teacher_at for other in range(day_start, day_start + per_day)
+            )
+            key = (state.cost_at(e, t), teacher_day)
+            if best is None or key < best[0]:
+                best = (key, t, room)
+        if best is not None:
+            state.put(e, best[1], best[2])
+
+
+def _anneal(state: _State, rng: random.Random, deadline: float, max_iterations: int) -> int:
+    problem = state.problem
+    placed = [e for e, place in enumerate(state.place) if place]
+    if len(placed) < 2:
+        return 0
+    weights = [w for row in problem.overlap.values() for w in row.values() if w]
+    temperature_start = max(1.0, sum(weights) / len(weights)) if weights else 1.0
+    started = time.monotonic()
+    budget = max(deadline - started, 1e-6)
+    cost = best_cost = state.total_cost()
+    best_place = list(state.place)
+    temperature = temperature_start
+    iteration = 0
+    while iteration < max_iterations and cost > 0:
+        if iteration % 256 == 0:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            temperature = temperature_start * 0.001 ** ((now - started) / budget)
+        iteration += 1
+
+        e = rng.choice(placed)
+        t, r = state.place[e]
+        new_t = rng.randrange(problem.times)
+        if new_t == t:
+            continue
+        holder_rooms = [(state.room_at.get((new_t, room)), room) for room in problem.events[e].rooms]
+        free_rooms = [room for holder, room in holder_rooms if holder is None and (new_t, room) not in problem.blocked_rooms]
+
+        if free_rooms and rng.random() < 0.5:
+            # Relocate
+            if not state.teacher_free(e, new_t):
+                continue
+            delta = state.cost_at(e, new_t) - state.cost_at(e, t)
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                state.take(e)
+                state.put(e, new_t, rng.choice(free_rooms))
+                cost += delta
+        else:
+            # Swap with a class in one of e's rooms at new_t that can use e's room
+            others = [(holder, room) for holder, room in holder_rooms if holder is not None and r in problem.events[holder].rooms]
+            if not others:
+                continue
+            other, other_room = rng.choice(others)
+            if not state.teacher_free(e, new_t, ignore=other) or not state.teacher_free(other, t, ignore=e):
+                continue
+            delta = (
+                state.cost_at(e, new_t) - state.weight(e, other)
+                + state.cost_at(other, t) - state.weight(other, e)
+                - state.cost_at(e, t) - state.cost_at(other, new_t)
+            )
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                state.take(e)
+                state.take(other)
+                state.put(e, new_t, other_room)
+                state.put(other, t, r)
+                cost += delta
+        if cost < best_cost:
+            best_cost, best_place = cost, list(state.place)
+
+    if cost > best_cost:
+        for e in placed:
+            state.take(e)
+        for e in placed:
+            state.put(e, *best_place[e])
+    return iteration
+
+
+def solve(problem: Problem, max_seconds: float = 5.0, max_iterations: int = 2_000_000, seed: Optional[int] = None) -> dict:
+    """Place every class; returns the placements and a quality report"""
+    started = time.monotonic()
+    state = _State(problem)
+    _greedy(state)
+    greedy_cost = state.total_cost()
+    greedy_seconds = time.monotonic() - started
+    iterations = _anneal(state, random.Random(seed), started + max_seconds, max_iterations)
+    final_cost = state.total_cost()
+    unplaced = [e for e, place in enumerate(state.place) if place is None]
+    return {
+        "placements": [(e, place[0], place[1]) for e, place in enumerate(state.place) if place],
+        "report": {
+            "classes": len(problem.events),
+            "placed": len(problem.events) - len(unplaced),
+            "unplaced": [
+                {"subject_id": problem.events[e].subject_id, "subject_code": problem.events[e].subject_code,
+                 "class_type": problem.events[e].class_type}
+                for e in unplaced
+            ],
+            "greedy_student_clashes": greedy_cost,
+            "student_clashes": final_cost,
+            "iterations": iterations,
+            "greedy_seconds": round(greedy_seconds, 3),
+            "solve_seconds": round(time.monotonic() - started, 3),
+        },
+    }
+
+
+# ============== LOADING AND WRITING ==============
+
+def _season(semester: str) -> Optional[Semester]:
+    first = semester.split(" ", 1)[0].capitalize()
+    return next((season for season in Semester if season.value == first), None)
+
+
+def load_problem(
+    db: Session,
+    semester: str,
+    subject_ids: Optional[Sequence[int]] = None,
+    rooms: Optional[Sequence[str]] = None,
+    lab_rooms: Optional[Sequence[str]] = None,
+    class_types: Sequence[ClassType] = (ClassType.LECTURE, ClassType.LAB)
+) -> Problem:
+    # One class per (subject, class type), however often a type is listed
+    class_types = list(dict.fromkeys(class_types))
+    query = db.query(Subject.id, Subject.code, Subject.teacher_id)
+    if subject_ids:
+        query = query.filter(Subject.id.in_(subject_ids))
+    else:
+        season = _season(semester)
+        if season is None:
+            raise GenerationError(f"Cannot tell the season of {semester!r}; pass subject_ids")
+        query = query.filter(Subject.semester == season)
+    subjects = query.order_by(Subject.id).all()
+    if not subjects:
+        raise GenerationError("No subjects to schedule")
+
+    index = timetable.semester_index(db, semester)
+    if lab_rooms is None:
+        # Rooms such as "PK6 Lab1"
+        lab_rooms = [room for room in (rooms or index.rooms) if "lab" in room.lower()]
+    all_rooms = list(dict.fromkeys([*(rooms or index.rooms), *lab_rooms]))
+    if not all_rooms:
+        raise GenerationError("No rooms to schedule into")
+    labs = {i for i, room in enumerate(all_rooms) if room in set(lab_rooms)}
+    halls = tuple(i for i in range(len(all_rooms)) if i not in labs) or tuple(range(len(all_rooms)))
+    lab_domain = tuple(sorted(labs)) or tuple(range(len(all_rooms)))
+
+    events = [
+        ClassEvent(subject.id, subject.code, class_type, subject.teacher_id,
+                   lab_domain if class_type in LAB_TYPES else halls)
+        for subject in subjects
+        for class_type in class_types
+    ]
+
+    # Classes of other subjects and of the other class types stay and block their room and teacher
+    regenerated = {subject.id for subject in subjects}
+    kept = {row.id for row in db.query(Schedule.id).filter(
+        Schedule.semester == semester,
+        Schedule.subject_id.in_(regenerated),
+        Schedule.class_type.notin_(list(class_types))
+    )}
+
+    def fixed(slot) -> bool:
+        return slot.subject_id not in regenerated or slot.id in kept
+
+    times = len(DAYS) * len(SLOT_STARTS)
+    room_ids = {room: i for i, room in enumerate(all_rooms)}
+    blocked_rooms, blocked_teachers = set(), set()
+    for t in range(times):
+        day, start, end = grid_time(t)
+        for day_room, tree in index.by_room.items():
+            if day_room[0] == day and day_room[1] in room_ids and any(
+                fixed(slot) for slot in tree.overlapping(start, end)
+            ):
+                blocked_rooms.add((t, room_ids[day_room[1]]))
+        for day_teacher, tree in index.by_teacher.items():
+            if day_teacher[0] == day and any(fixed(slot) for slot in tree.overlapping(start, end)):
+                blocked_teachers.add((t, day_teacher[1]))
+
+    mine, theirs = aliased(Enrollment), aliased(Enrollment)
+    shared = db.query(mine.subject_id, theirs.subject_id, func.count()).join(
+        theirs, (theirs.student_id == mine.student_id) & (theirs.semester == mine.semester)
+    ).filter(
+        mine.semester == semester,
+        mine.subject_id.in_(regenerated),
+        theirs.subject_id.in_(regenerated),
+        mine.status.in_(SEAT_HOLDING_STATUSES),
+        theirs.status.in_(SEAT_HOLDING_STATUSES)
+    ).group_by(mine.subject_id, theirs.subject_id)
+    overlap: Dict[int, Dict[int, int]] = defaultdict(dict)
+    for a, b, count in shared:
+        overlap[a][b] = count
+
+    return Problem(events, all_rooms, times, dict(overlap), blocked_rooms, blocked_teachers)
+
+
+def write_timetable(db: Session, semester: str, problem: Problem, placements) -> int:
+    """Replace the problem's classes (its subjects' schedules of its class
+    types) in ``semester``; one transaction.
+
+    Raises ``GenerationError`` and writes nothing unless every class was placed.
+    """
+    if len(placements) < len(problem.events):
+        raise GenerationError(
+            f"{len(problem.events) - len(placements)} of {len(problem.events)} classes could not be placed; "
+            "the timetable was not written"
+        )
+    subject_ids = {event.subject_id for event in problem.events}
+    class_types = {event.class_type for event in problem.events}
+    rows = []
+    for e, t, r in placements:
+        day, start, end = grid_time(t)
+        rows.append({
+            "subject_id": problem.events[e].subject_id, "day": day, "time": format_time_range(start, end),
+            "start_minute": start, "end_minute": end, "room": problem.rooms[r],
+            "class_type": problem.events[e].class_type, "semester": semester,
+        })
+    try:
+        replaced = (
+            Schedule.subject_id.in_(subject_ids),
+            Schedule.class_type.in_(class_types),
+            Schedule.semester == semester,
+        )
+        db.execute(delete(ClassCancellation).where(
+            ClassCancellation.schedule_id.in_(select(Schedule.id).where(*replaced))
+        ))
+        db.execute(delete(Schedule).where(*replaced))
+        if rows:
+            db.execute(insert(Schedule), rows)
+        occurrences.rebuild_semester(db, semester)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+# ============== JOBS ==============
+
+class GenerationJob:
+    """A timetable generation run, shared with the polling endpoint"""
+
+    def __init__(self, requested_by: int, semester: str, options: dict):
+        self.id = uuid.uuid4().hex
+        self.requested_by = requested_by
+        self.semester = semester
+        self.options = options
+        self.status = "queued"
+        self.report: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "semester": self.semester,
+            "dry_run": self.options.get("dry_run", False),
+            "report": self.report,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs: Dict[str, GenerationJob] = {}
+_jobs_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=SOLVER_WORKERS)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _prune(now: datetime):
+    """Forget jobs that finished more than ``JOB_TTL`` ago; call with ``_jobs_lock`` held"""
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished_at and now - job.finished_at > JOB_TTL]:
+        del _jobs[job_id]
+
+
+def create_job(requested_by: int, semester: str, **options) -> Optional[GenerationJob]:
+    """New job, or None while another one for ``semester`` is still running"""
+    with _jobs_lock:
+        _prune(datetime.now())
+        if any(job.semester == semester and job.status in ("queued", "running") for job in _jobs.values()):
+            return None
+        job = GenerationJob(requested_by, semester, options)
+        _jobs[job.id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[GenerationJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def run_job(job: GenerationJob, session_factory=SessionLocal):
+    """Load, solve in the solver pool and (unless ``dry_run``) write; opens its own session"""
+    options = dict(job.options)
+    dry_run = options.pop("dry_run", False)
+    max_seconds = options.pop("max_seconds", 5.0)
+    seed = options.pop("seed", None)
+    db = session_factory()
+    try:
+        job.status = "running"
+        problem = load_problem(db, job.semester, **options)
+        result = _get_pool().submit(solve, problem, max_seconds=max_seconds, seed=seed).result()
+        # Kept on failure too, so unplaced classes can be looked at
+        job.report = report = result["report"]
+        report["written"] = 0
+        if not dry_run:
+            report["written"] = write_timetable(db, job.semester, problem, result["placements"])
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.now()
+        db.close()
+
+
+def start_job(job: GenerationJob) -> GenerationJob:
+    """Run ``run_job`` on a background thread"""
+    thread = threading.Thread(target=run_job, args=(job,), daemon=True)
+    thread.start()
+    return job
@@ -0,0 +1,384 @@
+"""Grade transcript rendering and cohort-wide batch generation.
+
+Rendering is a pure function of plain data so it can run in worker
+processes.  The batch path reads students in keyset-paginated chunks,
+fans rendering out over a process pool with a bounded number of chunks
+in flight, and writes each transcript into a ZIP stream as soon as it
+comes back, so memory stays flat regardless of cohort size.
+
+Finished batch jobs and their stored ZIPs are kept for ``JOB_TTL``;
+``cleanup_expired`` runs on the scheduler and removes them afterwards.
+"""
+import os
+import threading
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.user import User, UserRole
+from models.grade import Grade
+from models.subject import Subject
+from models.enrollment import Enrollment
+
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "exports")
+
+# Students read from the database per query, and students per worker task
+STUDENT_CHUNK_SIZE = 500
+RENDER_CHUNK_SIZE = 64
+
+JOB_TTL = timedelta(hours=24)
+CLEANUP_INTERVAL = 30 * 60
+ARTIFACT_PREFIX = "grade_transcripts_"
+
+JOB_NAME = "batch_transcripts_cleanup"
+
+
+# ============== RENDERING ==============
+
+def render_grade_transcript_html(student: dict, rows: List[tuple], issued_at: datetime) -> str:
+    """Render the transcript for one student.
+
+    ``student`` carries ``id``, ``full_name`` and ``email``; each row is
+    ``(code, name, credits, grade_letter, numeric_grade, semester)``.
+    """
+    grades_html = ""
+    total_credits = 0
+    weighted_sum = 0
+
+    for code, name, credits, grade_letter, numeric_grade, semester in rows:
+        credits = credits or 0
+        total_credits += credits
+        weighted_sum += numeric_grade * credits
+        grades_html += f"<tr><td>{code}</td><td>{name}</td><td>{credits}</td><td>{grade_letter}</td><td>{numeric_grade:.2f}</td><td>{semester}</td></tr>"
+
+    gpa = weighted_sum / total_credits if total_credits > 0 else 0
+
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Grade Transcript - AIS TUKE</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; padding: 40px; }}
+            h1 {{ color: #c41e3a; }}
+            .header {{ border-bottom: 2px solid #c41e3a; padding-bottom: 20px; margin-bottom: 30px; }}
+            .info {{ margin: 20px 0; }}
+            .info p {{ margin: 5px 0; }}
+            table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
+            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: left; }}
+            th {{ background-color: #c41e3a; color: white; }}
+            .summary {{ margin-top: 30px; padding: 20px; background: #f5f5f5; }}
+            .footer {{ margin-top: 50px; font-size: 12px; color: #666; }}
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>Technical University of Košice</h1>
+            <h2>Official Grade Transcript</h2>
+        </div>
+
+        <div class="info">
+            <p><strong>Student Name:</strong> {student['full_name'] or 'N/A'}</p>
+            <p><strong>Email:</strong> {student['email']}</p>
+            <p><strong>Student ID:</strong> {student['id']}</p>
+            <p><strong>Date Issued:</strong> {issued_at.strftime('%B %d, %Y')}</p>
+        </div>
+
+        <h3>Academic Record</h3>
+        <table>
+            <tr>
+                <th>Code</th>
+                <th>Subject Name</th>
+                <th>Credits</th>
+                <th>Grade</th>
+                <th>Points</th>
+                <th>Semester</th>
+            </tr>
+            {grades_html}
+        </table>
+
+        <div class="summary">
+            <p><strong>Total Credits:</strong> {total_credits}</p>
+            <p><strong>GPA:</strong> {gpa:.2f}</p>
+        </div>
+
+        <div class="footer">
+            <p>This document was generated electronically and is valid without signature.</p>
+            <p>Technical University of Košice, Letná 9, 042 00 Košice, Slovakia</p>
+        </div>
+    </body>
+    </html>
+    """
+
+
+def transcript_filename(student: dict) -> str:
+    return f"grade_transcript_{student['id']}.html"
+
+
+def _render_chunk(payloads: List[Tuple[dict, List[tuple]]], issued_at: datetime) -> List[Tuple[str, bytes]]:
+    """Worker entry point: render a chunk of students to (filename, bytes)"""
+    return [
+        (transcript_filename(student), render_grade_transcript_html(student, rows, issued_at).encode())
+        for student, rows in payloads
+    ]
+
+
+# ============== DATA ACCESS ==============
+
+def load_transcript_rows(db: Session, student_ids: List[int]) -> Dict[int, List[tuple]]:
+    """Fetch transcript rows for many students with a single joined query"""
+    rows: Dict[int, List[tuple]] = {student_id: [] for student_id in student_ids}
+    if not student_ids:
+        return rows
+
+    grades = db.query(
+        Grade.student_id, Subject.code, Subject.name, Subject.credits,
+        Grade.grade, Grade.numeric_grade, Grade.semester
+    ).join(Subject, Subject.id == Grade.subject_id).filter(
+        Grade.student_id.in_(student_ids)
+    ).order_by(Grade.student_id, Grade.id).all()
+
+    for student_id, code, name, credits, grade, numeric_grade, semester in grades:
+        rows[student_id].append((code, name, credits, grade.value, numeric_grade, semester))
+    return rows
+
+
+def _cohort_query(db: Session, subject_id: Optional[int], semester: Optional[str]):
+    query = db.query(User.id, User.full_name, User.email).filter(User.role == UserRole.STUDENT)
+    if subject_id is not None or semester:
+        enrolled = exists().where(Enrollment.student_id == User.id)
+        if subject_id is not None:
+            enrolled = enrolled.where(Enrollment.subject_id == subject_id)
+        if semester:
+            enrolled = enrolled.where(Enrollment.semester == semester)
+        query = query.filter(enrolled)
+    return query
+
+
+def count_cohort(db: Session, subject_id: Optional[int] = None, semester: Optional[str] = None) -> int:
+    return _cohort_query(db, subject_id, semester).count()
+
+
+def iter_cohort_payloads(
+    db: Session,
+    subject_id: Optional[int] = None,
+    semester: Optional[str] = None,
+    chunk_size: int = STUDENT_CHUNK_SIZE
+) -> Iterator[List[Tuple[dict, List[tuple]]]]:
+    """Yield chunks of (student, rows) using keyset pagination on user id"""
+    last_id = 0
+    while True:
+        students = _cohort_query(db, subject_id, semester).filter(
+            User.id > last_id
+        ).order_by(User.id).limit(chunk_size).all()
+        if not students:
+            return
+
+        rows = load_transcript_rows(db, [s.id for s in students])
+        yield [
+            ({"id": s.id, "full_name": s.full_name, "email": s.email}, rows[s.id])
+            for s in students
+        ]
+        last_id = students[-1].id
+
+
+# ============== BATCH PIPELINE ==============
+
+def bounded_map(executor, fn: Callable, items: Iterable, max_in_flight: int, *args) -> Iterator:
+    """Like ``executor.map`` but pulls ``items`` lazily, keeping at most
+    ``max_in_flight`` tasks outstanding, and yields results in order."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item, *args))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _render_tasks(
+    db: Session,
+    subject_id: Optional[int],
+    semester: Optional[str]
+) -> Iterator[List[Tuple[dict, List[tuple]]]]:
+    for chunk in iter_cohort_payloads(db, subject_id, semester):
+        for start in range(0, len(chunk), RENDER_CHUNK_SIZE):
+            yield chunk[start:start + RENDER_CHUNK_SIZE]
+
+
+class _ZipSink:
+    """Write-only, non-seekable file object that buffers until drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BatchJob:
+    """Progress of a batch transcript run, shared with the polling endpoint"""
+
+    def __init__(self, requested_by: int, subject_id: Optional[int], semester: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.requested_by = requested_by
+        self.subject_id = subject_id
+        self.semester = semester
+        self.status = "queued"
+        self.total = 0
+        self.done = 0
+        self.error: Optional[str] = None
+        self.artifact_path: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "subject_id": self.subject_id,
+            "semester": self.semester,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "download_ready": self.status == "completed" and self.artifact_path is not None,
+        }
+
+
+_jobs: Dict[str, BatchJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def create_job(requested_by: int, subject_id: Optional[int] = None, semester: Optional[str] = None) -> BatchJob:
+    job = BatchJob(requested_by, subject_id, semester)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[BatchJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def stream_transcripts_zip(
+    job: BatchJob,
+    session_factory=SessionLocal,
+    max_workers: Optional[int] = None
+) -> Iterator[bytes]:
+    """Render every transcript in the job's cohort and yield ZIP bytes.
+
+    Opens its own session because it outlives the request that started it.
+    """
+    db = session_factory()
+    workers = max_workers or os.cpu_count() or 1
+    issued_at = datetime.now()
+    try:
+        job.status = "running"
+        job.total = count_cohort(db, job.subject_id, job.semester)
+
+        sink = _ZipSink()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+                tasks = _render_tasks(db, job.subject_id, job.semester)
+                for rendered in bounded_map(executor, _render_chunk, tasks, workers * 2, issued_at):
+                    for filename, content in rendered:
+                        archive.writestr(filename, content)
+                    job.done += len(rendered)
+                    yield sink.drain()
+            yield sink.drain()
+
+        job.status = "completed"
+    except GeneratorExit:
+        job.status = "cancelled"
+        raise
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        raise
+    finally:
+        job.finished_at = datetime.now()
+        db.close()
+
+
+def write_transcripts_artifact(job: BatchJob, session_factory=SessionLocal, max_workers: Optional[int] = None):
+    """Run the job to completion and store the ZIP under ``EXPORT_DIR``"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{ARTIFACT_PREFIX}{job.id}.zip")
+    # Set before streaming so the job never reads as completed without a path
+    job.artifact_path = path
+    try:
+        with open(path, "wb") as f:
+            for data in stream_transcripts_zip(job, session_factory, max_workers):
+                f.write(data)
+    except Exception:
+        job.artifact_path = None
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def start_transcripts_job(job: BatchJob) -> BatchJob:
+    """Run ``write_transcripts_artifact`` on a background thread"""
+    thread = threading.Thread(target=write_transcripts_artifact, args=(job,), daemon=True)
+    thread.start()
+    return job
+
+
+# ============== CLEANUP ==============
+
+def cleanup_expired() -> dict:
+    """Forget jobs that finished more than ``JOB_TTL`` ago and delete their ZIPs.
+
+    ZIPs older than that which no job owns (e.g. left by a restart) are
+    deleted too.
+    """
+    now = datetime.now()
+    with _jobs_lock:
+        expired = [job for job in _jobs.values() if job.finished_at and now - job.finished_at > JOB_TTL]
+        for job in expired:
+            del _jobs[job.id]
+        owned = {job.artifact_path for job in _jobs.values() if job.artifact_path}
+    removed_files = 0
+    for job in expired:
+        if job.artifact_path and os.path.exists(job.artifact_path):
+            os.remove(job.artifact_path)
+            removed_files += 1
+
+    if os.path.isdir(EXPORT_DIR):
+        cutoff = (now - JOB_TTL).timestamp()
+        with os.scandir(EXPORT_DIR) as entries:
+            for entry in entries:
+                if (
+                    entry.name.startswith(ARTIFACT_PREFIX) and entry.is_file(follow_symlinks=False)
+                    and entry.path not in owned and entry.stat().st_mtime < cutoff
+                ):
+                    os.remove(entry.path)
+                    removed_files += 1
+    return {"expired_jobs": len(expired), "removed_files": removed_files}
+
+
+def register(scheduler):
+    return scheduler.add_job(JOB_NAME, cleanup_expired, CLEANUP_INTERVAL)
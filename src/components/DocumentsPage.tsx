@@ -171,7 +171,7 @@ export function DocumentsPage() {
 
   const handleDownloadOfficial = async (type: string, filename: string) => {
     try {
-      const response = await fetch(`http://127.0.0.1:8000/api/documents/download/${type}`, {
+      const response = await fetch(`http://127.0.0.1:8000/api/documents/download/${type}?format=pdf`, {
         headers: {
           Authorization: `Bearer ${localStorage.getItem("auth_token")}`,
         },
@@ -207,14 +207,14 @@ export function DocumentsPage() {
       description: "Official document confirming your enrollment status",
       icon: ClipboardList,
       type: "enrollment-proof",
-      filename: "enrollment_proof.html",
+      filename: "enrollment_proof.pdf",
     },
     {
       title: "Grade Transcript",
       description: "Complete academic record with all grades",
       icon: GraduationCap,
       type: "grade-transcript",
-      filename: "grade_transcript.html",
+      filename: "grade_transcript.pdf",
     },
   ];
 
@@ -179,7 +179,7 @@ export function PaymentsPage() {
 
   const handleDownloadInvoice = async (paymentId: number) => {
     try {
-      const response = await fetch(`http://127.0.0.1:8000/api/documents/download/invoice/${paymentId}`, {
+      const response = await fetch(`http://127.0.0.1:8000/api/documents/download/invoice/${paymentId}?format=pdf`, {
         headers: {
           Authorization: `Bearer ${localStorage.getItem("auth_token")}`,
         },
@@ -191,7 +191,7 @@ export function PaymentsPage() {
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement("a");
       a.href = url;
-      a.download = `invoice_${paymentId}.html`;
+      a.download = `invoice_${paymentId}.pdf`;
       document.body.appendChild(a);
       a.click();
       window.URL.revokeObjectURL(url);